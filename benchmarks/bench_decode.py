@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_decode.py — decode time and peak memory per page for both APIs
+
+Compares, on synthetic pages of realistic shape:
+- stdlib json.loads(bytes) (what resp.json() does, minus charset sniffing)
+- orjson.loads(bytes), when orjson is installed
+- each backend followed by slim_kaspa_page() for the L1 pages, i.e. the
+  tracer's fetch_page() path, with peak memory measured while the full
+  decoded page is still alive and the retained size after slimming
+
+Usage:
+  python benchmarks/bench_decode.py
+  python benchmarks/bench_decode.py --kaspa-txs 500 --kasplex-ops 500 --repeat 20
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracer_http import orjson, slim_kaspa_page  # noqa: E402
+from synthetic import kaspa_page, kasplex_page  # noqa: E402
+
+def _backends():
+    out = [("json", json.loads)]
+    if orjson is not None:
+        out.append(("orjson", orjson.loads))
+    return out
+
+def _measure(fn, body, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        obj = fn(body)
+        times.append(time.perf_counter() - t0)
+        del obj
+    gc.collect()
+    tracemalloc.start()
+    obj = fn(body)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return statistics.median(times), peak, retained
+
+def _row(api, variant, size, t, peak, retained):
+    print(f"{api:<8} {variant:<16} {size / 1e6:>8.2f} {t * 1e3:>10.2f} {size / t / 1e6:>8.1f} "
+          f"{peak / 1e6:>9.2f} {retained / 1e6:>9.2f}")
+
+def main():
+    ap = argparse.ArgumentParser(description="JSON decode benchmark (time + peak memory per page)")
+    ap.add_argument("--kaspa-txs", type=int, default=500, help="Transactions per L1 page (default 500)")
+    ap.add_argument("--kasplex-ops", type=int, default=500, help="Ops per oplist page (default 500)")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    kaspa_body = json.dumps(kaspa_page(args.kaspa_txs)).encode()
+    kasplex_body = json.dumps(kasplex_page(args.kasplex_ops)).encode()
+
+    print(f"{'api':<8} {'variant':<16} {'MB':>8} {'ms/page':>10} {'MB/s':>8} {'peak MB':>9} {'kept MB':>9}")
+    for name, fn in _backends():
+        _row("kaspa", name, len(kaspa_body), *_measure(fn, kaspa_body, args.repeat))
+        _row("kaspa", name + "+slim", len(kaspa_body),
+             *_measure(lambda b, f=fn: slim_kaspa_page(f(b)), kaspa_body, args.repeat))
+    for name, fn in _backends():
+        _row("kasplex", name, len(kasplex_body), *_measure(fn, kasplex_body, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_e2e.py — end-to-end throughput of both tracers against the mock API
+
+Starts benchmarks/mock_api.py in-process and runs each scenario in a fresh
+child process (so peak RSS is the scenario's own):
+- l1        trace_wallet() over --addresses addresses (attribution + CSVs)
+- oplist    fetch_oplist_by_tick() for --tick
+- write_csv write_csv() of the ops the oplist scenario fetched (--wide to
+            write the wide layout); its peak RSS includes the fetch
+
+Reports pages/sec and rows/sec (pages and rows as served by the mock),
+peak RSS, client retries and the 429/5xx the mock injected. --json saves the
+results; --baseline compares against a saved run and exits 1 when rows/sec
+drops or peak RSS grows by more than --tolerance.
+
+Usage:
+  python benchmarks/bench_e2e.py
+  python benchmarks/bench_e2e.py --addresses 3 --txs 5000 --ops 20000 --latency-ms 20 --p429 0.02 --p5xx 0.01
+  python benchmarks/bench_e2e.py --json bench.json
+  python benchmarks/bench_e2e.py --baseline bench.json --tolerance 0.2
+  python benchmarks/bench_e2e.py --archive flow_data_fullhistory/raw_pages.jsonl.gz --scenario l1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_api import add_server_args, bench_address, server_from_args  # noqa: E402
+
+SCENARIOS = ("l1", "oplist", "write_csv")
+
+def _peak_rss():
+    """Peak RSS in bytes. VmHWM where /proc has it: Linux ru_maxrss survives exec, so it can be the parent's."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+# -----------------------------
+# Child: one scenario in a fresh process
+# -----------------------------
+
+def run_child(args):
+    """Run args.child against args.url; results go to args.result as JSON."""
+    os.chdir(args.workdir)  # the L1 tracer creates its DATA_DIR in the cwd
+    from tracer_http import HttpClient
+    results = {}
+    if args.child == "l1":
+        import trace_kaspa_fullhistory as tracer
+        tracer.API_BASE = args.url
+        tracer.CLIENT = HttpClient(rps=args.rps, max_per_host=args.shards, pool_size=16)
+        t0 = time.perf_counter()
+        for address in args.address:
+            tracer.trace_wallet(address, shards=args.shards)
+        results["l1"] = {"seconds": time.perf_counter() - t0, "peak_rss": _peak_rss(), **tracer.CLIENT.stats()}
+    else:
+        from tracekrc20_kasplex_full import _client, fetch_oplist_by_tick, write_csv
+        client = _client(rps=args.rps)
+        t0 = time.perf_counter()
+        rows = fetch_oplist_by_tick(args.tick, args.url + "/v1", args.limit, 0.0, False, None, client=client)
+        results["oplist"] = {"seconds": time.perf_counter() - t0, "peak_rss": _peak_rss(), **client.stats()}
+        if "write_csv" in args.scenario:
+            t0 = time.perf_counter()
+            written = write_csv(rows, Path("ops.csv"), wide=args.wide, resume=False, verbose=False)
+            results["write_csv"] = {"seconds": time.perf_counter() - t0, "peak_rss": _peak_rss(),
+                                    "rows": written, "retries": 0, "errors": 0}
+    Path(args.result).write_text(json.dumps(results))
+
+# -----------------------------
+# Parent: mock server + report
+# -----------------------------
+
+def _spawn(args, child, url, workdir, addresses=()):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result = f.name
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", child, "--url", url, "--workdir", workdir,
+           "--result", result, "--rps", str(args.rps), "--shards", str(args.shards), "--tick", args.tick,
+           "--limit", str(args.limit)] + [a for s in args.scenario for a in ("--scenario", s)]
+    cmd += [a for addr in addresses for a in ("--address", addr)]
+    cmd += ["--wide"] if args.wide else []
+    out = None if args.verbose else subprocess.DEVNULL
+    try:
+        subprocess.run(cmd, check=True, stdout=out)
+        return json.loads(Path(result).read_text())
+    finally:
+        os.unlink(result)
+
+def _delta(after, before):
+    return {k: after[k] - before[k] for k in after}
+
+def run_suite(args):
+    results = {}
+    with server_from_args(args) as api, tempfile.TemporaryDirectory(prefix="bench_e2e_") as workdir:
+        if "l1" in args.scenario:
+            addresses = (list(api.data.kaspa)[:args.addresses] if args.archive
+                         else [bench_address(i) for i in range(args.addresses)])
+            before = api.stats()["kaspa"]
+            res = _spawn(args, "l1", api.kaspa_base, workdir, addresses)["l1"]
+            results["l1"] = {**res, "server": _delta(api.stats()["kaspa"], before)}
+        if {"oplist", "write_csv"} & set(args.scenario):
+            before = api.stats()["kasplex"]
+            res = _spawn(args, "oplist", api.url, workdir)
+            server = _delta(api.stats()["kasplex"], before)
+            if "oplist" in args.scenario:
+                results["oplist"] = {**res["oplist"], "server": server}
+            if "write_csv" in args.scenario:
+                results["write_csv"] = res["write_csv"]
+    return results
+
+def _row(name, r):
+    server = r.get("server") or {}
+    pages, rows, secs = server.get("pages"), server.get("rows", r.get("rows", 0)), r["seconds"]
+    pps = f"{pages / secs:>9.1f}" if pages is not None else f"{'-':>9}"
+    rss = f"{r['peak_rss'] / 1e6:>9.1f}" if r.get("peak_rss") else f"{'-':>9}"
+    print(f"{name:<10} {'-' if pages is None else pages:>6} {rows:>8} {secs:>8.2f} {pps} {rows / secs:>10.0f} "
+          f"{rss} {r.get('retries', 0):>7} {server.get('throttled', 0):>5} {server.get('errors', 0):>5}")
+
+def compare(results, baseline, tolerance):
+    """Regressions vs a saved run: rows/sec down or peak RSS up by more than `tolerance`."""
+    problems = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        rate = (r.get("server") or r).get("rows", 0) / r["seconds"]
+        base_rate = (b.get("server") or b).get("rows", 0) / b["seconds"]
+        if base_rate and rate < base_rate * (1 - tolerance):
+            problems.append(f"{name}: rows/sec {rate:.0f} vs baseline {base_rate:.0f}")
+        if r.get("peak_rss") and b.get("peak_rss") and r["peak_rss"] > b["peak_rss"] * (1 + tolerance):
+            problems.append(f"{name}: peak RSS {r['peak_rss'] / 1e6:.1f} MB vs baseline {b['peak_rss'] / 1e6:.1f} MB")
+    return problems
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end tracer benchmark against the offline mock API")
+    ap.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (repeatable; default: all)")
+    ap.add_argument("--addresses", type=int, default=2, help="l1: addresses crawled (default: %(default)s)")
+    ap.add_argument("--shards", type=int, default=1, help="l1: trace_wallet shards per address")
+    ap.add_argument("--tick", default="SLOW", help="oplist: ticker queried (default: %(default)s)")
+    ap.add_argument("--limit", type=int, default=1000, help="oplist: requested page size (default: %(default)s)")
+    ap.add_argument("--wide", action="store_true", help="write_csv: wide layout")
+    ap.add_argument("--rps", type=float, default=1000.0,
+                    help="Client starting rate; high so the mock, not the rate limiter, sets the pace (default: %(default)s)")
+    ap.add_argument("--json", type=Path, help="Save the results here")
+    ap.add_argument("--baseline", type=Path, help="Compare with results saved by --json")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs --baseline (default: %(default)s)")
+    ap.add_argument("--verbose", action="store_true", help="Show the tracers' own output")
+    add_server_args(ap)
+    ap.add_argument("--child", choices=("l1", "oplist"), help=argparse.SUPPRESS)
+    ap.add_argument("--url", help=argparse.SUPPRESS)
+    ap.add_argument("--workdir", help=argparse.SUPPRESS)
+    ap.add_argument("--result", help=argparse.SUPPRESS)
+    ap.add_argument("--address", action="append", default=[], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    args.scenario = args.scenario or list(SCENARIOS)
+    if args.child:
+        return run_child(args)
+
+    results = run_suite(args)
+    print(f"{'scenario':<10} {'pages':>6} {'rows':>8} {'seconds':>8} {'pages/s':>9} {'rows/s':>10} "
+          f"{'peak MB':>9} {'retries':>7} {'429':>5} {'5xx':>5}")
+    for name, r in results.items():
+        _row(name, r)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        problems = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for p in problems:
+            print(f"[regression] {p}")
+        if problems:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_normalize.py — per-row normalize_op() vs page-level normalize_page()
+
+Both paths build the frame the CSV sink sorts and spills (narrow or wide) from
+the same synthetic oplist pages; the outputs are checked to be identical
+before timing.
+
+Usage:
+  python benchmarks/bench_normalize.py
+  python benchmarks/bench_normalize.py --ops 50000 --page 500 --wide
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from tracekrc20_kasplex_full import NARROW_COLS, _wide_row, normalize_op, normalize_page  # noqa: E402
+from synthetic import kasplex_page  # noqa: E402
+
+def per_row(rows, wide):
+    norm = [normalize_op(r) for r in rows]
+    df = pd.DataFrame([_wide_row(r) for r in norm] if wide else norm)
+    return df if wide else df[NARROW_COLS]
+
+def _time(fn, pages, wide, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for rows in pages:
+            fn(rows, wide)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser(description="Normalizer microbenchmark")
+    ap.add_argument("--ops", type=int, default=50000, help="Total ops (default 50000)")
+    ap.add_argument("--page", type=int, default=500, help="Ops per page (default 500)")
+    ap.add_argument("--wide", action="store_true", help="Build the wide frame (raw_* columns) too")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    pages = [kasplex_page(args.page, seed=i)["result"] for i in range(max(1, args.ops // args.page))]
+    n = sum(len(p) for p in pages)
+    for rows in pages[:5]:
+        a = per_row(rows, args.wide).to_csv(index=False)
+        b = normalize_page(rows, args.wide).to_csv(index=False)
+        if a != b:
+            raise SystemExit("normalize_page output differs from normalize_op")
+
+    t_row = _time(per_row, pages, args.wide, args.repeat)
+    t_page = _time(normalize_page, pages, args.wide, args.repeat)
+    print(f"ops={n} page={args.page} wide={args.wide}")
+    print(f"normalize_op   {t_row:8.3f}s  {n / t_row:>12,.0f} ops/s")
+    print(f"normalize_page {t_page:8.3f}s  {n / t_page:>12,.0f} ops/s")
+    print(f"speedup        {t_row / t_page:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+mock_api.py — local stand-in for api.kaspa.org and api.kasplex.org
+
+Serves the two endpoints the tracers page through, with the same cursor
+semantics:
+- GET /addresses/{addr}/full-transactions-page?limit=&before=
+    up to `limit` transactions with block_time < before, newest first
+    (empty list past the end of the history)
+- GET /v1/krc20/oplist?tick=&address=&limit=&next=
+    {"message", "prev", "next", "result"}: ops newest first; `next` is the
+    opScore of the last op when more follow, and a request with next=X
+    continues with the ops whose opScore < X
+
+Data is either synthetic (benchmarks/synthetic.py shapes, generated lazily
+and deterministically per address / query, so any address or tick has a
+history of --txs / --ops rows) or recorded: the pages of raw-page archives
+written with --archive by either tracer (tracer_archive.py), re-paged on
+demand like the tracers' own replay.
+
+Faults and pacing: fixed latency plus jitter per request, 429 (with
+Retry-After) and 5xx injection rates, and server-side page-size caps.
+GET /_stats returns the request/page/row/fault counters per API.
+
+Usage:
+  python benchmarks/mock_api.py --port 8765 --latency-ms 40 --p429 0.02 --p5xx 0.01
+  python trace_kaspa_fullhistory.py --api-base http://127.0.0.1:8765
+  python tracekrc20_kasplex_full.py --mode token --token SLOW --out /tmp/slow.csv --base-url http://127.0.0.1:8765/v1
+  python benchmarks/mock_api.py --port 8765 --archive flow_data_fullhistory/raw_pages.jsonl.gz \
+    --archive data/slow_token_ops.csv.pages.jsonl.gz
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import KASPA_GENESIS_MS, kaspa_tx, kasplex_op  # noqa: E402
+
+KASPA_TOP_MS = KASPA_GENESIS_MS + 400 * 86_400_000
+KASPLEX_TOP_MS = KASPA_GENESIS_MS + 700 * 86_400_000
+TX_STEP_MS = 10_000
+OP_STEP_MS = 2_000
+OPSCORE_TOP = 10 ** 15
+KASPA_MAX_LIMIT = 500
+KASPLEX_MAX_LIMIT = 1000
+STATUSES_5XX = (500, 502, 503, 504)
+
+def bench_address(i: int) -> str:
+    """The i-th address the benchmarks crawl (any address works against synthetic data)."""
+    return f"kaspa:qzbench{i:06d}" + "q" * 48
+
+# -----------------------------
+# Data sources
+# -----------------------------
+
+class SyntheticData:
+    """
+    Every address has `txs` transactions, one every TX_STEP_MS going back from
+    KASPA_TOP_MS; every oplist query (tick and/or address) has `ops` ops. Rows
+    are generated per page from a seed derived from (seed, key, position).
+    """
+
+    def __init__(self, txs: int = 5000, ops: int = 20000, seed: int = 0, n_in: int = 2, n_out: int = 2):
+        self.txs, self.ops, self.seed, self.n_in, self.n_out = txs, ops, seed, n_in, n_out
+
+    def kaspa_page(self, address: str, before: int, limit: int) -> List[Dict[str, Any]]:
+        k0 = 0 if before > KASPA_TOP_MS else (KASPA_TOP_MS - before) // TX_STEP_MS + 1
+        out = []
+        for k in range(k0, min(self.txs, k0 + limit)):
+            tx = kaspa_tx(random.Random(f"{self.seed}:{address}:{k}"), KASPA_TOP_MS - k * TX_STEP_MS, self.n_in, self.n_out)
+            if k % 2:
+                tx["inputs"][0]["previous_outpoint_address"] = address
+            else:
+                tx["outputs"][0]["script_public_key_address"] = address
+            out.append(tx)
+        return out
+
+    def oplist_page(self, params: Dict[str, str], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        key = "&".join(f"{k}={params[k]}" for k in sorted(params) if k != "next")
+        nxt = params.get("next")
+        k0 = OPSCORE_TOP - int(nxt) + 1 if nxt else 0
+        tick, address = params.get("tick", "SLOW"), params.get("address")
+        out = []
+        for k in range(max(0, k0), min(self.ops, k0 + limit)):
+            op = kasplex_op(random.Random(f"{self.seed}:{key}:{k}"), KASPLEX_TOP_MS - k * OP_STEP_MS, tick)
+            op["opScore"] = str(OPSCORE_TOP - k)
+            if address:
+                op["to" if k % 2 == 0 else "from"] = address
+            out.append(op)
+        more = bool(out) and k0 + len(out) < self.ops
+        return out, (out[-1]["opScore"] if more else None)
+
+class RecordedData:
+    """Pages from tracer raw-page archives, deduplicated and re-paged by cursor."""
+
+    def __init__(self, paths: List[str]):
+        from tracer_archive import PageArchive
+        from tracekrc20_kasplex_full import oplist_key
+        self._oplist_key = oplist_key
+        kaspa: Dict[str, Dict[str, Any]] = {}
+        kasplex: Dict[str, Dict[str, Any]] = {}
+        for path in paths:
+            with PageArchive(path, mode="r") as archive:
+                for rec in archive.iter_records():
+                    body = rec.get("body")
+                    if rec.get("src") == "kaspa" and isinstance(body, list):
+                        txs = kaspa.setdefault(rec["key"], {})
+                        for tx in body:
+                            if isinstance(tx, dict):
+                                txs.setdefault(tx.get("transaction_id", tx.get("txId")), tx)
+                    elif rec.get("src") == "kasplex" and isinstance(body, dict):
+                        ops = kasplex.setdefault(rec["key"], {})
+                        for op in body.get("result") or []:
+                            if isinstance(op, dict):
+                                ops.setdefault(op.get("hashRev") or op.get("opScore"), op)
+        self.kaspa = {}
+        for addr, txs in kaspa.items():
+            ordered = sorted(txs.values(), key=lambda tx: -int(tx.get("block_time", 0)))
+            self.kaspa[addr] = ([-int(tx.get("block_time", 0)) for tx in ordered], ordered)
+        self.kasplex = {}
+        for key, ops in kasplex.items():
+            ordered = sorted(ops.values(), key=lambda op: -int(op.get("opScore", 0)))
+            self.kasplex[key] = ([-int(op.get("opScore", 0)) for op in ordered], ordered)
+
+    def kaspa_page(self, address: str, before: int, limit: int) -> List[Dict[str, Any]]:
+        keys, ordered = self.kaspa.get(address, ([], []))
+        start = bisect_right(keys, -before)
+        return ordered[start:start + limit]
+
+    def oplist_page(self, params: Dict[str, str], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        keys, ordered = self.kasplex.get(self._oplist_key(params), ([], []))
+        start = bisect_right(keys, -int(params["next"])) if params.get("next") else 0
+        page = ordered[start:start + limit]
+        more = bool(page) and start + len(page) < len(ordered)
+        return page, (str(page[-1]["opScore"]) if more else None)
+
+# -----------------------------
+# Server
+# -----------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ThreadingHTTPServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        api: MockApi = self.server.api
+        url = urlsplit(self.path)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        if url.path == "/_stats":
+            return self._send(200, json.dumps(api.stats()).encode())
+        if len(parts) == 3 and parts[0] == "addresses" and parts[2] == "full-transactions-page":
+            src = "kaspa"
+        elif url.path.rstrip("/").endswith("/krc20/oplist"):
+            src = "kasplex"
+        else:
+            return self._send(404, b'{"detail":"Not Found"}')
+        status = api.fault(src)
+        if status:
+            headers = {"Retry-After": str(api.retry_after)} if status == 429 else None
+            return self._send(status, b'{"detail":"injected"}', headers)
+        try:
+            if src == "kaspa":
+                limit = min(int(q.get("limit", 50)), api.kaspa_max_limit)
+                before = int(q.get("before") or 2 ** 62)
+                rows = api.data.kaspa_page(parts[1], before, limit)
+                body = json.dumps(rows, separators=(",", ":")).encode()
+            else:
+                limit = min(int(q.pop("limit", 50)), api.kasplex_max_limit)
+                rows, nxt = api.data.oplist_page(q, limit)
+                body = json.dumps({"message": "successful", "prev": None, "next": nxt, "result": rows},
+                                  separators=(",", ":")).encode()
+        except ValueError as e:
+            return self._send(400, json.dumps({"detail": str(e)}).encode())
+        api.count(src, pages=1, rows=len(rows), bytes=len(body))
+        self._send(200, body)
+
+class MockApi:
+    """
+    Threaded mock server; start() binds (port 0 = any free port) and serves
+    from a daemon thread until stop(). `kaspa_base` / `kasplex_base` are the
+    values for the tracers' API_BASE / --base-url.
+    """
+
+    def __init__(self, data: Any, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, p429: float = 0.0, p5xx: float = 0.0, retry_after: float = 0.0,
+                 kaspa_max_limit: int = KASPA_MAX_LIMIT, kasplex_max_limit: int = KASPLEX_MAX_LIMIT, seed: int = 0):
+        self.data = data
+        self.host, self.port = host, port
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.p429, self.p5xx, self.retry_after = p429, p5xx, retry_after
+        self.kaspa_max_limit, self.kasplex_max_limit = kaspa_max_limit, kasplex_max_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {src: {"requests": 0, "pages": 0, "rows": 0, "bytes": 0, "throttled": 0, "errors": 0}
+                       for src in ("kaspa", "kasplex")}
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def kaspa_base(self) -> str:
+        return self.url
+
+    @property
+    def kasplex_base(self) -> str:
+        return self.url + "/v1"
+
+    def __enter__(self) -> "MockApi":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> "MockApi":
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.api = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def count(self, src: str, **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self._stats[src][k] += v
+
+    def fault(self, src: str) -> int:
+        """Sleep the configured latency, then the status to inject for this request (0 = none)."""
+        with self._lock:
+            delay = self.latency_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+            roll = self._rng.random()
+            status = 429 if roll < self.p429 else self._rng.choice(STATUSES_5XX) if roll < self.p429 + self.p5xx else 0
+            s = self._stats[src]
+            s["requests"] += 1
+            s["throttled"] += status == 429
+            s["errors"] += status >= 500
+        if delay:
+            time.sleep(delay / 1000)
+        return status
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {src: dict(s) for src, s in self._stats.items()}
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def add_server_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--archive", action="append", help="Serve the pages of this raw-page archive instead of synthetic data (repeatable)")
+    p.add_argument("--txs", type=int, default=5000, help="Synthetic: transactions per address (default: %(default)s)")
+    p.add_argument("--ops", type=int, default=20000, help="Synthetic: ops per oplist query (default: %(default)s)")
+    p.add_argument("--seed", type=int, default=0, help="Synthetic data and fault injection seed")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Added to every request (default: %(default)s)")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random extra latency up to this")
+    p.add_argument("--p429", type=float, default=0.0, help="Fraction of requests answered 429")
+    p.add_argument("--p5xx", type=float, default=0.0, help="Fraction of requests answered 500/502/503/504")
+    p.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds sent with 429s")
+    p.add_argument("--kaspa-page-size", type=int, default=KASPA_MAX_LIMIT, help="Max transactions per L1 page (default: %(default)s)")
+    p.add_argument("--kasplex-page-size", type=int, default=KASPLEX_MAX_LIMIT, help="Max ops per oplist page (default: %(default)s)")
+
+def server_from_args(args: argparse.Namespace, host: str = "127.0.0.1", port: int = 0) -> MockApi:
+    data = RecordedData(args.archive) if args.archive else SyntheticData(args.txs, args.ops, args.seed)
+    return MockApi(data, host=host, port=port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                   p429=args.p429, p5xx=args.p5xx, retry_after=args.retry_after,
+                   kaspa_max_limit=args.kaspa_page_size, kasplex_max_limit=args.kasplex_page_size, seed=args.seed)
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline mock of the Kaspa and Kasplex APIs used by the tracers")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_server_args(ap)
+    args = ap.parse_args()
+    api = server_from_args(args, args.host, args.port).start()
+    print(f"[mock] kaspa={api.kaspa_base} kasplex={api.kasplex_base} stats={api.url}/_stats")
+    try:
+        api._thread.join()
+    except KeyboardInterrupt:
+        api.stop()
+        print(f"\n[mock] {json.dumps(api.stats())}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+synthetic.py — deterministic fake API payloads for the benchmarks
+
+- kaspa_page(): one /addresses/{addr}/full-transactions-page response with
+  resolve_previous_outpoints=full shaped like api.kaspa.org (scripts,
+  signatures, outpoint hashes included, so sizes are realistic)
+- kasplex_page(): one /v1/krc20/oplist response ({"result": [...], "next": ...})
+"""
+
+import random
+from typing import Any, Dict, List, Optional
+
+KASPA_GENESIS_MS = 1636243200000
+SOMPI = 100_000_000
+
+def _hex(rng: random.Random, n: int) -> str:
+    return "%0*x" % (n, rng.getrandbits(4 * n))
+
+def _addr(rng: random.Random, pool: int = 200) -> str:
+    return f"kaspa:qz{rng.randrange(pool):06d}" + "q" * 53
+
+def kaspa_tx(rng: random.Random, block_time: int, n_in: int = 2, n_out: int = 2) -> Dict[str, Any]:
+    tx_id = _hex(rng, 64)
+    inputs = []
+    for i in range(n_in):
+        inputs.append({
+            "transaction_id": tx_id,
+            "index": i,
+            "previous_outpoint_hash": _hex(rng, 64),
+            "previous_outpoint_index": str(rng.randrange(4)),
+            "previous_outpoint_resolved": None,
+            "previous_outpoint_address": _addr(rng),
+            "previous_outpoint_amount": rng.randrange(1, 10_000) * SOMPI,
+            "signature_script": "41" + _hex(rng, 128) + "01",
+            "sig_op_count": "1",
+        })
+    outputs = []
+    for i in range(n_out):
+        outputs.append({
+            "transaction_id": tx_id,
+            "index": i,
+            "amount": rng.randrange(1, 5_000) * SOMPI,
+            "script_public_key": "20" + _hex(rng, 64) + "ac",
+            "script_public_key_address": _addr(rng),
+            "script_public_key_type": "pubkey",
+            "accepting_block_hash": _hex(rng, 64),
+        })
+    return {
+        "subnetwork_id": "0" * 40,
+        "transaction_id": tx_id,
+        "hash": _hex(rng, 64),
+        "mass": "2036",
+        "payload": None,
+        "block_hash": [_hex(rng, 64)],
+        "block_time": block_time,
+        "is_accepted": True,
+        "accepting_block_hash": _hex(rng, 64),
+        "accepting_block_blue_score": rng.randrange(10**8),
+        "accepting_block_time": block_time + 1000,
+        "inputs": inputs,
+        "outputs": outputs,
+    }
+
+def kaspa_page(n_tx: int = 500, seed: int = 0, before: Optional[int] = None,
+               n_in: int = 2, n_out: int = 2) -> List[Dict[str, Any]]:
+    """n_tx transactions, newest first, strictly below `before` (ms)."""
+    rng = random.Random(seed)
+    t = before if before is not None else KASPA_GENESIS_MS + 400 * 86_400_000
+    txs = []
+    for _ in range(n_tx):
+        t -= rng.randrange(1000, 60_000)
+        txs.append(kaspa_tx(rng, t, n_in, n_out))
+    return txs
+
+def kasplex_op(rng: random.Random, ts: int, tick: str = "SLOW") -> Dict[str, Any]:
+    op = rng.choice(["mint", "mint", "mint", "transfer", "list", "send"])
+    return {
+        "p": "KRC-20",
+        "op": op,
+        "tick": tick,
+        "amt": str(rng.randrange(1, 10**6) * 10**8),
+        "from": _addr(rng),
+        "to": _addr(rng),
+        "opScore": str(ts * 1000 + rng.randrange(1000)),
+        "hashRev": _hex(rng, 64),
+        "feeRev": str(rng.randrange(10**9)),
+        "txAccept": "1",
+        "opAccept": "1",
+        "opError": "",
+        "checkpoint": _hex(rng, 64),
+        "mtsAdd": str(ts),
+        "mtsMod": str(ts + rng.randrange(5000)),
+    }
+
+def kasplex_page(n_ops: int = 500, seed: int = 0, start_ms: Optional[int] = None,
+                 tick: str = "SLOW", next_cursor: Optional[str] = "cursor") -> Dict[str, Any]:
+    rng = random.Random(seed)
+    t = start_ms if start_ms is not None else KASPA_GENESIS_MS + 700 * 86_400_000
+    ops = []
+    for _ in range(n_ops):
+        t -= rng.randrange(1000, 60_000)
+        ops.append(kasplex_op(rng, t, tick))
+    return {"message": "successful", "prev": None, "next": next_cursor, "result": ops}
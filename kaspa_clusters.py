@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+kaspa_clusters.py — common-input-ownership clustering of the Kaspa L1 data
+fetched by trace_kaspa_fullhistory.py
+
+Highlights
+- Multi-input heuristic: every address spending inputs of the same
+  transaction is put in one cluster (union-find, union by size)
+- Optional change-output rules (--change, repeatable), each linking one
+  output to the inputs' cluster:
+    fresh — of the outputs not paying an input address, exactly one goes to
+            an address first seen in this transaction
+    round — exactly two such outputs, and exactly one of them is a whole
+            number of KAS (that one is taken as the payment, the other as change)
+- Streams transactions from *_all_participants.csv outputs (chunked), from
+  --storage columnar stores or from a raw-page archive (--archive); nothing
+  is loaded whole
+- Incremental: the union-find forest, each address's first_seen and the
+  processed tx_ids live in a SQLite state file; an update reads only the
+  nodes its new transactions touch and skips transactions already seen
+- export writes the membership table (address, cluster, cluster_size,
+  first_seen), optionally flagging the addresses of a minter list (a file
+  of addresses or a KRC-20 ops output, whose mint recipients are used)
+
+Usage
+------
+# Cluster everything the L1 tracer wrote (rerun after each crawl; only new txs are read)
+python kaspa_clusters.py update --state data/clusters.sqlite --flows flow_data_fullhistory --change fresh
+
+# Membership table joined to the SLOW minters
+python kaspa_clusters.py export --state data/clusters.sqlite --out data/clusters.csv \
+  --minters data/slow_token_ops.csv
+
+"""
+
+import argparse
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from kaspa_edges import iter_record_chunks
+from tracer_archive import PageArchive
+from tracer_http import slim_kaspa_page
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+READ_CHUNK = 200000    # CSV rows read per chunk
+BATCH_TXS = 5000       # transactions per union/commit batch
+SOMPI_PER_KAS = 10 ** 8
+CHANGE_RULES = ("fresh", "round")
+NO_ADDRESS = {"", "UNKNOWN", None}
+MEMBER_COLUMNS = ["address", "cluster", "cluster_size", "first_seen"]
+
+# (tx_id, block_time ms, input addresses, [(output address, sompi), ...])
+Tx = Tuple[str, int, List[str], List[Tuple[str, int]]]
+
+# -----------------------------
+# Transaction sources
+# -----------------------------
+
+def _tx_from_api(tx: Dict) -> Tx:
+    inputs = [i.get("previous_outpoint_address") for i in tx.get("inputs") or []]
+    outputs = [(o.get("script_public_key_address"), int(o.get("amount", 0) or 0)) for o in tx.get("outputs") or []]
+    return (tx.get("transaction_id", tx.get("txId", "UNKNOWN")), int(tx.get("block_time", 0) or 0),
+            list(dict.fromkeys(a for a in inputs if a not in NO_ADDRESS)), outputs)
+
+def iter_flow_txs(path: Path, chunk_rows: int = READ_CHUNK) -> Iterator[Tx]:
+    """
+    Transactions from attribution CSVs (a *_all_participants.csv file or a
+    directory of them): a tx's inputs are its distinct senders, its outputs
+    the recipients with their split amounts summed back (outputs to the same
+    address merge).
+    """
+    for chunk in iter_record_chunks(path, chunk_rows):
+        yield from _flow_chunk_txs(chunk)
+
+def _flow_chunk_txs(chunk: pd.DataFrame) -> Iterator[Tx]:
+    ms = (pd.to_datetime(chunk["timestamp"], utc=True, errors="coerce", format="ISO8601")
+          - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(1, "ms")
+    chunk = chunk.assign(ms=ms.fillna(0).astype("int64"))
+    for tx_id, g in chunk.groupby("tx_id", sort=False):
+        outputs = g.groupby("recipient", sort=False)["amount_sompi"].sum()
+        yield (tx_id, int(g["ms"].iat[0]), [a for a in dict.fromkeys(g["sender"]) if a not in NO_ADDRESS],
+               [(a, int(v)) for a, v in outputs.items()])
+
+def iter_store_txs(path: Path) -> Iterator[Tx]:
+    """Transactions from a --storage columnar store (<address>_store) or a directory of them."""
+    from trace_kaspa_fullhistory import iter_store_transactions
+    path = Path(path)
+    roots = [path] if (path / "transactions").is_dir() else sorted(p for p in path.glob("*_store") if p.is_dir())
+    for root in roots:
+        for tx in iter_store_transactions(str(root)):
+            yield _tx_from_api(tx)
+
+def iter_archive_txs(path: Path) -> Iterator[Tx]:
+    """Transactions from the Kaspa pages of a raw-page archive (trace_kaspa_fullhistory.py --archive)."""
+    with PageArchive(path, mode="r") as archive:
+        for rec in archive.iter_records("kaspa"):
+            for tx in slim_kaspa_page(rec["body"]) or []:
+                if isinstance(tx, dict):
+                    yield _tx_from_api(tx)
+
+# -----------------------------
+# Union-find store
+# -----------------------------
+
+class AddressClusters:
+    """
+    Persistent union-find over addresses. `nodes` holds each address's
+    parent (roots point to themselves), the size of the set it roots and its
+    first_seen block_time; nodes are read from SQLite on first use and the
+    touched ones written back by commit(), together with the processed tx_ids.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                address TEXT PRIMARY KEY, parent TEXT NOT NULL, size INTEGER NOT NULL, first_seen INTEGER
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS txs (tx_id TEXT PRIMARY KEY) WITHOUT ROWID;
+        """)
+        self._nodes: Dict[str, List[Any]] = {}
+        self._dirty: Set[str] = set()
+        self._pending: List[str] = []
+
+    def __enter__(self) -> "AddressClusters":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _node(self, addr: str) -> List[Any]:
+        node = self._nodes.get(addr)
+        if node is None:
+            row = self.conn.execute("SELECT parent, size, first_seen FROM nodes WHERE address = ?", (addr,)).fetchone()
+            node = self._nodes[addr] = list(row) if row else [addr, 1, None]
+            if row is None:
+                self._dirty.add(addr)
+        return node
+
+    def find(self, addr: str) -> str:
+        root = addr
+        while self._node(root)[0] != root:
+            root = self._node(root)[0]
+        while addr != root:  # path compression
+            node = self._node(addr)
+            nxt = node[0]
+            if nxt != root:
+                node[0] = root
+                self._dirty.add(addr)
+            addr = nxt
+        return root
+
+    def union(self, a: str, b: str) -> bool:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        na, nb = self._node(ra), self._node(rb)
+        if (nb[1], ra) > (na[1], rb):  # larger set wins; ties go to the smaller address
+            ra, rb, na, nb = rb, ra, nb, na
+        nb[0] = ra
+        na[1] += nb[1]
+        self._dirty.update((ra, rb))
+        return True
+
+    def known(self, tx_ids: Iterable[str]) -> Set[str]:
+        ids = list(set(tx_ids))
+        found: Set[str] = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            q = f"SELECT tx_id FROM txs WHERE tx_id IN ({','.join('?' * len(chunk))})"
+            found.update(r[0] for r in self.conn.execute(q, chunk))
+        return found
+
+    def see(self, addr: str, block_time: int) -> None:
+        """Record an appearance of addr; first_seen keeps the earliest block_time."""
+        node = self._node(addr)
+        if node[2] is None or block_time < node[2]:
+            node[2] = block_time
+            self._dirty.add(addr)
+
+    def _see_tx(self, block_time: int, inputs: List[str], outputs: List[Tuple[str, int]]) -> None:
+        for addr in inputs:
+            self.see(addr, block_time)
+        for addr, _ in outputs:
+            if addr not in NO_ADDRESS:
+                self.see(addr, block_time)
+
+    def add(self, txs: List[Tx], rules: Iterable[str] = (), stats: Optional[Dict[str, int]] = None,
+            see: bool = True) -> Dict[str, int]:
+        """
+        Union the inputs of every unseen tx in `txs` (and, per `rules`, its
+        change output), recording first_seen of its addresses unless `see` is
+        False because an earlier pass over the same txs already did.
+        """
+        stats = stats if stats is not None else {}
+        for k in ("txs", "merges", "change"):
+            stats.setdefault(k, 0)
+        rules = set(rules)
+        known = self.known(t[0] for t in txs)
+        for tx_id, block_time, inputs, outputs in txs:
+            if tx_id in known:
+                continue
+            known.add(tx_id)
+            self._pending.append(tx_id)
+            stats["txs"] += 1
+            if see:
+                self._see_tx(block_time, inputs, outputs)
+            for addr in inputs[1:]:
+                stats["merges"] += self.union(inputs[0], addr)
+            change = self._change(block_time, inputs, outputs, rules) if inputs and rules else None
+            if change is not None:
+                stats["change"] += 1
+                stats["merges"] += self.union(inputs[0], change)
+        return stats
+
+    def _change(self, block_time: int, inputs: List[str], outputs: List[Tuple[str, int]], rules: Set[str]) -> Optional[str]:
+        ins = set(inputs)
+        outs = [(a, v) for a, v in outputs if a not in NO_ADDRESS and a not in ins]
+        if len(outs) < 2:
+            return None
+        if "fresh" in rules:
+            fresh = [a for a, _ in outs if self._node(a)[2] == block_time]
+            if len(fresh) == 1:
+                return fresh[0]
+        if "round" in rules and len(outs) == 2:
+            odd = [a for a, v in outs if v % SOMPI_PER_KAS]
+            if len(odd) == 1:
+                return odd[0]
+        return None
+
+    def commit(self) -> None:
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?)",
+                                  ((a, *self._nodes[a]) for a in self._dirty))
+            self.conn.executemany("INSERT OR IGNORE INTO txs VALUES (?)", ((t,) for t in self._pending))
+        self._dirty.clear()
+        self._pending.clear()
+        self._nodes.clear()
+
+    def membership(self) -> pd.DataFrame:
+        """
+        One row per address: its cluster, named after the cluster's smallest
+        address (so names do not depend on the order txs were clustered in),
+        the cluster's size and the address's first_seen (ISO, UTC).
+        """
+        self.commit()
+        parent, size, seen = {}, {}, {}
+        for addr, p, s, f in self.conn.execute("SELECT address, parent, size, first_seen FROM nodes"):
+            parent[addr], size[addr], seen[addr] = p, s, f
+        root: Dict[str, str] = {}
+        for addr in parent:
+            path = []
+            r = addr
+            while r not in root and parent[r] != r:
+                path.append(r)
+                r = parent[r]
+            r = root.get(r, r)
+            for a in path:
+                root[a] = r
+            root[addr] = r
+        df = pd.DataFrame({"address": list(parent), "root": [root[a] for a in parent]})
+        df["cluster_size"] = df["root"].map(size).astype("int64")
+        df["cluster"] = df.groupby("root")["address"].transform("min")
+        df["first_seen"] = [
+            datetime.fromtimestamp(seen[a] / 1000, tz=timezone.utc).isoformat() if seen[a] is not None else ""
+            for a in df["address"]
+        ]
+        return df.sort_values(["cluster_size", "cluster", "address"], ascending=[False, True, True],
+                              ignore_index=True)[MEMBER_COLUMNS]
+
+    def close(self) -> None:
+        self.commit()
+        self.conn.close()
+
+# -----------------------------
+# Jobs
+# -----------------------------
+
+def _batches(txs: Iterable[Tx], size: int = BATCH_TXS) -> Iterator[List[Tx]]:
+    batch: List[Tx] = []
+    for tx in txs:
+        batch.append(tx)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def update_clusters(clusters: AddressClusters, sources: List[Any], rules: Iterable[str] = (),
+                    verbose: bool = False) -> Dict[str, int]:
+    """
+    Cluster the transactions of `sources` (callables returning fresh Tx
+    iterators). With the fresh rule the sources are read twice: first to
+    record first_seen for every address, then to union.
+    """
+    rules = list(rules)
+    two_pass = "fresh" in rules
+    stats: Dict[str, int] = {}
+    if two_pass:
+        for batch in _batches(tx for src in sources for tx in src()):
+            known = clusters.known(t[0] for t in batch)
+            for tx_id, block_time, inputs, outputs in batch:
+                if tx_id not in known:
+                    clusters._see_tx(block_time, inputs, outputs)
+            clusters.commit()
+    for n, batch in enumerate(_batches(tx for src in sources for tx in src()), 1):
+        clusters.add(batch, rules, stats, see=not two_pass)
+        clusters.commit()
+        if verbose:
+            print(f"[clusters] batch {n}: txs={stats['txs']} merges={stats['merges']} change={stats['change']}")
+    return stats
+
+def load_minters(path: Path) -> Set[str]:
+    """Minter addresses: the `to` of mint ops in a KRC-20 ops CSV, or one address per line (# comments allowed)."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        header = pd.read_csv(path, nrows=0).columns
+        if {"op_type", "to"} <= set(header):
+            out: Set[str] = set()
+            for chunk in pd.read_csv(path, usecols=["op_type", "to"], dtype=str, keep_default_na=False,
+                                     chunksize=READ_CHUNK):
+                out.update(chunk.loc[chunk["op_type"].str.lower() == "mint", "to"])
+            out.discard("")
+            return out
+    with open(path, encoding="utf-8") as f:
+        return {t for t in (line.split("#", 1)[0].strip() for line in f) if t}
+
+def flag_minters(members: pd.DataFrame, minters: Set[str]) -> pd.DataFrame:
+    """Add `minter` (address is a minter) and `cluster_minters` (minters in its cluster)."""
+    members = members.assign(minter=members["address"].isin(minters))
+    members["cluster_minters"] = members.groupby("cluster")["minter"].transform("sum").astype("int64")
+    return members
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Common-input-ownership clustering of Kaspa L1 tracer data")
+    p.add_argument("command", choices=["update", "export"], help="update = cluster new transactions; export = membership table")
+    p.add_argument("--state", required=True, type=Path, help="SQLite state file (created by the first update)")
+    p.add_argument("--flows", action="append", type=Path, default=[], help="update: *_all_participants.csv file or directory (repeatable)")
+    p.add_argument("--store", action="append", type=Path, default=[], help="update: columnar <address>_store or a directory of them (repeatable)")
+    p.add_argument("--archive", action="append", type=Path, default=[], help="update: raw-page archive from trace_kaspa_fullhistory.py --archive (repeatable)")
+    p.add_argument("--change", action="append", choices=CHANGE_RULES, default=[], help="update: also link change outputs by this rule (repeatable)")
+    p.add_argument("--out", type=Path, help="export: membership CSV (default: print the largest clusters)")
+    p.add_argument("--minters", type=Path, help="export: minter list (addresses file or KRC-20 ops CSV) to flag")
+    p.add_argument("--verbose", action="store_true", help="Verbose logs")
+    return p.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == "export" and not args.state.exists():
+        raise SystemExit(f"{args.state}: no such state file; run update first")
+    with AddressClusters(args.state) as clusters:
+        if args.command == "update":
+            sources = ([lambda p=p: iter_flow_txs(p) for p in args.flows]
+                       + [lambda p=p: iter_store_txs(p) for p in args.store]
+                       + [lambda p=p: iter_archive_txs(p) for p in args.archive])
+            if not sources:
+                raise SystemExit("update needs --flows, --store or --archive")
+            stats = update_clusters(clusters, sources, args.change, verbose=args.verbose)
+            print(f"[clusters] new_txs={stats.get('txs', 0)} merges={stats.get('merges', 0)} "
+                  f"change_links={stats.get('change', 0)}")
+            return
+        members = clusters.membership()
+    if args.minters:
+        members = flag_minters(members, load_minters(args.minters))
+    if args.out:
+        members.to_csv(args.out, index=False, lineterminator="\n")
+        print(f"[write] {args.out} rows={len(members)} clusters={members['cluster'].nunique()}")
+    else:
+        print(members.head(50).to_string(index=False))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nInterrupted.", file=sys.stderr)
+        sys.exit(130)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+kaspa_edges.py — materialized (sender, recipient) flow aggregate of the Kaspa
+L1 attribution records
+
+Highlights
+- One row per directed edge: total sompi, number of transactions, first and
+  last seen; optional per-day buckets (UTC) for windowed exports
+- Updated as transactions are ingested, never recomputed: each batch is
+  grouped and upserted into SQLite, and tx_ids already ingested are
+  skipped, so re-reading outputs (or resuming a crawl) never double counts
+- Fed live by trace_kaspa_fullhistory.py --edges, or from existing
+  *_all_participants.csv outputs with `ingest`
+- export: CSV edge list, weighted edge list and adjacency list (the formats
+  networkx.read_weighted_edgelist / read_adjlist parse) or a JSON adjacency
+  map, filtered by minimum amount, self-edges and (with buckets) time window
+
+Usage
+------
+python kaspa_edges.py ingest --state data/edges.sqlite --flows flow_data_fullhistory --daily
+python kaspa_edges.py export --state data/edges.sqlite --format edgelist --out data/edges.txt --min-kas 1000 --no-self
+python kaspa_edges.py export --state data/edges.sqlite --since 2024-05-01 --until 2024-07-01 --out data/edges_q2.csv
+
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+READ_CHUNK = 200000   # CSV rows read per chunk
+SOMPI_PER_KAS = 10 ** 8
+EDGE_COLUMNS = ["sender", "recipient", "amount_sompi", "amount_kas", "tx_count", "first_seen", "last_seen"]
+EXPORT_FORMATS = ("csv", "edgelist", "adjlist", "json")
+
+# -----------------------------
+# Reading attribution records
+# -----------------------------
+
+def _flow_files(path: Path) -> List[Path]:
+    path = Path(path)
+    return sorted(path.glob("*_all_participants.csv")) if path.is_dir() else [path]
+
+def iter_record_chunks(path: Path, chunk_rows: int = READ_CHUNK) -> Iterator[pd.DataFrame]:
+    """
+    Attribution records from a *_all_participants.csv file (or a directory of
+    them) in chunks that never split a transaction: a tx's rows are
+    contiguous, so the rows of the last tx of a chunk are carried over to the
+    next one. Files written before amount_sompi existed get it derived from
+    amount_kas.
+    """
+    for f in _flow_files(path):
+        header = pd.read_csv(f, nrows=0).columns
+        amount = "amount_sompi" if "amount_sompi" in header else "amount_kas"
+        if amount not in header:
+            raise SystemExit(f"{f}: not an attribution CSV (no amount_sompi or amount_kas column)")
+        carry = None
+        for chunk in pd.read_csv(f, usecols=["tx_id", "timestamp", "sender", "recipient", amount],
+                                 dtype={"tx_id": str, "timestamp": str, "sender": str, "recipient": str},
+                                 keep_default_na=False, chunksize=chunk_rows):
+            if amount == "amount_kas":
+                chunk["amount_sompi"] = (chunk.pop("amount_kas") * 1e8).round().astype("int64")
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            last = chunk["tx_id"].iat[-1]
+            tail = chunk["tx_id"] == last
+            carry = chunk[tail]
+            if not tail.all():
+                yield chunk[~tail]
+        if carry is not None and len(carry):
+            yield carry
+
+# -----------------------------
+# Edge store
+# -----------------------------
+
+class FlowEdges:
+    """
+    SQLite edge aggregate shared by every trace_wallet call (thread-safe).
+    `edges` holds the running totals per (sender, recipient), `daily` the
+    same per UTC day when the store was created with daily=True, and `txs`
+    the tx_ids already counted.
+    """
+
+    def __init__(self, path, daily: Optional[bool] = None):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS edges (
+                sender TEXT NOT NULL, recipient TEXT NOT NULL, amount_sompi INTEGER NOT NULL,
+                tx_count INTEGER NOT NULL, first_seen TEXT NOT NULL, last_seen TEXT NOT NULL,
+                PRIMARY KEY (sender, recipient)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS daily (
+                sender TEXT NOT NULL, recipient TEXT NOT NULL, day TEXT NOT NULL,
+                amount_sompi INTEGER NOT NULL, tx_count INTEGER NOT NULL,
+                PRIMARY KEY (sender, recipient, day)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS daily_day ON daily (day);
+            CREATE TABLE IF NOT EXISTS txs (tx_id TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'daily'").fetchone()
+        if row is None:
+            self.daily = bool(daily)
+            with self._db:
+                self._db.execute("INSERT INTO meta VALUES ('daily', ?)", (json.dumps(self.daily),))
+        else:
+            self.daily = json.loads(row[0])
+            if daily and not self.daily:
+                raise SystemExit(f"{self.path} was created without daily buckets; use a new edge store")
+
+    def __enter__(self) -> "FlowEdges":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+
+    def _known(self, tx_ids: List[str]) -> set:
+        found = set()
+        for i in range(0, len(tx_ids), 500):
+            chunk = tx_ids[i:i + 500]
+            q = f"SELECT tx_id FROM txs WHERE tx_id IN ({','.join('?' * len(chunk))})"
+            found.update(r[0] for r in self._db.execute(q, chunk))
+        return found
+
+    def add(self, records: pd.DataFrame) -> int:
+        """
+        Fold attribution records (every row of each transaction at once) into
+        the aggregate; transactions already counted are skipped. Returns the
+        number of new transactions.
+        """
+        if not len(records):
+            return 0
+        with self._lock:
+            tx_ids = list(records["tx_id"].unique())
+            known = self._known(tx_ids)
+            if known:
+                records = records[~records["tx_id"].isin(known)]
+            if not len(records):
+                return 0
+            amount = records["amount_sompi"].astype("int64")
+            records = records.assign(amount_sompi=amount)
+            g = records.groupby(["sender", "recipient"], sort=False).agg(
+                amount_sompi=("amount_sompi", "sum"), tx_count=("tx_id", "nunique"),
+                first_seen=("timestamp", "min"), last_seen=("timestamp", "max"),
+            )
+            with self._db:
+                self._db.executemany("INSERT OR IGNORE INTO txs VALUES (?)", ((t,) for t in tx_ids if t not in known))
+                self._db.executemany("""
+                    INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (sender, recipient) DO UPDATE SET
+                        amount_sompi = amount_sompi + excluded.amount_sompi,
+                        tx_count = tx_count + excluded.tx_count,
+                        first_seen = min(first_seen, excluded.first_seen),
+                        last_seen = max(last_seen, excluded.last_seen)
+                """, ((s, r, int(a), int(n), f, l) for (s, r), a, n, f, l in zip(
+                    g.index, g["amount_sompi"], g["tx_count"], g["first_seen"], g["last_seen"])))
+                if self.daily:
+                    d = records.assign(day=records["timestamp"].str[:10]).groupby(
+                        ["sender", "recipient", "day"], sort=False).agg(
+                        amount_sompi=("amount_sompi", "sum"), tx_count=("tx_id", "nunique"))
+                    self._db.executemany("""
+                        INSERT INTO daily VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (sender, recipient, day) DO UPDATE SET
+                            amount_sompi = amount_sompi + excluded.amount_sompi,
+                            tx_count = tx_count + excluded.tx_count
+                    """, ((s, r, day, int(a), int(n)) for (s, r, day), a, n in zip(
+                        d.index, d["amount_sompi"], d["tx_count"])))
+            return len(tx_ids) - len(known)
+
+    def edges(self, min_sompi: int = 0, self_edges: bool = True, since: Optional[str] = None,
+              until: Optional[str] = None) -> pd.DataFrame:
+        """
+        The aggregate as an EDGE_COLUMNS frame, heaviest edges first. With
+        since/until (UTC days, "YYYY-MM-DD", until exclusive) edges are summed
+        from the daily buckets, and first/last_seen become the first and last
+        active day in the window.
+        """
+        with self._lock:
+            if since is None and until is None:
+                df = pd.read_sql_query("SELECT sender, recipient, amount_sompi, tx_count, first_seen, last_seen FROM edges",
+                                       self._db)
+            else:
+                if not self.daily:
+                    raise SystemExit(f"{self.path} has no daily buckets; time windows need a store created with --daily")
+                df = pd.read_sql_query(
+                    "SELECT sender, recipient, SUM(amount_sompi) AS amount_sompi, SUM(tx_count) AS tx_count, "
+                    "MIN(day) AS first_seen, MAX(day) AS last_seen FROM daily WHERE day >= ? AND day < ? "
+                    "GROUP BY sender, recipient",
+                    self._db, params=(since or "", until or "9999"),
+                )
+        if not self_edges:
+            df = df[df["sender"] != df["recipient"]]
+        if min_sompi:
+            df = df[df["amount_sompi"] >= min_sompi]
+        df = df.assign(amount_kas=df["amount_sompi"] / SOMPI_PER_KAS)
+        return df.sort_values(["amount_sompi", "sender", "recipient"], ascending=[False, True, True],
+                              ignore_index=True)[EDGE_COLUMNS]
+
+    def close(self) -> None:
+        self._db.close()
+
+# -----------------------------
+# Export
+# -----------------------------
+
+def write_edges(df: pd.DataFrame, out, fmt: str = "csv") -> None:
+    """
+    Write an edges() frame as: csv (all columns), edgelist ("sender recipient
+    amount_sompi" per line), adjlist ("sender recipient recipient ..." per
+    line) or json ({sender: {recipient: {amount_sompi, tx_count, first_seen,
+    last_seen}}}).
+    """
+    if fmt == "csv":
+        df.to_csv(out, index=False, lineterminator="\n")
+    elif fmt == "edgelist":
+        with open(out, "w", encoding="utf-8") as f:
+            for s, r, a in zip(df["sender"], df["recipient"], df["amount_sompi"]):
+                f.write(f"{s} {r} {a}\n")
+    elif fmt == "adjlist":
+        with open(out, "w", encoding="utf-8") as f:
+            for s, g in df.groupby("sender", sort=True):
+                f.write(" ".join([s, *g["recipient"]]) + "\n")
+    elif fmt == "json":
+        adj: Dict[str, Dict[str, Any]] = {}
+        for s, r, a, n, first, last in zip(df["sender"], df["recipient"], df["amount_sompi"], df["tx_count"],
+                                           df["first_seen"], df["last_seen"]):
+            adj.setdefault(s, {})[r] = {"amount_sompi": int(a), "tx_count": int(n), "first_seen": first, "last_seen": last}
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(adj, f)
+    else:
+        raise ValueError(f"unknown edge format {fmt!r}")
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="(sender, recipient) flow aggregate of Kaspa L1 tracer records")
+    p.add_argument("command", choices=["ingest", "export"], help="ingest = fold new records in; export = write the edges")
+    p.add_argument("--state", required=True, type=Path, help="SQLite edge store (created by the first ingest)")
+    p.add_argument("--flows", action="append", type=Path, default=[], help="ingest: *_all_participants.csv file or directory (repeatable)")
+    p.add_argument("--daily", action="store_true", help="ingest: keep per-day buckets (chosen when the store is created)")
+    p.add_argument("--format", choices=EXPORT_FORMATS, default="csv", help="export: output format (default: %(default)s)")
+    p.add_argument("--out", type=Path, help="export: output file (default: print the heaviest edges)")
+    p.add_argument("--min-kas", type=float, default=0.0, help="export: only edges with at least this much total flow")
+    p.add_argument("--no-self", action="store_true", help="export: drop sender == recipient edges (change)")
+    p.add_argument("--since", help="export: first UTC day (YYYY-MM-DD) of a window summed from daily buckets")
+    p.add_argument("--until", help="export: end UTC day (exclusive) of the window")
+    p.add_argument("--verbose", action="store_true", help="Verbose logs")
+    return p.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == "export" and not args.state.exists():
+        raise SystemExit(f"{args.state}: no such edge store; run ingest first")
+    with FlowEdges(args.state, daily=args.daily or None) as store:
+        if args.command == "ingest":
+            if not args.flows:
+                raise SystemExit("ingest needs --flows")
+            new = 0
+            for path in args.flows:
+                for chunk in iter_record_chunks(path):
+                    new += store.add(chunk)
+                    if args.verbose:
+                        print(f"[edges] {path}: new_txs={new} edges={len(store)}")
+            print(f"[edges] new_txs={new} edges={len(store)}")
+            return
+        df = store.edges(min_sompi=int(args.min_kas * SOMPI_PER_KAS), self_edges=not args.no_self,
+                         since=args.since, until=args.until)
+    if args.out:
+        write_edges(df, args.out, args.format)
+        print(f"[write] {args.out} edges={len(df)}")
+    else:
+        print(df.head(50).to_string(index=False))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nInterrupted.", file=sys.stderr)
+        sys.exit(130)
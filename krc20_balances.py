@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+krc20_balances.py — incremental KRC-20 holder balances from the normalized ops
+written by tracekrc20_kasplex_full.py
+
+Highlights
+- Exact integer units (8 decimals, 1 token = 10^8 units); amounts are taken
+  from raw_amt when the ops were written with --wide, from `amount` otherwise
+- Op effects: deploy (premine to `to`), mint/issue (+to), transfer
+  (-from, +to), list (from: balance → locked), send (locked of from → to),
+  burn (-from); other ops do not move balances. Ops with raw_opAccept != 1
+  are skipped. Narrow outputs carry neither raw_opAccept nor raw_amt, so
+  update refuses them unless --allow-narrow is given (every op is then
+  applied, rejected ones included)
+- Incremental: the SQLite state file keeps a log of applied ops keyed by
+  tx_id; an update applies only unseen ops, in (timestamp, opScore, tx_id)
+  order. Ops older than the last applied one rewind the state to the last
+  snapshot before them and re-apply from the log
+- Snapshots of the whole state every --snapshot-ops applied ops; balances or
+  top-N holders as of time T start from the nearest snapshot at or before T
+  and apply only the logged ops after it
+
+Usage
+------
+# Apply the ops of a (refreshed) token output to the state file
+python krc20_balances.py update --ops data/slow_token_ops.csv --state data/slow_balances.sqlite --token SLOW
+
+# Top-20 holders as of a date, and every balance at the latest op
+python krc20_balances.py top --state data/slow_balances.sqlite --at 2024-06-01 -n 20
+python krc20_balances.py balances --state data/slow_balances.sqlite --out data/slow_holders.csv
+
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import zlib
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from tracekrc20_kasplex_full import read_op_store
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+DECIMALS = 8
+UNIT = 10 ** DECIMALS
+SNAPSHOT_OPS = 20000   # applied ops between state snapshots
+READ_CHUNK = 100000    # CSV rows read per chunk
+OP_COLUMNS = ["tx_id", "timestamp_iso", "token", "op_type", "from", "to", "amount"]
+RAW_COLUMNS = ["raw_amt", "raw_pre", "raw_opScore", "raw_opAccept"]
+REQUIRED_RAW = ["raw_opAccept", "raw_amt"]  # acceptance flag and exact amounts; absent from narrow outputs
+HOLDER_COLUMNS = ["address", "balance", "locked", "total"]
+
+EPOCH = pd.Timestamp(0, tz="UTC")
+
+Key = Tuple[int, int, str]  # (ts_ms, op_score, tx_id): the order ops are applied in
+
+# -----------------------------
+# Units
+# -----------------------------
+
+def to_units(value: Any) -> int:
+    """Exact integer units of an amount ("548735987703", 548735987703.0, ...); 0 when empty or invalid."""
+    if value is None or (isinstance(value, float) and value != value):
+        return 0
+    try:
+        d = Decimal(str(value).strip())
+    except InvalidOperation:
+        return 0
+    return int(d) if d.is_finite() else 0
+
+def format_units(units: int) -> str:
+    """Units → exact token amount with DECIMALS decimals ("5487.35987703")."""
+    sign = "-" if units < 0 else ""
+    whole, frac = divmod(abs(units), UNIT)
+    return f"{sign}{whole}.{frac:0{DECIMALS}d}"
+
+def parse_at(value: Any) -> int:
+    """CLI time → epoch ms: epoch ms, epoch seconds or an ISO date/datetime (naive = UTC)."""
+    value = str(value).strip()
+    if value.isdigit():
+        v = int(value)
+        return v if v >= 10 ** 11 else v * 1000
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.value // 10 ** 6
+
+# -----------------------------
+# Reading ops
+# -----------------------------
+
+def _check_raw(ops: Path, columns: Iterable[str], allow_narrow: bool) -> None:
+    missing = [c for c in REQUIRED_RAW if c not in columns]
+    if missing and not allow_narrow:
+        raise SystemExit(f"{ops} has no {'/'.join(missing)} column(s) (narrow output): rejected ops would be "
+                         "applied as if accepted. Rewrite it with --wide, or pass --allow-narrow to apply every op")
+
+def iter_op_frames(ops: Path, chunk_rows: int = READ_CHUNK, allow_narrow: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Normalized ops from a tracer output (CSV file or Parquet part directory)
+    in chunks, all as text. Raises SystemExit before the first chunk when the
+    output lacks raw_opAccept/raw_amt, unless allow_narrow.
+    """
+    ops = Path(ops)
+    if ops.is_dir():
+        df = read_op_store(ops)
+        _check_raw(ops, df.columns, allow_narrow)
+        cols = [c for c in OP_COLUMNS + RAW_COLUMNS if c in df.columns]
+        df = df[cols].astype(object).where(df[cols].notna(), "")
+        for i in range(0, len(df), chunk_rows):
+            yield df.iloc[i:i + chunk_rows].astype(str)
+        return
+    header = pd.read_csv(ops, nrows=0).columns
+    _check_raw(ops, header, allow_narrow)
+    cols = [c for c in OP_COLUMNS + RAW_COLUMNS if c in header]
+    yield from pd.read_csv(ops, usecols=cols, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+def op_records(df: pd.DataFrame, token: str) -> Tuple[List[Tuple], int]:
+    """
+    Log records (ts_ms, score, tx_id, op_type, from, to, units) of the
+    accepted ops of `token` in a frame of normalized ops; also returns how
+    many ops of the token were skipped (rejected or without a timestamp).
+    """
+    df = df[df["token"].str.upper() == token.upper()]
+    n = len(df)
+    if "raw_opAccept" in df.columns:
+        df = df[pd.to_numeric(df["raw_opAccept"], errors="coerce") == 1]
+    ts = pd.to_datetime(df["timestamp_iso"], utc=True, errors="coerce", format="ISO8601")
+    df, ts = df[ts.notna()], ts[ts.notna()]
+    ts_ms = (ts - EPOCH) // pd.Timedelta(1, "ms")
+    score = (pd.to_numeric(df["raw_opScore"], errors="coerce").fillna(0).astype("int64")
+             if "raw_opScore" in df.columns else pd.Series(0, index=df.index))
+    amount = df["amount"]
+    if "raw_amt" in df.columns:
+        amount = df["raw_amt"].where(df["raw_amt"] != "", amount)
+    op_type = df["op_type"].str.lower()
+    if "raw_pre" in df.columns:
+        amount = amount.where(op_type != "deploy", df["raw_pre"])
+    recs = [
+        (int(t), int(s), tx, op, src, dst, str(to_units(a)))
+        for t, s, tx, op, src, dst, a in zip(ts_ms, score, df["tx_id"], op_type, df["from"], df["to"], amount)
+    ]
+    return recs, n - len(recs)
+
+# -----------------------------
+# Balance engine
+# -----------------------------
+
+def apply_op(state: Dict[str, List[int]], op_type: str, src: str, dst: str, units: int) -> None:
+    """Apply one op's deltas to `state` (address → [balance, locked] in units)."""
+    def add(addr: str, slot: int, delta: int) -> None:
+        if not addr or not delta:
+            return
+        h = state.setdefault(addr, [0, 0])
+        h[slot] += delta
+        if h == [0, 0]:
+            del state[addr]
+
+    if op_type in ("mint", "issue", "deploy"):
+        add(dst, 0, units)
+    elif op_type == "transfer":
+        add(src, 0, -units)
+        add(dst, 0, units)
+    elif op_type == "list":
+        add(src, 0, -units)
+        add(src, 1, units)
+    elif op_type == "send":
+        add(src, 1, -units)
+        add(dst, 0, units)
+    elif op_type == "burn":
+        add(src, 0, -units)
+
+def holders_frame(state: Dict[str, List[int]]) -> pd.DataFrame:
+    """State → holders sorted by total (balance + locked) desc, amounts as exact token strings."""
+    ranked = sorted(state.items(), key=lambda kv: (-(kv[1][0] + kv[1][1]), kv[0]))
+    return pd.DataFrame(
+        [(a, format_units(b), format_units(l), format_units(b + l)) for a, (b, l) in ranked],
+        columns=HOLDER_COLUMNS,
+    )
+
+class BalanceEngine:
+    """
+    SQLite state file for one token: the log of applied ops (`ops`), the
+    current balances (`balances`), state snapshots (`snapshots`) and the key
+    of the last applied op (`meta`). Amounts are stored as decimal strings of
+    units, so they never overflow SQLite integers.
+    """
+
+    def __init__(self, path: Path, token: Optional[str] = None, snapshot_ops: int = SNAPSHOT_OPS):
+        self.path = Path(path)
+        self.snapshot_ops = max(1, snapshot_ops)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ops (
+                tx_id TEXT PRIMARY KEY, ts_ms INTEGER NOT NULL, score INTEGER NOT NULL,
+                op_type TEXT, from_addr TEXT, to_addr TEXT, units TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ops_order ON ops (ts_ms, score, tx_id);
+            CREATE TABLE IF NOT EXISTS balances (address TEXT PRIMARY KEY, balance TEXT, locked TEXT) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY, ts_ms INTEGER NOT NULL, score INTEGER NOT NULL, tx_id TEXT NOT NULL,
+                ops INTEGER NOT NULL, state BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_order ON snapshots (ts_ms, score, tx_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        known = self._get("token")
+        if token is not None and known is None:
+            self._set("token", token.upper())
+            self.conn.commit()
+            known = token.upper()
+        elif token is not None and known != token.upper():
+            raise SystemExit(f"{self.path} holds {known} balances, not {token.upper()}; use another --state")
+        self.token = known
+        self.state: Dict[str, List[int]] = {
+            a: [int(b), int(l)] for a, b, l in self.conn.execute("SELECT address, balance, locked FROM balances")
+        }
+
+    def __enter__(self) -> "BalanceEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _get(self, key: str, default: Any = None) -> Any:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set(self, key: str, value: Any) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    @property
+    def head(self) -> Optional[Key]:
+        """Key of the last applied op (None before the first update)."""
+        h = self._get("head")
+        return tuple(h) if h else None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM ops").fetchone()[0]
+
+    def _known(self, tx_ids: List[str]) -> set:
+        found = set()
+        for i in range(0, len(tx_ids), 500):
+            chunk = tx_ids[i:i + 500]
+            q = f"SELECT tx_id FROM ops WHERE tx_id IN ({','.join('?' * len(chunk))})"
+            found.update(r[0] for r in self.conn.execute(q, chunk))
+        return found
+
+    def _log(self, recs: List[Tuple]) -> Optional[Key]:
+        """Insert unseen ops into the log; returns the smallest key among them."""
+        ids = list(dict.fromkeys(r[2] for r in recs))
+        known = self._known(ids)
+        fresh = [r for r in recs if r[2] not in known]
+        if not fresh:
+            return None
+        self.conn.executemany("INSERT OR IGNORE INTO ops VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              ((r[2], r[0], r[1], r[3], r[4], r[5], r[6]) for r in fresh))
+        return min(r[:3] for r in fresh)
+
+    def _snapshot_before(self, key: Key) -> Optional[Tuple]:
+        return self.conn.execute(
+            "SELECT id, ts_ms, score, tx_id, ops, state FROM snapshots WHERE (ts_ms, score, tx_id) < (?, ?, ?) "
+            "ORDER BY ts_ms DESC, score DESC, tx_id DESC LIMIT 1", key,
+        ).fetchone()
+
+    @staticmethod
+    def _load_snapshot(snap: Optional[Tuple]) -> Tuple[Dict[str, List[int]], Optional[Key], int]:
+        if snap is None:
+            return {}, None, 0
+        state = json.loads(zlib.decompress(snap[5]))
+        return state, (snap[1], snap[2], snap[3]), snap[4]
+
+    def _ops_after(self, key: Optional[Key], until_ms: Optional[int] = None) -> Iterator[Tuple]:
+        sql = "SELECT ts_ms, score, tx_id, op_type, from_addr, to_addr, units FROM ops"
+        where, params = [], []
+        if key is not None:
+            where.append("(ts_ms, score, tx_id) > (?, ?, ?)")
+            params.extend(key)
+        if until_ms is not None:
+            where.append("ts_ms <= ?")
+            params.append(until_ms)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self.conn.execute(sql + " ORDER BY ts_ms, score, tx_id", params)
+
+    def update(self, frames: Iterable[pd.DataFrame], verbose: bool = False) -> Dict[str, int]:
+        """
+        Log the unseen accepted ops of the token from `frames` (normalized op
+        chunks) and apply them to the state in one transaction. Returns
+        counters: new, skipped, applied (incl. re-applied after a rewind),
+        snapshots, rewound (1 if older ops forced a rewind).
+        """
+        if self.token is None:
+            raise SystemExit(f"{self.path}: no token bound yet; pass --token")
+        stats = {"new": 0, "skipped": 0, "applied": 0, "snapshots": 0, "rewound": 0}
+        head = self.head
+        oldest: Optional[Key] = None
+        before = len(self)
+        for df in frames:
+            recs, skipped = op_records(df, self.token)
+            stats["skipped"] += skipped
+            low = self._log(recs)
+            if low is not None and (oldest is None or low < oldest):
+                oldest = low
+        stats["new"] = len(self) - before
+        if oldest is None:
+            self.conn.commit()
+            return stats
+
+        applied = self._get("applied", 0)
+        if head is not None and oldest <= head:
+            # late ops: restart from the last snapshot before the oldest of them
+            snap = self._snapshot_before(oldest)
+            if verbose:
+                print(f"[balances] ops older than {head!r} arrived: rewinding to the last snapshot before {oldest!r}")
+            self.state, head, applied = self._load_snapshot(snap)
+            self.conn.execute("DELETE FROM snapshots WHERE (ts_ms, score, tx_id) >= (?, ?, ?)", oldest)
+            stats["rewound"] = 1
+        since = self._get("since_snapshot", 0) if not stats["rewound"] else 0
+        state = self.state
+        for ts_ms, score, tx_id, op_type, src, dst, units in self._ops_after(head):
+            apply_op(state, op_type, src, dst, int(units))
+            head = (ts_ms, score, tx_id)
+            applied += 1
+            since += 1
+            stats["applied"] += 1
+            if since >= self.snapshot_ops:
+                blob = zlib.compress(json.dumps(state, separators=(",", ":")).encode())
+                self.conn.execute("INSERT INTO snapshots (ts_ms, score, tx_id, ops, state) VALUES (?, ?, ?, ?, ?)",
+                                  (*head, applied, blob))
+                stats["snapshots"] += 1
+                since = 0
+        self.conn.execute("DELETE FROM balances")
+        self.conn.executemany("INSERT INTO balances VALUES (?, ?, ?)",
+                              ((a, str(b), str(l)) for a, (b, l) in state.items()))
+        self._set("head", list(head))
+        self._set("applied", applied)
+        self._set("since_snapshot", since)
+        self.conn.commit()
+        if verbose:
+            neg = sum(1 for b, l in state.values() if b < 0 or l < 0)
+            print(f"[balances] new={stats['new']} applied={stats['applied']} snapshots={stats['snapshots']} "
+                  f"holders={len(state)} negative={neg} head={head!r}")
+        return stats
+
+    def state_at(self, at_ms: Optional[int] = None) -> Dict[str, List[int]]:
+        """address → [balance, locked] after every logged op with timestamp <= at_ms (None = latest)."""
+        head = self.head
+        if at_ms is None or head is None or at_ms >= head[0]:
+            return {a: list(v) for a, v in self.state.items()}
+        snap = self._snapshot_before((at_ms + 1, -2 ** 63, ""))
+        state, key, _ = self._load_snapshot(snap)
+        for _, _, _, op_type, src, dst, units in self._ops_after(key, until_ms=at_ms):
+            apply_op(state, op_type, src, dst, int(units))
+        return state
+
+    def balances_at(self, at_ms: Optional[int] = None) -> pd.DataFrame:
+        """Every holder as of at_ms (None = latest), ranked by total."""
+        return holders_frame(self.state_at(at_ms))
+
+    def top_holders(self, n: int = 20, at_ms: Optional[int] = None) -> pd.DataFrame:
+        """Top-n holders by total (balance + locked) as of at_ms, with a 1-based rank."""
+        df = self.balances_at(at_ms).head(n)
+        df.insert(0, "rank", range(1, len(df) + 1))
+        return df
+
+    def close(self) -> None:
+        self.conn.close()
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Incremental KRC-20 holder balances from tracekrc20_kasplex_full.py ops")
+    p.add_argument("command", choices=["update", "balances", "top"],
+                   help="update = apply new ops to the state; balances / top = query it")
+    p.add_argument("--state", required=True, type=Path, help="SQLite state file (created by the first update)")
+    p.add_argument("--ops", type=Path, help="update: normalized ops (CSV file or Parquet directory; --wide keeps raw_amt/raw_opAccept)")
+    p.add_argument("--token", help="update: ticker to track (bound to the state file on first use)")
+    p.add_argument("--allow-narrow", action="store_true",
+                   help="update: accept ops without raw_opAccept/raw_amt (rejected ops are applied too)")
+    p.add_argument("--snapshot-ops", type=int, default=SNAPSHOT_OPS, help="update: applied ops between snapshots (default: %(default)s)")
+    p.add_argument("--at", type=parse_at, default=None, help="balances/top: as of this time (epoch ms/s or ISO date, UTC; default: latest op)")
+    p.add_argument("-n", "--top", type=int, default=20, help="top: number of holders (default: %(default)s)")
+    p.add_argument("--out", type=Path, help="balances/top: write CSV here instead of printing")
+    p.add_argument("--verbose", action="store_true", help="Verbose logs")
+    return p.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command != "update" and not args.state.exists():
+        raise SystemExit(f"{args.state}: no such state file; run update first")
+    with BalanceEngine(args.state, args.token, snapshot_ops=args.snapshot_ops) as engine:
+        if args.command == "update":
+            if not args.ops:
+                raise SystemExit("update needs --ops")
+            stats = engine.update(iter_op_frames(args.ops, allow_narrow=args.allow_narrow), verbose=args.verbose)
+            print(f"[balances] {engine.token}: new_ops={stats['new']} applied={stats['applied']} "
+                  f"skipped={stats['skipped']} snapshots={stats['snapshots']} holders={len(engine.state)}")
+            return
+        if args.command == "top":
+            df = engine.top_holders(args.top, args.at)
+        else:
+            df = engine.balances_at(args.at)
+    if args.out:
+        df.to_csv(args.out, index=False, lineterminator="\n")
+        print(f"[write] {args.out} rows={len(df)}")
+    else:
+        print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nInterrupted.", file=sys.stderr)
+        sys.exit(130)
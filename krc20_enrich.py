@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+krc20_enrich.py — attach the underlying Kaspa L1 transaction to each KRC-20 op
+written by tracekrc20_kasplex_full.py
+
+Highlights
+- An op's tx_id is its Kasplex hashRev, i.e. the id of the Kaspa L1 reveal
+  transaction; ids are resolved in batches through the Kaspa API transaction
+  search (POST /transactions/search, previous outpoints resolved), with
+  --workers batches in flight on the shared adaptive HTTP client
+- Persistent tx cache (SQLite): every resolved transaction is stored once
+  (block time, acceptance, input and output addresses/amounts in sompi), so
+  repeated runs and tx_ids shared between ops or files never refetch. Ids
+  the API does not return are remembered as missing and only asked for again
+  with --retry-missing
+- Streams the ops (CSV chunks or a Parquet part directory) and writes every
+  op column plus:
+    l1_status        ok / missing / "" (op without tx_id)
+    l1_block_time    ISO-8601 UTC
+    l1_accepted      1 / 0 / "" (not reported)
+    l1_senders       distinct input addresses, ";"-joined
+    l1_input_sompi, l1_output_sompi, l1_fee_sompi
+    l1_inputs, l1_outputs   JSON [[address, sompi], ...] in tx order
+
+Usage
+------
+python krc20_enrich.py --ops data/slow_token_ops.csv --cache data/l1_tx_cache.sqlite \
+  --out data/slow_token_ops_l1.csv --workers 4
+
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from tracer_http import HttpClient, loads
+from tracer_store import ms_to_iso
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+API_BASE = "https://api.kaspa.org"
+BATCH_IDS = 250         # tx ids per search request (the API caps a search at 1000)
+MAX_BATCH_IDS = 1000
+READ_CHUNK = 50000      # op rows read per chunk
+NO_ADDRESS = {"", "UNKNOWN", None}
+L1_COLUMNS = ["l1_status", "l1_block_time", "l1_accepted", "l1_senders", "l1_input_sompi",
+              "l1_output_sompi", "l1_fee_sompi", "l1_inputs", "l1_outputs"]
+
+# (tx_id, block_time ms, accepted, [(address, sompi), ...] inputs, [(address, sompi), ...] outputs)
+L1Tx = Tuple[str, Optional[int], Optional[int], List[Tuple[str, int]], List[Tuple[str, int]]]
+
+# -----------------------------
+# Tx cache
+# -----------------------------
+
+class TxCache:
+    """
+    SQLite cache of resolved L1 transactions (txs) and of the ids the API
+    did not return (missing). Used from the main thread only; the fetch
+    threads just return decoded transactions.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS txs (
+                tx_id TEXT PRIMARY KEY, block_time INTEGER, accepted INTEGER,
+                inputs TEXT NOT NULL, outputs TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS missing (tx_id TEXT PRIMARY KEY, checked_ms INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+
+    def __enter__(self) -> "TxCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM txs").fetchone()[0]
+
+    def _select(self, table: str, cols: str, tx_ids: List[str]) -> Iterator[Tuple]:
+        for i in range(0, len(tx_ids), 500):
+            batch = tx_ids[i:i + 500]
+            yield from self.conn.execute(
+                f"SELECT {cols} FROM {table} WHERE tx_id IN ({','.join('?' * len(batch))})", batch)
+
+    def get(self, tx_ids: Iterable[str]) -> Dict[str, L1Tx]:
+        """Cached transactions among tx_ids."""
+        rows = self._select("txs", "tx_id, block_time, accepted, inputs, outputs", list(tx_ids))
+        return {r[0]: (r[0], r[1], r[2], [tuple(x) for x in json.loads(r[3])], [tuple(x) for x in json.loads(r[4])])
+                for r in rows}
+
+    def missing(self, tx_ids: Iterable[str]) -> set:
+        """Ids among tx_ids recorded as not found by an earlier run."""
+        return {r[0] for r in self._select("missing", "tx_id", list(tx_ids))}
+
+    def put(self, txs: Iterable[L1Tx], not_found: Iterable[str] = ()) -> None:
+        txs = list(txs)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?)",
+                ((t[0], t[1], t[2], json.dumps(t[3]), json.dumps(t[4])) for t in txs),
+            )
+            self.conn.executemany("DELETE FROM missing WHERE tx_id = ?", ((t[0],) for t in txs))
+            now = int(time.time() * 1000)
+            self.conn.executemany("INSERT OR REPLACE INTO missing VALUES (?, ?)", ((t, now) for t in not_found))
+
+    def close(self) -> None:
+        self.conn.close()
+
+# -----------------------------
+# Kaspa API lookup
+# -----------------------------
+
+def _l1_tx(tx: Dict[str, Any]) -> L1Tx:
+    inputs = [(i.get("previous_outpoint_address") or "UNKNOWN", int(i.get("previous_outpoint_amount") or 0))
+              for i in tx.get("inputs") or [] if isinstance(i, dict)]
+    outputs = [(o.get("script_public_key_address") or "UNKNOWN", int(o.get("amount") or 0))
+               for o in tx.get("outputs") or [] if isinstance(o, dict)]
+    accepted = tx.get("is_accepted")
+    return (tx.get("transaction_id", tx.get("txId")), int(tx["block_time"]) if tx.get("block_time") else None,
+            None if accepted is None else int(bool(accepted)), inputs, outputs)
+
+def search_transactions(client: HttpClient, tx_ids: List[str], api_base: str = API_BASE) -> List[L1Tx]:
+    """One batched lookup; returns the transactions the API knows (any order)."""
+    url = f"{api_base}/transactions/search"
+    r = client.post(url, params={"resolve_previous_outpoints": "light"}, json={"transactionIds": tx_ids})
+    r.raise_for_status()
+    data = loads(r.content)
+    if not isinstance(data, list):
+        raise RuntimeError(f"Unexpected transaction search response from {url}: {str(data)[:200]}")
+    wanted = set(tx_ids)
+    return [t for t in (_l1_tx(tx) for tx in data if isinstance(tx, dict)) if t[0] in wanted]
+
+def resolve(cache: TxCache, client: HttpClient, tx_ids: Iterable[str], batch_ids: int = BATCH_IDS,
+            workers: int = 4, retry_missing: bool = False, api_base: str = API_BASE,
+            stats: Optional[Dict[str, int]] = None, verbose: bool = False) -> Dict[str, L1Tx]:
+    """
+    Transactions for tx_ids: cached ones from the cache, the rest fetched in
+    batches of `batch_ids` with up to `workers` batches in flight, then
+    cached. Returns only the ids that resolved.
+    """
+    stats = stats if stats is not None else {}
+    tx_ids = list(dict.fromkeys(t for t in tx_ids if t))
+    found = cache.get(tx_ids)
+    todo = [t for t in tx_ids if t not in found]
+    skipped = set() if retry_missing else cache.missing(todo)
+    todo = [t for t in todo if t not in skipped]
+    stats["cached"] = stats.get("cached", 0) + len(found)
+    stats["known_missing"] = stats.get("known_missing", 0) + len(skipped)
+    if not todo:
+        return found
+    batches = [todo[i:i + batch_ids] for i in range(0, len(todo), batch_ids)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(search_transactions, client, b, api_base): b for b in batches}
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            txs = fut.result()
+            got = {t[0] for t in txs}
+            not_found = [t for t in batch if t not in got]
+            cache.put(txs, not_found)
+            found.update((t[0], t) for t in txs)
+            stats["fetched"] = stats.get("fetched", 0) + len(txs)
+            stats["not_found"] = stats.get("not_found", 0) + len(not_found)
+            if verbose:
+                print(f"[l1] batch of {len(batch)}: found={len(txs)} missing={len(not_found)}")
+    return found
+
+# -----------------------------
+# Enrichment
+# -----------------------------
+
+def iter_ops(ops: Path, chunk_rows: int = READ_CHUNK) -> Iterator[pd.DataFrame]:
+    """All columns of a tracer output (CSV file or Parquet part directory) in chunks."""
+    ops = Path(ops)
+    if ops.is_dir():
+        from tracekrc20_kasplex_full import read_op_store
+        df = read_op_store(ops)
+        for i in range(0, len(df), chunk_rows):
+            yield df.iloc[i:i + chunk_rows]
+        return
+    yield from pd.read_csv(ops, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+def l1_columns(tx_ids: Iterable[Any], txs: Dict[str, L1Tx]) -> pd.DataFrame:
+    """The L1_COLUMNS for ops with these tx_ids (one row per op, in order)."""
+    rows = []
+    for tx_id in tx_ids:
+        tx = txs.get(tx_id) if isinstance(tx_id, str) and tx_id else None
+        if tx is None:
+            rows.append(("missing" if isinstance(tx_id, str) and tx_id else "",) + ("",) * (len(L1_COLUMNS) - 1))
+            continue
+        _, block_time, accepted, inputs, outputs = tx
+        total_in = sum(v for _, v in inputs)
+        total_out = sum(v for _, v in outputs)
+        rows.append((
+            "ok",
+            ms_to_iso([block_time])[0],
+            "" if accepted is None else str(accepted),
+            ";".join(dict.fromkeys(a for a, _ in inputs if a not in NO_ADDRESS)),
+            str(total_in), str(total_out), str(total_in - total_out) if inputs else "",
+            json.dumps([list(x) for x in inputs], separators=(",", ":")),
+            json.dumps([list(x) for x in outputs], separators=(",", ":")),
+        ))
+    return pd.DataFrame(rows, columns=L1_COLUMNS)
+
+def enrich_ops(ops: Path, out: Path, cache: TxCache, client: HttpClient, batch_ids: int = BATCH_IDS,
+               workers: int = 4, retry_missing: bool = False, api_base: str = API_BASE,
+               chunk_rows: int = READ_CHUNK, verbose: bool = False) -> Dict[str, int]:
+    """Stream `ops` to `out` (CSV) with the L1 columns attached; returns counters."""
+    stats: Dict[str, int] = {"ops": 0, "ok": 0}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    header = True
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        for chunk in iter_ops(ops, chunk_rows):
+            if "tx_id" not in chunk.columns:
+                raise SystemExit(f"{ops}: no tx_id column")
+            chunk = chunk.drop(columns=[c for c in L1_COLUMNS if c in chunk.columns]).reset_index(drop=True)
+            ids = chunk["tx_id"].where(chunk["tx_id"].notna(), "").astype(str)
+            txs = resolve(cache, client, ids, batch_ids, workers, retry_missing, api_base, stats, verbose)
+            extra = l1_columns(ids, txs)
+            pd.concat([chunk, extra], axis=1).to_csv(f, index=False, header=header, lineterminator="\n")
+            header = False
+            stats["ops"] += len(chunk)
+            stats["ok"] += int((extra["l1_status"] == "ok").sum())
+            if verbose:
+                print(f"[enrich] ops={stats['ops']} resolved={stats['ok']}")
+    tmp.replace(out)
+    return stats
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Attach Kaspa L1 transaction inputs/outputs to KRC-20 ops by tx_id (hashRev)")
+    p.add_argument("--ops", required=True, type=Path, help="Ops output of tracekrc20_kasplex_full.py (CSV or Parquet directory)")
+    p.add_argument("--out", required=True, type=Path, help="Enriched ops CSV")
+    p.add_argument("--cache", required=True, type=Path, help="SQLite L1 tx cache (created if missing, shared across runs)")
+    p.add_argument("--api-base", default=API_BASE, help="Kaspa API base URL (default: %(default)s)")
+    p.add_argument("--batch", type=int, default=BATCH_IDS, help=f"tx ids per lookup request, at most {MAX_BATCH_IDS} (default: %(default)s)")
+    p.add_argument("--workers", type=int, default=4, help="Lookup requests in flight (default: %(default)s)")
+    p.add_argument("--rps", type=float, default=4.0, help="Initial requests/second; grows while responses are healthy, backs off on 429/5xx")
+    p.add_argument("--max-rps", type=float, default=None, help="Requests/second ceiling (default: none)")
+    p.add_argument("--retry-missing", action="store_true", help="Look up again ids an earlier run did not find")
+    p.add_argument("--verbose", action="store_true", help="Verbose logs")
+    args = p.parse_args(argv)
+    if not 1 <= args.batch <= MAX_BATCH_IDS:
+        p.error(f"--batch must be between 1 and {MAX_BATCH_IDS}")
+    if args.workers < 1:
+        p.error("--workers must be at least 1")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if not args.ops.exists():
+        raise SystemExit(f"{args.ops}: no such ops output")
+    client = HttpClient(rps=args.rps, max_rps=args.max_rps, max_per_host=args.workers,
+                        pool_size=max(16, args.workers), log=print if args.verbose else None)
+    with TxCache(args.cache) as cache:
+        stats = enrich_ops(args.ops, args.out, cache, client, args.batch, args.workers, args.retry_missing,
+                           args.api_base.rstrip("/"), verbose=args.verbose)
+        cached = len(cache)
+    print(f"[write] {args.out} ops={stats['ops']} resolved={stats['ok']}")
+    print(f"[l1] cache_hits={stats.get('cached', 0)} fetched={stats.get('fetched', 0)} "
+          f"not_found={stats.get('not_found', 0)} skipped_missing={stats.get('known_missing', 0)} "
+          f"cache_size={cached} http: {client.summary()}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nInterrupted.", file=sys.stderr)
+        sys.exit(130)
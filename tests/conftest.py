@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    """trace_kaspa_fullhistory with DATA_DIR (and the cwd) in a temp directory."""
+    monkeypatch.chdir(tmp_path)
+    import trace_kaspa_fullhistory
+    data_dir = tmp_path / "flow_data_fullhistory"
+    data_dir.mkdir(exist_ok=True)
+    monkeypatch.setattr(trace_kaspa_fullhistory, "DATA_DIR", str(data_dir))
+    return trace_kaspa_fullhistory
+
+def fake_history(tracer, monkeypatch, histories):
+    """Serve fetch_page from {address: [tx, ...]} (newest first), paging on block_time < before."""
+    def fetch_page(address, before):
+        return [tx for tx in histories.get(address, []) if tx["block_time"] < before][:tracer.PAGE_LIMIT]
+    monkeypatch.setattr(tracer, "fetch_page", fetch_page)
+
+def make_tx(tx_id, block_time, inputs, outputs):
+    return {
+        "transaction_id": tx_id,
+        "block_time": block_time,
+        "inputs": [{"previous_outpoint_address": a, "previous_outpoint_amount": v} for a, v in inputs],
+        "outputs": [{"script_public_key_address": a, "amount": v} for a, v in outputs],
+    }
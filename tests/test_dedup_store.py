@@ -0,0 +1,97 @@
+import pandas as pd
+
+from conftest import fake_history, make_tx
+
+A = "kaspa:qa"
+B = "kaspa:qb"
+C = "kaspa:qc"
+
+def _involving(tracer, address):
+    path = f"{tracer.DATA_DIR}/{address.replace(':', '_')}_involving.csv"
+    return pd.read_csv(path, dtype={"tx_id": str})
+
+def test_dedup_store_alone_keeps_shared_txs_in_involving(tracer, monkeypatch, tmp_path):
+    shared = make_tx("shared", 1_700_000_002_000, [(A, 10 ** 9)], [(B, 6 * 10 ** 8), (A, 4 * 10 ** 8)])
+    only_a = make_tx("only_a", 1_700_000_001_000, [(C, 10 ** 9)], [(A, 10 ** 9)])
+    only_b = make_tx("only_b", 1_700_000_000_000, [(B, 10 ** 8)], [(C, 10 ** 8)])
+    fake_history(tracer, monkeypatch, {A: [shared, only_a], B: [shared, only_b]})
+
+    dedup = tracer.TxDedupStore(str(tmp_path / "dedup.sqlite"))
+    try:
+        flows_a = tracer.trace_wallet(A, dedup=dedup)
+        flows_b = tracer.trace_wallet(B, dedup=dedup)
+    finally:
+        dedup.close()
+
+    assert "shared" in set(_involving(tracer, A)["tx_id"])
+    inv_b = _involving(tracer, B)
+    assert list(inv_b["tx_id"]) == ["shared", "only_b"]
+    assert inv_b.loc[inv_b["tx_id"] == "shared", "amount_sompi"].sum() == 6 * 10 ** 8
+    assert flows_b["in"][A] == 6 * 10 ** 8
+    assert flows_a["out"][B] == 6 * 10 ** 8
+
+def test_dedup_store_keeps_shared_txs_in_columnar_store(tracer, monkeypatch, tmp_path):
+    shared = make_tx("shared", 1_700_000_002_000, [(A, 10 ** 9)], [(B, 10 ** 9)])
+    only_b = make_tx("only_b", 1_700_000_000_000, [(B, 10 ** 8)], [(C, 10 ** 8)])
+    fake_history(tracer, monkeypatch, {A: [shared], B: [shared, only_b]})
+
+    dedup = tracer.TxDedupStore(str(tmp_path / "dedup.sqlite"))
+    try:
+        for address in (A, B):
+            tracer.trace_wallet(address, storage="both", dedup=dedup)
+    finally:
+        dedup.close()
+
+    tables = tracer.read_tx_store(f"{tracer.DATA_DIR}/{B.replace(':', '_')}_store")
+    assert sorted(tables["transactions"]["tx_id"]) == ["only_b", "shared"]
+
+def test_dedup_store_known_txs_reach_edge_aggregate_in_later_run(tracer, monkeypatch, tmp_path):
+    from kaspa_edges import FlowEdges
+
+    shared = make_tx("shared", 1_700_000_002_000, [(A, 10 ** 9)], [(B, 10 ** 9)])
+    only_b = make_tx("only_b", 1_700_000_000_000, [(B, 10 ** 8)], [(C, 10 ** 8)])
+    fake_history(tracer, monkeypatch, {A: [shared], B: [shared, only_b]})
+
+    # First run resolves `shared` into the dedup store only; the second run
+    # builds the aggregate and sees `shared` as already known.
+    dedup = tracer.TxDedupStore(str(tmp_path / "dedup.sqlite"))
+    try:
+        tracer.trace_wallet(A, dedup=dedup)
+    finally:
+        dedup.close()
+    dedup = tracer.TxDedupStore(str(tmp_path / "dedup.sqlite"))
+    edges = FlowEdges(str(tmp_path / "edges.sqlite"))
+    try:
+        tracer.trace_wallet(B, dedup=dedup, edges=edges)
+        agg = edges.edges().set_index(["sender", "recipient"])
+    finally:
+        edges.close()
+        dedup.close()
+
+    assert agg.loc[(A, B), "amount_sompi"] == 10 ** 9
+    assert agg.loc[(B, C), "amount_sompi"] == 10 ** 8
+
+def test_dedup_store_known_txs_reach_query_store_in_later_run(tracer, monkeypatch, tmp_path):
+    from tracer_store import QueryStore
+
+    shared = make_tx("shared", 1_700_000_002_000, [(A, 10 ** 9)], [(B, 10 ** 9)])
+    only_b = make_tx("only_b", 1_700_000_000_000, [(B, 10 ** 8)], [(C, 10 ** 8)])
+    fake_history(tracer, monkeypatch, {A: [shared], B: [shared, only_b]})
+
+    dedup = tracer.TxDedupStore(str(tmp_path / "dedup.sqlite"))
+    try:
+        tracer.trace_wallet(A, dedup=dedup)
+    finally:
+        dedup.close()
+    dedup = tracer.TxDedupStore(str(tmp_path / "dedup.sqlite"))
+    qstore = QueryStore(tmp_path / "query.sqlite")
+    try:
+        tracer.trace_wallet(B, dedup=dedup, qstore=qstore)
+        shared_rows = qstore.lookup("shared")
+        timeline = qstore.timeline(B)
+    finally:
+        qstore.close()
+        dedup.close()
+
+    assert len(shared_rows) == 1
+    assert set(timeline["tx_id"]) == {"shared", "only_b"}
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from conftest import fake_history, make_tx
+
+ROOT = "kaspa:qroot"
+F1 = "kaspa:qf1"
+F2 = "kaspa:qf2"
+F3 = "kaspa:qf3"
+
+def test_failed_crawls_are_flagged_and_not_counted(tracer, monkeypatch):
+    fake_history(tracer, monkeypatch, {
+        ROOT: [make_tx(f"t{i}", 1_700_000_000_000 + i, [(f, (4 - i) * 10 ** 9)], [(ROOT, (4 - i) * 10 ** 9)])
+               for i, f in enumerate((F1, F2, F3))],
+    })
+    served = tracer.fetch_page
+
+    def fetch_page(address, before):
+        if address == F1:
+            raise RuntimeError("boom")
+        return served(address, before)
+    monkeypatch.setattr(tracer, "fetch_page", fetch_page)
+
+    nodes = tracer.crawl_funding_graph([ROOT], max_depth=1, max_nodes=3)
+
+    # F1 (the heaviest funder) fails, so its slot goes to F3.
+    assert [(n["address"], n["error"]) for n in nodes] == [(ROOT, ""), (F1, "failed"), (F2, ""), (F3, "")]
+    df = pd.read_csv(f"{tracer.DATA_DIR}/funding_graph_nodes.csv", keep_default_na=False)
+    assert list(df["error"]) == ["", "failed", "", ""]
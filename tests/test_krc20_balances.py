@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+import krc20_balances
+
+def _ops(path, wide):
+    rows = [
+        {"tx_id": "t1", "timestamp_iso": "2024-01-01T00:00:00Z", "token": "SLOW", "op_type": "mint",
+         "from": "", "to": "kaspa:qa", "amount": "100000000", "raw_amt": "100000000", "raw_opAccept": "1"},
+        {"tx_id": "t2", "timestamp_iso": "2024-01-02T00:00:00Z", "token": "SLOW", "op_type": "mint",
+         "from": "", "to": "kaspa:qa", "amount": "100000000", "raw_amt": "100000000", "raw_opAccept": "-1"},
+    ]
+    df = pd.DataFrame(rows)
+    if not wide:
+        df = df.drop(columns=["raw_amt", "raw_opAccept"])
+    df.to_csv(path, index=False)
+    return path
+
+def _balance(state):
+    with krc20_balances.BalanceEngine(state) as engine:
+        return engine.state.get("kaspa:qa")
+
+def test_update_refuses_narrow_ops(tmp_path):
+    ops, state = _ops(tmp_path / "ops.csv", wide=False), tmp_path / "state.sqlite"
+    with pytest.raises(SystemExit, match="--allow-narrow"):
+        krc20_balances.main(["update", "--ops", str(ops), "--state", str(state), "--token", "SLOW"])
+    assert _balance(state) is None
+
+    krc20_balances.main(["update", "--ops", str(ops), "--state", str(state), "--token", "SLOW", "--allow-narrow"])
+    assert _balance(state) == [2 * 10 ** 8, 0]
+
+def test_update_skips_rejected_wide_ops(tmp_path):
+    ops, state = _ops(tmp_path / "ops.csv", wide=True), tmp_path / "state.sqlite"
+    krc20_balances.main(["update", "--ops", str(ops), "--state", str(state), "--token", "SLOW"])
+    assert _balance(state) == [10 ** 8, 0]
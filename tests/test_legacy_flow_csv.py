@@ -0,0 +1,40 @@
+from kaspa_clusters import AddressClusters, iter_flow_txs, update_clusters
+
+# A *_all_participants.csv from before amount_sompi was written: amount_kas only.
+LEGACY_CSV = """tx_id,timestamp,sender,recipient,amount_kas
+t1,2024-01-01T00:00:00+00:00,kaspa:a,kaspa:b,1.5
+t1,2024-01-01T00:00:00+00:00,kaspa:c,kaspa:b,0.5
+t2,2024-01-02T00:00:00+00:00,kaspa:b,kaspa:d,2.00000001
+t3,2024-01-03T00:00:00+00:00,kaspa:d,kaspa:e,1
+t3,2024-01-03T00:00:00+00:00,kaspa:f,kaspa:e,1
+"""
+
+def _legacy(tmp_path):
+    path = tmp_path / "kaspa_x_all_participants.csv"
+    path.write_text(LEGACY_CSV)
+    return path
+
+def test_iter_flow_txs_derives_sompi_from_amount_kas(tmp_path):
+    txs = {tx_id: (inputs, outputs) for tx_id, _, inputs, outputs in iter_flow_txs(_legacy(tmp_path))}
+    assert txs["t1"] == (["kaspa:a", "kaspa:c"], [("kaspa:b", 200_000_000)])
+    assert txs["t2"] == (["kaspa:b"], [("kaspa:d", 200_000_001)])
+
+def test_clustering_over_legacy_csv(tmp_path):
+    path = _legacy(tmp_path)
+    with AddressClusters(tmp_path / "clusters.sqlite") as clusters:
+        stats = update_clusters(clusters, [lambda: iter_flow_txs(path)])
+        members = clusters.membership().set_index("address")
+    assert stats["txs"] == 3
+    assert members.loc["kaspa:a", "cluster"] == members.loc["kaspa:c", "cluster"] == "kaspa:a"
+    assert members.loc["kaspa:d", "cluster"] == members.loc["kaspa:f", "cluster"] == "kaspa:d"
+    assert members.loc["kaspa:b", "cluster_size"] == 1
+
+def test_query_store_ingests_legacy_csv(tmp_path):
+    from tracer_store import QueryStore, ingest_flows
+    store = QueryStore(tmp_path / "q.sqlite")
+    try:
+        assert ingest_flows(store, _legacy(tmp_path)) == 3
+        rows = store.sql("SELECT tx_id, sender, amount_sompi FROM l1_flows WHERE recipient = 'kaspa:d'")
+    finally:
+        store.close()
+    assert rows.values.tolist() == [["t2", "kaspa:b", 200_000_001]]
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from conftest import fake_history, make_tx
+
+A = "kaspa:qa"
+B = "kaspa:qb"
+
+def _history(tracer, monkeypatch):
+    new = make_tx("new", 1_700_000_002_000, [(B, 10 ** 9)], [(A, 10 ** 9)])
+    old = make_tx("old", 1_600_000_000_000, [(B, 10 ** 8)], [(A, 10 ** 8)])
+    calls = []
+    fake_history(tracer, monkeypatch, {A: [new, old]})
+    fetch = tracer.fetch_page
+    monkeypatch.setattr(tracer, "fetch_page", lambda address, before: calls.append(before) or fetch(address, before))
+    return calls
+
+def _tx_ids(tracer):
+    return list(pd.read_csv(f"{tracer.DATA_DIR}/kaspa_qa_involving.csv", dtype={"tx_id": str})["tx_id"])
+
+def test_resume_skips_address_completed_over_same_window(tracer, monkeypatch):
+    calls = _history(tracer, monkeypatch)
+    tracer.trace_wallet(A, since=1_650_000_000_000)
+    n = len(calls)
+    tracer.trace_wallet(A, since=1_650_000_000_000, resume=True)
+    assert len(calls) == n
+    assert _tx_ids(tracer) == ["new"]
+
+def test_resume_recrawls_address_completed_over_other_window(tracer, monkeypatch):
+    calls = _history(tracer, monkeypatch)
+    tracer.trace_wallet(A, since=1_650_000_000_000)
+    n = len(calls)
+    tracer.trace_wallet(A, resume=True)
+    assert len(calls) > n
+    assert _tx_ids(tracer) == ["new", "old"]
@@ -1,14 +1,48 @@
-import requests
+import argparse
+import glob
+import threading
 import time
 import os
 import json
+import shutil
+import sqlite3
+import tempfile
+import numpy as np
 import pandas as pd
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, OrderedDict
+from contextlib import ExitStack, closing
 from datetime import datetime, timezone
 
+from tracer_http import HttpClient, iter_prefetched, loads, slim_kaspa_page
+from tracer_archive import PageArchive
+from kaspa_edges import FlowEdges
+from tracer_store import QueryStore
+
+try:  # optional: only needed for --storage columnar/both
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 API_BASE = "https://api.kaspa.org"
 DATA_DIR = "flow_data_fullhistory"
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Records are flushed to the output CSVs every CHUNK_SIZE rows, which bounds
+# peak memory regardless of how long an address's history is.
+CHUNK_SIZE = 50000
+RECORD_COLUMNS = ["tx_id", "timestamp", "sender", "recipient", "amount_kas", "amount_sompi"]
+# Transactions per page yielded by the sharded crawl, and per Parquet part file
+# written by the columnar store.
+SHARD_PAGE_TXS = 500
+STORE_CHUNK_TXS = 20000
+# Pages between durable checkpoints of an in-progress address.
+CHECKPOINT_PAGES = 20
+# Pages requested ahead of the one being attributed and written.
+PREFETCH_PAGES = 2
+
 # These are the addresses to crawl at the L1 layer: Top‑20 SLOW holders
 # (as reconstructed from Kasplex KRC20 ops, accepted only, 8 decimals) plus the
 # two known brt2412 wallets (deployer + qranu...). Order preserved; duplicates removed.
@@ -124,34 +158,97 @@ ROOTS = [
 ]
 
 
+# Shared pooled client with an adaptive (AIMD) rate limit; main() replaces it
+# with one configured from the CLI.
+CLIENT = HttpClient(log=print)
+
+# Raw-page archive (--archive) records every fetched page as received;
+# with REPLAY set (--replay) pages are served from an archive instead.
+ARCHIVE = None
+REPLAY = None
+PAGE_LIMIT = 500
+REPLAY_CACHED_ADDRESSES = 8
+_replay_cache = OrderedDict()
+_replay_lock = threading.Lock()
+
+
+# Kaspa mainnet launch; nothing on L1 is older than this.
+KASPA_GENESIS_MS = int(datetime(2021, 11, 7, tzinfo=timezone.utc).timestamp() * 1000)
+
 def format_timestamp(ms):
     return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
 
-CUTOFF_DATE = datetime(2022, 1, 1)
+CUTOFF_DATE = datetime(2022, 1, 1, tzinfo=timezone.utc)
+CUTOFF_MS = int(CUTOFF_DATE.timestamp() * 1000)
 
-def is_before_cutoff(timestamp):
-    try:
-        dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-        return dt < CUTOFF_DATE
-    except Exception as e:
-        print("Timestamp parsing failed:", timestamp)
-        return False
+def parse_time_ms(value):
+    """
+    CLI time bound → integer block_time ms. Accepts epoch ms, epoch seconds,
+    or an ISO date/datetime (naive values are taken as UTC).
+    """
+    value = str(value).strip()
+    if value.isdigit():
+        v = int(value)
+        return v if v >= 10 ** 11 else v * 1000
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def fetch_page(address, before):
+    if REPLAY is not None:
+        return replay_page(address, before)
+    url = (
+        f"{API_BASE}/addresses/{address}/full-transactions-page"
+        f"?limit={PAGE_LIMIT}&before={before}&resolve_previous_outpoints=full&acceptance=accepted"
+    )
+    print(f"📦 Fetching before={before} for {address}")
+    resp = CLIENT.get(url)
+    resp.raise_for_status()
+    data = loads(resp.content)
+    if ARCHIVE is not None:
+        ARCHIVE.append("kaspa", address, before, resp.content)
+    return slim_kaspa_page(data)
 
-def fetch_transactions(address, max_pages=100000):
+def _archived_history(address):
+    """All archived transactions of an address, deduplicated, newest first (small LRU cache)."""
+    with _replay_lock:
+        if address in _replay_cache:
+            _replay_cache.move_to_end(address)
+            return _replay_cache[address]
+    txs = {}
+    for rec in REPLAY.iter_records("kaspa", address):
+        for tx in slim_kaspa_page(rec["body"]) or []:
+            if isinstance(tx, dict):
+                txs.setdefault(tx.get("transaction_id", tx.get("txId", "UNKNOWN")), tx)
+    ordered = sorted(txs.values(), key=lambda tx: -tx.get("block_time", 0))
+    history = ([-tx.get("block_time", 0) for tx in ordered], ordered)
+    with _replay_lock:
+        _replay_cache[address] = history
+        while len(_replay_cache) > REPLAY_CACHED_ADDRESSES:
+            _replay_cache.popitem(last=False)
+    return history
+
+def replay_page(address, before):
+    """
+    Answer a full-transactions-page request from the archive: up to PAGE_LIMIT
+    archived transactions with block_time < before, newest first, the way the
+    API pages. Any cursor works, so sharded, incremental and --since runs can
+    be replayed from pages fetched by a different kind of run.
+    """
+    print(f"📦 Replaying before={before} for {address}")
+    keys, ordered = _archived_history(address)
+    start = bisect_right(keys, -before)
+    return ordered[start:start + PAGE_LIMIT]
+
+def fetch_transactions(address, max_pages=100000, since=CUTOFF_MS, until=None):
     records = []
-    before = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    before = until if until is not None else int(datetime.now(tz=timezone.utc).timestamp() * 1000)
     foundcutoff = False
     
     for _ in range(max_pages):
-        url = (
-            f"{API_BASE}/addresses/{address}/full-transactions-page"
-            f"?limit=500&before={before}&resolve_previous_outpoints=full&acceptance=accepted"
-        )
-        print(f"📦 Fetching before={before} for {address}")
         try:
-            resp = requests.get(url, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
+            data = fetch_page(address, before)
         except Exception as e:
             print(f"❌ Error fetching transactions: {e}")
             break
@@ -172,7 +269,7 @@ def fetch_transactions(address, max_pages=100000):
             # outputs = tx.get("outputs", [])
             outputs = tx.get("outputs") or []
 
-            if is_before_cutoff(timestamp):
+            if since is not None and tx.get("block_time", 0) < since:
                 print("Reached cutoff date at:", timestamp)
                 foundcutoff = True
                 break
@@ -196,95 +293,1045 @@ def fetch_transactions(address, max_pages=100000):
 
     return pd.DataFrame(records)
 
-def fetch_transactions_all_participants(address, max_pages=100000):
+class RecordWriter:
+    """
+    Append-only CSV sink for sender→recipient record frames. Frames are
+    buffered and flushed every `chunk_size` rows, so memory stays bounded by
+    one chunk. `resume_at=(size, rows)` reopens a file written earlier, drops
+    anything past byte `size` and keeps appending after it.
+    """
+
+    def __init__(self, path, chunk_size=None, resume_at=None):
+        self.path = path
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.rows = 0
+        self._buf = []
+        self._buffered = 0
+        if resume_at:
+            size, self.rows = resume_at
+            self._f = open(path, "r+", newline="", encoding="utf-8")
+            self._f.truncate(size)
+            self._f.seek(size)
+        else:
+            self._f = open(path, "w", newline="", encoding="utf-8")
+            self._f.write(",".join(RECORD_COLUMNS) + "\n")
+
+    @property
+    def size(self):
+        """Bytes on disk; only meaningful right after flush()."""
+        return self._f.tell()
+
+    def write(self, frame):
+        if len(frame):
+            self._buf.append(frame)
+            self._buffered += len(frame)
+        if self._buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            pd.concat(self._buf).to_csv(self._f, header=False, index=False, columns=RECORD_COLUMNS)
+            self.rows += self._buffered
+            self._buf = []
+            self._buffered = 0
+        self._f.flush()
+
+    def close(self):
+        self.flush()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attribute_page(txs):
+    """
+    Batched attribution of a page of transactions. Every output is split
+    across the tx's senders in proportion to their input contribution using
+    exact integer sompi: each sender gets floor(amount * contribution / total)
+    and the leftover sompi go one each to the largest remainders (ties to the
+    earlier sender), so the splits of an output always sum to the output.
+    Returns one DataFrame row per sender×output edge in RECORD_COLUMNS order.
+    """
+    tx_ids, stamps, totals = [], [], []
+    senders, contribs, sender_tx = [], [], []
+    recipients, amounts, out_tx = [], [], []
+    for tx in txs:
+        # Build full input set (transaction-level context)
+        input_summary = {}
+        for inp in tx.get("inputs") or []:
+            sender = inp.get("previous_outpoint_address", "UNKNOWN")
+            input_summary[sender] = input_summary.get(sender, 0) + int(inp.get("previous_outpoint_amount", 0))
+        total_input_sompi = sum(input_summary.values())
+        if total_input_sompi == 0:
+            continue  # avoid divide-by-zero
+        t = len(tx_ids)
+        tx_ids.append(tx.get("transaction_id", tx.get("txId", "UNKNOWN")))
+        stamps.append(format_timestamp(tx.get("block_time", 0)))
+        totals.append(total_input_sompi)
+        senders.extend(input_summary)
+        contribs.extend(input_summary.values())
+        sender_tx.extend([t] * len(input_summary))
+        for out in tx.get("outputs") or []:
+            recipients.append(out.get("script_public_key_address", "UNKNOWN"))
+            amounts.append(int(out.get("amount", 0)))
+            out_tx.append(t)
+
+    if not recipients:
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+
+    # amount * contribution must fit in int64; otherwise fall back to exact
+    # Python ints in object arrays (slower, same results).
+    dtype = np.int64 if max(amounts) * max(contribs) < 2 ** 63 else object
+    totals = np.array(totals, dtype=dtype)
+    contribs = np.array(contribs, dtype=dtype)
+    amounts = np.array(amounts, dtype=dtype)
+    sender_tx = np.array(sender_tx, dtype=np.int64)
+    out_tx = np.array(out_tx, dtype=np.int64)
+
+    n_senders = np.bincount(sender_tx, minlength=len(tx_ids))
+    sender_start = np.concatenate(([0], np.cumsum(n_senders)[:-1]))
+
+    # One edge per (output, sender), outputs in order and senders in order within each.
+    fan = n_senders[out_tx]
+    edge_out = np.repeat(np.arange(len(out_tx)), fan)
+    out_start = np.concatenate(([0], np.cumsum(fan)[:-1]))
+    rank = np.arange(len(edge_out)) - out_start[edge_out]
+    edge_sender = sender_start[out_tx][edge_out] + rank
+
+    prod = amounts[edge_out] * contribs[edge_sender]
+    total = totals[out_tx][edge_out]
+    share = prod // total
+    remainder = prod % total
+
+    leftover = amounts - np.add.reduceat(share, out_start)
+    order = np.lexsort((rank, -remainder, edge_out))
+    pos = np.arange(len(order)) - out_start[edge_out[order]]
+    share[order[pos < leftover[edge_out[order]]]] += 1
+    share = share.astype(np.int64)
+
+    edge_tx = out_tx[edge_out]
+    return pd.DataFrame({
+        "tx_id": np.array(tx_ids, dtype=object)[edge_tx],
+        "timestamp": np.array(stamps, dtype=object)[edge_tx],
+        "sender": np.array(senders, dtype=object)[edge_sender],
+        "recipient": np.array(recipients, dtype=object)[edge_out],
+        "amount_kas": share / 1e8,
+        "amount_sompi": share,
+    })
+
+def iter_transaction_pages(address, max_pages=100000, since=None, exclude=(), before=None, cursor=None):
+    """
+    Page backwards through the address's full-transactions-page history and
+    yield the transaction dicts of one API page at a time. With `since`, only
+    transactions with block_time >= since are kept and paging stops at the
+    first page that reaches past it; tx_ids in `exclude` are dropped.
+
+    Paging starts at `before` (default: now). If a `cursor` dict is given,
+    cursor["before"] holds the cursor of the next page to fetch whenever a
+    page is yielded (None once the history is exhausted). Fetch errors are
+    raised, never mistaken for the end of the history.
+
+    Up to PREFETCH_PAGES further pages are requested while the caller is
+    still working on the current one.
+    """
+    if before is None:
+        before = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    if cursor is None:
+        cursor = {}
+
+    def next_before(data):
+        if not isinstance(data, list) or not data:
+            return None
+        last = data[-1].get("block_time") if isinstance(data[-1], dict) else None
+        if last is None or (since is not None and last < since):
+            return None
+        return last
+
+    pages = iter_prefetched(
+        lambda b, _: fetch_page(address, b), before, next_before,
+        depth=PREFETCH_PAGES, max_pages=max_pages,
+    )
+    with closing(pages):
+        while True:
+            try:
+                before, data = next(pages)
+            except StopIteration:
+                break
+            except Exception as e:
+                print(f"❌ Error fetching transactions: {e}")
+                raise
+
+            if not isinstance(data, list) or not data:
+                print("✅ No more transactions.")
+                break
+
+            txs = []
+            crossed = False
+            for tx in data:
+                if not isinstance(tx, dict):
+                    print(f"⚠️ Skipping non-dict entry: {tx}")
+                    continue
+                if since is not None and tx.get("block_time", 0) < since:
+                    crossed = True
+                    break
+                if exclude and tx.get("transaction_id", tx.get("txId", "UNKNOWN")) in exclude:
+                    continue
+                txs.append(tx)
+
+            before = None if crossed else data[-1].get("block_time", before)
+            cursor["before"] = before
+            yield txs
+
+            if crossed:
+                break
+
+def iter_transactions_all_participants(address, max_pages=100000, since=None, until=None):
+    """
+    Generator form of fetch_transactions_all_participants: yields the
+    sender→recipient records of one API page at a time as a DataFrame.
+    """
+    for txs in iter_transaction_pages(address, max_pages=max_pages, since=since, before=until):
+        yield attribute_page(txs)
+
+def _concat_records(frames):
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=RECORD_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+def fetch_transactions_all_participants(address, max_pages=100000, since=None, until=None):
     """
     Fetch transactions involving the specified address, but return all inputs and outputs
     from those transactions — regardless of whether each individual input/output is related to the address.
+    Optional since/until (block_time ms) restrict it to [since, until): paging
+    starts at `until` and stops at the first page that reaches past `since`.
     """
-    records = []
-    before = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    return _concat_records(iter_transactions_all_participants(address, max_pages=max_pages, since=since, until=until))
 
-    for _ in range(max_pages):
-        url = (
-            f"{API_BASE}/addresses/{address}/full-transactions-page"
-            f"?limit=500&before={before}&resolve_previous_outpoints=full&acceptance=accepted"
-        )
-        print(f"📦 Fetching before={before} for {address}")
-        try:
-            resp = requests.get(url, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception as e:
-            print(f"❌ Error fetching transactions: {e}")
-            break
+def shard_bounds(since, until, shards):
+    """Split [since, until) into `shards` contiguous block_time windows, newest first."""
+    shards = max(1, shards)
+    step = max(1, -(-(until - since) // shards))
+    edges = list(range(until, since, -step)) + [since]
+    return [(lo, hi) for hi, lo in zip(edges, edges[1:])]
 
-        if not isinstance(data, list) or not data:
-            print("✅ No more transactions.")
-            break
+def _crawl_shard(address, lo, hi, spill_path, max_pages):
+    """
+    Page one shard backwards from `hi` and stop at its lower edge. Keeps only
+    transactions with lo <= block_time < hi so neighbouring shards never overlap.
+    Transactions are spilled to `spill_path` as JSON lines; returns the
+    shard's tx_ids in API order.
+    """
+    tx_ids = []
+    before = hi
+    with open(spill_path, "w", encoding="utf-8") as spill:
+        for _ in range(max_pages):
+            try:
+                data = fetch_page(address, before)
+            except Exception as e:
+                print(f"❌ Error fetching shard [{lo}, {hi}) transactions: {e}")
+                raise
 
-        for tx in data:
-            if not isinstance(tx, dict):
-                print(f"⚠️ Skipping non-dict entry: {tx}")
-                continue
+            if not isinstance(data, list) or not data:
+                break
+
+            crossed = False
+            for tx in data:
+                if not isinstance(tx, dict):
+                    print(f"⚠️ Skipping non-dict entry: {tx}")
+                    continue
+                block_time = tx.get("block_time", 0)
+                if block_time < lo:
+                    crossed = True
+                    break
+                if block_time >= hi:
+                    continue
+                tx_ids.append(tx.get("transaction_id", tx.get("txId", "UNKNOWN")))
+                spill.write(json.dumps(tx) + "\n")
+
+            if crossed:
+                break
+            before = data[-1].get("block_time", before)
+
+    print(f"🧩 Shard [{lo}, {hi}) for {address}: {len(tx_ids)} transactions")
+    return tx_ids
 
+def iter_transaction_pages_sharded(address, shards=4, since=None, until=None, max_pages=100000):
+    """
+    Same transactions as iter_transaction_pages, but the address's
+    [since, until) block_time range is split into shards that are crawled in
+    parallel, each with its own `before` cursor. Shards spill to temporary
+    files and are stitched back newest-first, de-duplicated by tx_id, and
+    yielded SHARD_PAGE_TXS transactions at a time.
+    """
+    if until is None:
+        until = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    if since is None:
+        since = KASPA_GENESIS_MS
+    bounds = shard_bounds(since, until, shards)
+
+    with tempfile.TemporaryDirectory(prefix=".shards_", dir=DATA_DIR) as spill_dir:
+        spills = [os.path.join(spill_dir, f"shard{i:04d}.jsonl") for i in range(len(bounds))]
+        with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+            shard_tx_ids = list(pool.map(
+                lambda i: _crawl_shard(address, bounds[i][0], bounds[i][1], spills[i], max_pages),
+                range(len(bounds)),
+            ))
+
+        seen = set()
+        for spill_path, tx_ids in zip(spills, shard_tx_ids):
+            # A tx listed again at a shard edge is dropped from the later shard.
+            dupes = seen.intersection(tx_ids)
+            seen.update(tx_ids)
+            with open(spill_path, encoding="utf-8") as f:
+                txs = []
+                for tx_id, line in zip(tx_ids, f):
+                    if tx_id in dupes:
+                        continue
+                    txs.append(json.loads(line))
+                    if len(txs) >= SHARD_PAGE_TXS:
+                        yield txs
+                        txs = []
+                if txs:
+                    yield txs
+
+def fetch_transactions_all_participants_sharded(address, shards=4, since=None, until=None, max_pages=100000):
+    return _concat_records(
+        attribute_page(txs) for txs in iter_transaction_pages_sharded(address, shards, since, until, max_pages)
+    )
+
+# -----------------------------
+# Normalized columnar store
+# -----------------------------
+
+TX_STORE_TABLES = ("transactions", "inputs", "outputs")
+
+def _tx_store_schemas():
+    return {
+        "transactions": pa.schema([("tx_id", pa.string()), ("block_time", pa.int64())]),
+        "inputs": pa.schema([("tx_id", pa.string()), ("index", pa.int32()), ("address", pa.string()), ("amount_sompi", pa.int64())]),
+        "outputs": pa.schema([("tx_id", pa.string()), ("index", pa.int32()), ("address", pa.string()), ("amount_sompi", pa.int64())]),
+    }
+
+class TxStore:
+    """
+    Normalized transaction store: one row per transaction, input and output,
+    keyed by tx_id, written as Parquet part files under
+    <root>/{transactions,inputs,outputs}/. Unlike the attribution CSVs it grows
+    with inputs + outputs rather than inputs × outputs. mode="w" replaces any
+    existing parts, mode="a" adds new parts after them; `keep_parts` first
+    drops parts numbered at or above it (used when resuming a checkpoint).
+    """
+
+    def __init__(self, root, mode="w", chunk_txs=None, keep_parts=None):
+        if pa is None:
+            raise SystemExit("The columnar store needs pyarrow (pip install pyarrow)")
+        self.root = root
+        self.chunk_txs = chunk_txs or STORE_CHUNK_TXS
+        self.schemas = _tx_store_schemas()
+        for table in TX_STORE_TABLES:
+            path = os.path.join(root, table)
+            os.makedirs(path, exist_ok=True)
+            for part in os.listdir(path):
+                if mode == "w" or (keep_parts is not None and int(part[5:10]) >= keep_parts):
+                    os.remove(os.path.join(path, part))
+        self._part = len(os.listdir(os.path.join(root, "transactions")))
+        self.txs = 0
+        self._reset()
+
+    def _reset(self):
+        self._cols = {table: {name: [] for name in self.schemas[table].names} for table in TX_STORE_TABLES}
+
+    def add(self, txs):
+        cols = self._cols
+        for tx in txs:
             tx_id = tx.get("transaction_id", tx.get("txId", "UNKNOWN"))
-            timestamp = format_timestamp(tx.get("block_time", 0))
-            inputs = tx.get("inputs") or [] # inputs = tx.get("inputs", [])
-            outputs = tx.get("outputs") or [] # outputs = tx.get("outputs", [])
+            cols["transactions"]["tx_id"].append(tx_id)
+            cols["transactions"]["block_time"].append(int(tx.get("block_time", 0)))
+            for i, inp in enumerate(tx.get("inputs") or []):
+                cols["inputs"]["tx_id"].append(tx_id)
+                cols["inputs"]["index"].append(i)
+                cols["inputs"]["address"].append(inp.get("previous_outpoint_address", "UNKNOWN"))
+                cols["inputs"]["amount_sompi"].append(int(inp.get("previous_outpoint_amount", 0)))
+            for i, out in enumerate(tx.get("outputs") or []):
+                cols["outputs"]["tx_id"].append(tx_id)
+                cols["outputs"]["index"].append(i)
+                cols["outputs"]["address"].append(out.get("script_public_key_address", "UNKNOWN"))
+                cols["outputs"]["amount_sompi"].append(int(out.get("amount", 0)))
+        if len(cols["transactions"]["tx_id"]) >= self.chunk_txs:
+            self.flush()
 
-            # Build full input set (transaction-level context)
-            input_summary = {}
-            for inp in inputs:
-                sender = inp.get("previous_outpoint_address", "UNKNOWN")
-                input_summary[sender] = input_summary.get(sender, 0) + int(inp.get("previous_outpoint_amount", 0))
-
-            total_input_sompi = sum(input_summary.values())
-            if total_input_sompi == 0:
-                continue  # avoid divide-by-zero
-
-            # For each output, record proportional attribution from each sender
-            for out in outputs:
-                recipient = out.get("script_public_key_address", "UNKNOWN")
-                amount_sompi = int(out.get("amount", 0))
-                for sender, contribution in input_summary.items():
-                    weight = contribution / total_input_sompi
-                    records.append({
-                        "tx_id": tx_id,
-                        "timestamp": timestamp,
-                        "sender": sender,
-                        "recipient": recipient,
-                        "amount_kas": amount_sompi * weight / 1e8
-                    })
+    @property
+    def parts(self):
+        return self._part
 
-        before = data[-1].get("block_time", before)
+    def flush(self):
+        n = len(self._cols["transactions"]["tx_id"])
+        if not n:
+            return
+        for table in TX_STORE_TABLES:
+            batch = pa.table(self._cols[table], schema=self.schemas[table])
+            pq.write_table(batch, os.path.join(self.root, table, f"part-{self._part:05d}.parquet"))
+        self._part += 1
+        self.txs += n
+        self._reset()
 
-    return pd.DataFrame(records)
+    def close(self):
+        self.flush()
 
-def trace_wallet(address):
-    print(f"🔍 Fetching full transaction set for {address} (all participants mode)")
-    txs = fetch_transactions_all_participants(address)
-    print(f"📥 {len(txs)} total sender→recipient records collected")
+    def __enter__(self):
+        return self
 
-    txs_filtered = txs
-    
+    def __exit__(self, *exc):
+        self.close()
+
+def read_tx_store(root):
+    """Load the three normalized tables of a TxStore as DataFrames."""
+    if pa is None:
+        raise SystemExit("The columnar store needs pyarrow (pip install pyarrow)")
+    schemas = _tx_store_schemas()
+    tables = {}
+    for table in TX_STORE_TABLES:
+        path = os.path.join(root, table)
+        parts = sorted(os.listdir(path)) if os.path.isdir(path) else []
+        if parts:
+            tables[table] = pq.read_table([os.path.join(path, p) for p in parts], schema=schemas[table]).to_pandas()
+        else:
+            tables[table] = schemas[table].empty_table().to_pandas()
+    return tables
+
+def iter_store_transactions(root):
+    """Rebuild API-shaped transaction dicts from a TxStore, in stored order."""
+    tables = read_tx_store(root)
+    inputs = {
+        tx_id: [{"previous_outpoint_address": a, "previous_outpoint_amount": v} for a, v in zip(g["address"], g["amount_sompi"])]
+        for tx_id, g in tables["inputs"].sort_values(["tx_id", "index"]).groupby("tx_id", sort=False)
+    }
+    outputs = {
+        tx_id: [{"script_public_key_address": a, "amount": v} for a, v in zip(g["address"], g["amount_sompi"])]
+        for tx_id, g in tables["outputs"].sort_values(["tx_id", "index"]).groupby("tx_id", sort=False)
+    }
+    for tx_id, block_time in zip(tables["transactions"]["tx_id"], tables["transactions"]["block_time"]):
+        yield {
+            "transaction_id": tx_id,
+            "block_time": int(block_time),
+            "inputs": inputs.get(tx_id, []),
+            "outputs": outputs.get(tx_id, []),
+        }
+
+def attribution_view(root, address=None):
+    """
+    Rebuild the sender→recipient attribution records (the _all_participants.csv
+    view) from a TxStore on demand. With `address`, return only the rows where
+    it is sender or recipient (the _involving.csv view).
+    """
+    frames = []
+    page = []
+    for tx in iter_store_transactions(root):
+        page.append(tx)
+        if len(page) >= SHARD_PAGE_TXS:
+            frames.append(attribute_page(page))
+            page = []
+    frames.append(attribute_page(page))
+    df = _concat_records(frames)
+    if address is not None:
+        df = df[(df["sender"] == address) | (df["recipient"] == address)]
+    return df
+
+# -----------------------------
+# Cross-root de-duplication
+# -----------------------------
+
+class TxDedupStore:
+    """
+    tx_id-keyed store shared by every trace_wallet call (and persisted across
+    runs in SQLite). The first address that resolves a transaction stores its
+    attributed edges; later addresses that list the same transaction read
+    their involving rows from here instead of re-attributing it and writing
+    it to another _all_participants.csv.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS txs (tx_id TEXT PRIMARY KEY, address TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS edges (
+                tx_id TEXT NOT NULL, timestamp TEXT NOT NULL,
+                sender TEXT NOT NULL, recipient TEXT NOT NULL, amount_sompi INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS edges_tx ON edges (tx_id);
+        """)
+
+    def known(self, tx_ids, address):
+        """
+        Return the subset of tx_ids already resolved under another address.
+        (Ones resolved under `address` itself are being re-crawled, e.g. after
+        resuming a checkpoint, and must be written again.)
+        """
+        found = set()
+        tx_ids = list(tx_ids)
+        with self._lock:
+            for i in range(0, len(tx_ids), 500):
+                batch = tx_ids[i:i + 500]
+                q = f"SELECT tx_id FROM txs WHERE tx_id IN ({','.join('?' * len(batch))}) AND address != ?"
+                found.update(row[0] for row in self._db.execute(q, batch + [address]))
+        return found
+
+    def add(self, address, records):
+        """Record freshly attributed edges; transactions already stored are ignored."""
+        if not len(records):
+            return
+        with self._lock, self._db:
+            new = set()
+            for tx_id in records["tx_id"].unique():
+                if self._db.execute("INSERT OR IGNORE INTO txs VALUES (?, ?)", (tx_id, address)).rowcount:
+                    new.add(tx_id)
+            rows = records[records["tx_id"].isin(new)]
+            self._db.executemany(
+                "INSERT INTO edges VALUES (?, ?, ?, ?, ?)",
+                zip(rows["tx_id"], rows["timestamp"], rows["sender"],
+                    rows["recipient"], (int(v) for v in rows["amount_sompi"])),
+            )
+
+    def involving(self, tx_ids, address):
+        """Stored edges of tx_ids where `address` is sender or recipient, as a record frame."""
+        return self._edges(tx_ids, "AND (sender = ? OR recipient = ?)", [address, address])
+
+    def records(self, tx_ids):
+        """Every stored edge of tx_ids (all rows of each transaction), as a record frame."""
+        return self._edges(tx_ids)
+
+    def _edges(self, tx_ids, where="", params=()):
+        rows = []
+        tx_ids = list(tx_ids)
+        with self._lock:
+            for i in range(0, len(tx_ids), 500):
+                batch = tx_ids[i:i + 500]
+                q = (
+                    "SELECT tx_id, timestamp, sender, recipient, amount_sompi FROM edges "
+                    f"WHERE tx_id IN ({','.join('?' * len(batch))}) {where} ORDER BY rowid"
+                )
+                rows.extend(self._db.execute(q, batch + list(params)))
+        df = pd.DataFrame(rows, columns=["tx_id", "timestamp", "sender", "recipient", "amount_sompi"])
+        df["amount_sompi"] = df["amount_sompi"].astype(np.int64)
+        df["amount_kas"] = df["amount_sompi"] / 1e8
+        return df[RECORD_COLUMNS]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# -----------------------------
+# Incremental sync state
+# -----------------------------
+
+def sync_state_path(address):
+    return os.path.join(DATA_DIR, ".sync", f"{address.replace(':', '_')}.json")
+
+def load_sync_state(address):
+    """Per-address sync watermark, or None if the address was never fully synced."""
     try:
-        # Only keep transactions involving the address directly
-        txs_filtered = txs[(txs["sender"] == address) | (txs["recipient"] == address)]
-        print(f"🔎 {len(txs_filtered)} filtered records where {address} was sender or recipient")
-    except:
-        print('no transactions')
-        
-    # Save the full and filtered dataset
-    full_outpath = os.path.join(DATA_DIR, f"{address.replace(':', '_')}_all_participants.csv")
-    filtered_outpath = os.path.join(DATA_DIR, f"{address.replace(':', '_')}_involving.csv")
+        with open(sync_state_path(address), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    txs.to_csv(full_outpath, index=False)
-    txs_filtered.to_csv(filtered_outpath, index=False)
+def save_sync_state(address, state):
+    path = sync_state_path(address)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+def _newest(txs, block_time, tx_ids):
+    """Fold a page into the (newest block_time, tx_ids at that block_time) watermark."""
+    for tx in txs:
+        bt = tx.get("block_time", 0)
+        tx_id = tx.get("transaction_id", tx.get("txId", "UNKNOWN"))
+        if block_time is None or bt > block_time:
+            block_time, tx_ids = bt, {tx_id}
+        elif bt == block_time:
+            tx_ids.add(tx_id)
+    return block_time, tx_ids
+
+def _prepend_csv(new_path, path):
+    """Replace `path` with the rows of `new_path` followed by the existing rows of `path`."""
+    with open(path + ".merge", "w", encoding="utf-8", newline="") as out:
+        with open(new_path, encoding="utf-8", newline="") as new:
+            shutil.copyfileobj(new, out)
+        with open(path, encoding="utf-8", newline="") as old:
+            old.readline()  # header
+            shutil.copyfileobj(old, out)
+    os.replace(path + ".merge", path)
+    os.remove(new_path)
+
+# -----------------------------
+# Checkpoints
+# -----------------------------
+
+def checkpoint_path(address):
+    """Present next to an address's outputs for as long as they are incomplete."""
+    return os.path.join(DATA_DIR, f"{address.replace(':', '_')}.incomplete.json")
+
+def load_checkpoint(address):
+    try:
+        with open(checkpoint_path(address), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(address, ckpt):
+    path = checkpoint_path(address)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(ckpt, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def clear_checkpoint(address):
+    try:
+        os.remove(checkpoint_path(address))
+    except FileNotFoundError:
+        pass
+
+def _flows_from_csv(address, path):
+    """Rebuild trace_wallet's counterparty totals from an existing _involving.csv."""
+    flows = {"in": Counter(), "out": Counter()}
+    for chunk in pd.read_csv(path, chunksize=CHUNK_SIZE, dtype={"tx_id": str}):
+        if "amount_sompi" not in chunk:
+            chunk["amount_sompi"] = (chunk["amount_kas"] * 1e8).round().astype(np.int64)
+        _tally_flows(flows, address, chunk)
+    return flows
+
+def trace_wallet(address, shards=1, storage="csv", collect_flows=False, dedup=None, incremental=False, resume=False,
+                 since=None, until=None, edges=None, qstore=None):
+    """
+    Crawl one address and write its outputs. With collect_flows (or whenever
+    CSVs are written) also returns the address's direct counterparties as
+    {"in": Counter(funder -> sompi), "out": Counter(recipient -> sompi)}.
+    With a TxDedupStore in `dedup`, transactions already resolved under
+    another address only contribute rows to this address's _involving.csv
+    (a columnar store still gets every transaction of the address).
+    With a FlowEdges store in `edges`, every attributed page is also folded
+    into the (sender, recipient) aggregate, and with a tracer_store
+    QueryStore in `qstore` its records are added to the query store.
+    With incremental=True and a previous sync recorded for the address, only
+    transactions newer than its watermark are fetched and merged into the
+    existing outputs.
+
+    While the crawl runs, <address>.incomplete.json marks the outputs as
+    partial and checkpoints the page cursor every CHECKPOINT_PAGES pages. With
+    resume=True an interrupted address continues from its checkpoint, and an
+    address that already completed over the same since/until window (and
+    storage) is skipped (unless incremental).
+
+    since/until (block_time ms) restrict the crawl to [since, until). A
+    windowed crawl with `until` is never synced forward incrementally.
+    """
+    stem = os.path.join(DATA_DIR, address.replace(':', '_'))
+    full_outpath = f"{stem}_all_participants.csv"
+    filtered_outpath = f"{stem}_involving.csv"
+    store_path = f"{stem}_store"
+    write_csv = storage in ("csv", "both")
+    attribute = write_csv or collect_flows or edges is not None or qstore is not None
+    flows = {"in": Counter(), "out": Counter()}
+
+    window = [since, until]
+    ckpt = load_checkpoint(address) if resume else None
+    if ckpt and not (ckpt.get("resumable") and ckpt.get("storage") == storage and ckpt.get("window") == window):
+        print(f"⚠️ Checkpoint for {address} can't be resumed; crawling it again")
+        ckpt = None
+    done = load_sync_state(address) if resume and not ckpt and not incremental else None
+    if done and done.get("window") == window and done.get("storage") == storage \
+            and not os.path.exists(checkpoint_path(address)) and (not write_csv or os.path.exists(filtered_outpath)):
+        print(f"⏭️ {address} already complete")
+        if collect_flows and os.path.exists(filtered_outpath):
+            return _flows_from_csv(address, filtered_outpath)
+        return flows
+
+    state = load_sync_state(address) if incremental and until is None and not ckpt else None
+    if state and (state.get("storage") != storage or state.get("since") != since):
+        state = None
+    if state and write_csv and not (os.path.exists(full_outpath) and os.path.exists(filtered_outpath)):
+        state = None
+
+    cursor = {"before": until if until is not None else int(datetime.now(tz=timezone.utc).timestamp() * 1000)}
+    newest, newest_ids = None, set()
+    if ckpt:
+        suffix, since, exclude = ckpt["suffix"], ckpt["since"], set(ckpt["exclude"])
+        newest, newest_ids = ckpt["newest_block_time"], set(ckpt["newest_tx_ids"])
+        flows = {side: Counter(ckpt["flows"][side]) for side in flows}
+        cursor["before"] = ckpt["before"]
+        print(f"⏯️ Resuming {address} from before={ckpt['before']}")
+        if ckpt["before"] is None:
+            pages = iter(())
+        else:
+            pages = iter_transaction_pages(address, since=since, exclude=exclude, before=ckpt["before"], cursor=cursor)
+    elif state:
+        # An incremental sync writes the new rows aside and prepends them afterwards.
+        suffix, since, exclude = ".new", state["newest_block_time"], set(state["newest_tx_ids"])
+        newest, newest_ids = since, set(exclude)
+        print(f"🔁 Syncing {address} forward from block_time={since}")
+        pages = iter_transaction_pages(address, since=since, exclude=exclude, before=cursor["before"], cursor=cursor)
+    else:
+        suffix, exclude = "", set()
+        print(f"🔍 Fetching full transaction set for {address} (all participants mode)")
+        if shards > 1:
+            pages = iter_transaction_pages_sharded(address, shards=shards, since=since, until=until)
+        else:
+            pages = iter_transaction_pages(address, since=since, before=cursor["before"], cursor=cursor)
+    resumable = not (shards > 1 and not ckpt and not state)
+
+    # Stream the full and filtered dataset to disk in a single pass
+    with ExitStack() as stack:
+        if write_csv:
+            full_out = stack.enter_context(RecordWriter(full_outpath + suffix, resume_at=ckpt and ckpt["full"]))
+            filtered_out = stack.enter_context(RecordWriter(filtered_outpath + suffix, resume_at=ckpt and ckpt["filtered"]))
+        store = None
+        if storage in ("columnar", "both"):
+            store = stack.enter_context(TxStore(
+                store_path,
+                mode="a" if (state or ckpt) else "w",
+                keep_parts=ckpt["store_parts"] if ckpt else None,
+            ))
+
+        def checkpoint(error=None):
+            """Flush every sink and record the cursor they are consistent with."""
+            if write_csv:
+                full_out.flush()
+                filtered_out.flush()
+            if store is not None:
+                store.flush()
+            save_checkpoint(address, {
+                "address": address,
+                "storage": storage,
+                "window": window,
+                "resumable": resumable,
+                "before": cursor["before"],
+                "suffix": suffix,
+                "since": since,
+                "exclude": sorted(exclude),
+                "newest_block_time": newest,
+                "newest_tx_ids": sorted(newest_ids),
+                "full": write_csv and [full_out.size, full_out.rows],
+                "filtered": write_csv and [filtered_out.size, filtered_out.rows],
+                "store_parts": store.parts if store is not None else None,
+                "flows": {side: dict(flows[side]) for side in flows},
+                "error": error,
+                "updated_at": format_timestamp(time.time() * 1000),
+            })
+
+        checkpoint()
+        attrib_s = 0.0
+        reused = 0
+        page_count = 0
+        consistent = True
+        try:
+            for txs in pages:
+                consistent = False
+                newest, newest_ids = _newest(txs, newest, newest_ids)
+                # Whole page: the dedup store only has attribution records, not tx data.
+                if store is not None:
+                    store.add(txs)
+                known = ()
+                if dedup is not None:
+                    tx_ids = [tx.get("transaction_id", tx.get("txId", "UNKNOWN")) for tx in txs]
+                    known = dedup.known(tx_ids, address)
+                    if known:
+                        reused += len(known)
+                        txs = [tx for tx, tx_id in zip(txs, tx_ids) if tx_id not in known]
+                if attribute:
+                    t0 = time.perf_counter()
+                    records = attribute_page(txs)
+                    attrib_s += time.perf_counter() - t0
+                    # Only keep transactions involving the address directly
+                    involving = records[(records["sender"] == address) | (records["recipient"] == address)]
+                    page_records = records
+                    if dedup is not None:
+                        dedup.add(address, records)
+                        if known:
+                            involving = _in_page_order(pd.concat([involving, dedup.involving(known, address)]), tx_ids)
+                            # Known txs were attributed by another run or address; the
+                            # aggregate and the query store skip the ones they already hold.
+                            if edges is not None or qstore is not None:
+                                page_records = pd.concat([records, dedup.records(known)], ignore_index=True)
+                    if edges is not None:
+                        edges.add(page_records)
+                    if qstore is not None:
+                        qstore.add_l1(page_records)
+                    if write_csv:
+                        full_out.write(records)
+                        filtered_out.write(involving)
+                    _tally_flows(flows, address, involving)
+                consistent = True
+                page_count += 1
+                if resumable and page_count % CHECKPOINT_PAGES == 0:
+                    checkpoint()
+        except BaseException as e:
+            if resumable and consistent:
+                checkpoint(error=repr(e))
+            else:
+                # Mid-page: keep the last durable cursor, just note the failure.
+                last = load_checkpoint(address) or {}
+                last["error"] = repr(e)
+                save_checkpoint(address, last)
+            print(f"💾 {address} interrupted ({e!r}); outputs marked incomplete in {checkpoint_path(address)}")
+            raise
+
+    if suffix and write_csv:
+        _prepend_csv(full_outpath + suffix, full_outpath)
+        _prepend_csv(filtered_outpath + suffix, filtered_outpath)
+    if newest is not None:
+        save_sync_state(address, {
+            "address": address,
+            "storage": storage,
+            "since": window[0],
+            "window": window,
+            "newest_block_time": newest,
+            "newest_tx_ids": sorted(newest_ids),
+            "synced_at": format_timestamp(time.time() * 1000),
+        })
+    clear_checkpoint(address)
+
+    if reused:
+        print(f"♻️ {reused} transactions already resolved under other addresses")
+    if write_csv:
+        print(f"📥 {full_out.rows} total sender→recipient records collected")
+        if attrib_s > 0:
+            print(f"⚙️ Attribution: {full_out.rows / attrib_s:,.0f} edges/sec")
+        if full_out.rows or filtered_out.rows:
+            print(f"🔎 {filtered_out.rows} filtered records where {address} was sender or recipient")
+        else:
+            print('no transactions')
+
+        print(f"✅ Saved full transaction data to {full_outpath}")
+        print(f"✅ Saved filtered personal transaction data to {filtered_outpath}")
+    if store is not None:
+        print(f"✅ Saved {store.txs} normalized transactions to {store_path}")
+    return flows
+
+def _in_page_order(records, tx_ids):
+    """Stable-sort records back into the API order of their transactions."""
+    pos = {tx_id: i for i, tx_id in enumerate(tx_ids)}
+    return records.iloc[np.argsort(records["tx_id"].map(pos).to_numpy(), kind="stable")]
+
+def _tally_flows(flows, address, involving):
+    """Add one page of involving records to the per-counterparty sompi totals."""
+    funded = involving[(involving["recipient"] == address) & (involving["sender"] != address)]
+    paid = involving[(involving["sender"] == address) & (involving["recipient"] != address)]
+    flows["in"].update(funded.groupby("sender")["amount_sompi"].sum().to_dict())
+    flows["out"].update(paid.groupby("recipient")["amount_sompi"].sum().to_dict())
+
+def crawl_roots(roots, workers=1, shards=1, shard_addresses=None, **trace_opts):
+    """
+    Run trace_wallet over every root and return {address: trace_wallet result}.
+    With workers > 1 several addresses are crawled at once; each address is
+    still paged sequentially and written to its own files, so the CSVs match a
+    sequential run. With shards > 1 the addresses in `shard_addresses` (all
+    roots if None) are crawled as parallel block_time shards instead. Other
+    keyword options are passed through to trace_wallet.
+    """
+    def shards_for(addr):
+        if shard_addresses is None or addr in shard_addresses:
+            return shards
+        return 1
+
+    results = {}
+    failed = []
+    if workers <= 1:
+        for addr in roots:
+            try:
+                results[addr] = trace_wallet(addr, shards=shards_for(addr), **trace_opts)
+            except Exception as e:
+                print(f"❌ {addr} failed: {e}")
+                failed.append(addr)
+        if failed:
+            print(f"⚠️ {len(failed)} address(es) failed: {', '.join(failed)}")
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(trace_wallet, addr, shards=shards_for(addr), **trace_opts): addr for addr in roots}
+        for fut in as_completed(futures):
+            addr = futures[fut]
+            try:
+                results[addr] = fut.result()
+            except Exception as e:
+                print(f"❌ {addr} failed: {e}")
+                failed.append(addr)
+    if failed:
+        print(f"⚠️ {len(failed)} address(es) failed: {', '.join(failed)}")
+    return results
+
+def load_address_list(path):
+    """Read one address per line; blank lines and # comments are ignored."""
+    with open(path, encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+def crawl_funding_graph(roots, max_depth=2, max_nodes=500, min_kas=0.0, direction="in",
+                        denylist=(), workers=1, **crawl_opts):
+    """
+    Breadth-first crawl of the funding graph around `roots`. Each level is
+    crawled with crawl_roots; counterparties whose total flow with an address
+    is at least `min_kas` are queued for the next level, heaviest first, until
+    `max_depth` levels or `max_nodes` successfully fetched addresses. Every
+    address is fetched at most once; addresses in `denylist` (exchanges,
+    services) are never fetched or expanded. direction="in" follows funders,
+    "out" follows recipients, "both" follows either. An address whose crawl
+    fails does not use up the budget and is not expanded.
+
+    Writes funding_graph_nodes.csv to DATA_DIR (one row per crawled address;
+    `error` is "failed" for the ones whose crawl failed) and returns its rows.
+    """
+    denylist = set(denylist)
+    min_sompi = int(round(min_kas * 1e8))
+    sides = ("in", "out") if direction == "both" else (direction,)
+
+    nodes = []
+    visited = set()
+    level = []
+    for addr in roots:
+        if addr not in visited and addr not in denylist:
+            visited.add(addr)
+            level.append(addr)
+            nodes.append({"address": addr, "depth": 0, "discovered_via": "", "via_kas": None})
+
+    depth = 0
+    fetched = 0
+    errors = {}
+    while level:
+        # Failed crawls don't count toward max_nodes: refill from the rest of the level.
+        results = {}
+        queue = level
+        while queue and fetched < max_nodes:
+            batch, queue = queue[:max_nodes - fetched], queue[max_nodes - fetched:]
+            print(f"🌐 Funding crawl depth {depth}: {len(batch)} address(es)")
+            done = crawl_roots(batch, workers=workers, collect_flows=True, **crawl_opts)
+            for addr in batch:
+                errors[addr] = "" if addr in done else "failed"
+            results.update(done)
+            fetched += len(done)
+        if depth >= max_depth or not results:
+            break
+
+        candidates = {}
+        for addr in level:
+            flows = results.get(addr)
+            if not flows:
+                continue
+            for side in sides:
+                for peer, sompi in flows[side].items():
+                    if sompi < min_sompi or peer in visited or peer in denylist or peer == "UNKNOWN":
+                        continue
+                    if peer not in candidates or sompi > candidates[peer][1]:
+                        candidates[peer] = (addr, sompi)
+
+        level = sorted(candidates, key=lambda peer: -candidates[peer][1])
+        depth += 1
+        for peer in level:
+            visited.add(peer)
+            via, sompi = candidates[peer]
+            nodes.append({"address": peer, "depth": depth, "discovered_via": via, "via_kas": sompi / 1e8})
+
+    nodes = [dict(node, error=errors[node["address"]]) for node in nodes if node["address"] in errors]
+    outpath = os.path.join(DATA_DIR, "funding_graph_nodes.csv")
+    pd.DataFrame(nodes, columns=["address", "depth", "discovered_via", "via_kas", "error"]).to_csv(outpath, index=False)
+    failed = len(nodes) - fetched
+    print(f"✅ Funding crawl fetched {fetched} address(es)" + (f", {failed} failed" if failed else "")
+          + f"; node list saved to {outpath}")
+    return nodes
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Kaspa L1 full-history tracer for the SLOW roots")
+    p.add_argument("--api-base", default=API_BASE, help="Kaspa API base URL (default: %(default)s)")
+    p.add_argument("--workers", type=int, default=1, help="Addresses crawled concurrently (default: %(default)s = sequential)")
+    p.add_argument("--rps", type=float, default=None, help="Requests/second ceiling shared by all workers (default: no ceiling)")
+    p.add_argument("--start-rps", type=float, default=5.0, help="Initial rate; it adapts up while responses are healthy and backs off on 429/5xx")
+    p.add_argument("--prefetch", type=int, default=PREFETCH_PAGES,
+                   help="Pages fetched ahead of the one being processed, per address (0 = strictly serial)")
+    p.add_argument("--max-in-flight", type=int, default=None, help="Concurrent requests to api.kaspa.org (default: workers x shards)")
+    p.add_argument("--shards", type=int, default=1, help="Split each address's history into N block_time shards crawled in parallel")
+    p.add_argument("--shard-address", action="append", default=None, help="Only shard this address (repeatable; default: shard every root)")
+    p.add_argument("--storage", choices=["csv", "columnar", "both"], default="csv",
+                   help="csv = attribution CSVs, columnar = normalized Parquet tx/input/output tables (needs pyarrow)")
+    p.add_argument("--dedup-store", nargs="?", const=os.path.join(DATA_DIR, "tx_dedup.sqlite"), default=None,
+                   help="Share resolved transactions across addresses (and runs) via this SQLite file (default: %(const)s)")
+    p.add_argument("--incremental", action="store_true",
+                   help="Only fetch transactions newer than each address's last sync and merge them into its outputs")
+    p.add_argument("--resume", action="store_true",
+                   help="Continue interrupted addresses from their checkpoints and skip addresses that already completed")
+    p.add_argument("--since", type=parse_time_ms, default=None,
+                   help="Only transactions with block_time >= this (epoch ms/s or ISO date, UTC)")
+    p.add_argument("--until", type=parse_time_ms, default=None,
+                   help="Only transactions with block_time < this (epoch ms/s or ISO date, UTC)")
+    p.add_argument("--recursive", action="store_true", help="Follow counterparties of the roots (bounded BFS over the funding graph)")
+    p.add_argument("--max-depth", type=int, default=2, help="Recursive mode: hops away from the roots (default: %(default)s)")
+    p.add_argument("--max-nodes", type=int, default=500, help="Recursive mode: total addresses fetched (default: %(default)s)")
+    p.add_argument("--min-kas", type=float, default=0.0, help="Recursive mode: only follow counterparties with at least this much total flow")
+    p.add_argument("--direction", choices=["in", "out", "both"], default="in", help="Recursive mode: follow funders (in), recipients (out) or both")
+    p.add_argument("--denylist", help="Recursive mode: file of addresses (exchanges, services) never fetched or expanded")
+    p.add_argument("--edges", nargs="?", const=os.path.join(DATA_DIR, "flow_edges.sqlite"), default=None,
+                   help="Maintain the (sender, recipient) flow aggregate in this SQLite file (default: %(const)s); see kaspa_edges.py")
+    p.add_argument("--edges-daily", action="store_true", help="With --edges: also keep per-day buckets (chosen when the store is created)")
+    p.add_argument("--query-store", nargs="?", const=os.path.join(DATA_DIR, "query_store.sqlite"), default=None,
+                   help="Add every attributed record to this indexed SQLite query store (default: %(const)s); see tracer_store.py")
+    p.add_argument("--archive", nargs="?", const=os.path.join(DATA_DIR, "raw_pages.jsonl.gz"), default=None,
+                   help="Append every fetched raw page to this compressed archive (default: %(const)s; *.zst = zstd)")
+    p.add_argument("--replay", nargs="?", const=os.path.join(DATA_DIR, "raw_pages.jsonl.gz"), default=None,
+                   help="Rebuild outputs from an archive instead of the API (default: %(const)s); "
+                        "without --recursive every archived address is replayed")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    global API_BASE, CLIENT, PREFETCH_PAGES, ARCHIVE, REPLAY
+    args = parse_args(argv)
+    API_BASE = args.api_base.rstrip("/")
+    if args.archive and args.replay:
+        raise SystemExit("--archive and --replay are mutually exclusive")
+    ARCHIVE = PageArchive(args.archive) if args.archive else None
+    REPLAY = PageArchive(args.replay, mode="r") if args.replay else None
+    roots = ROOTS
+    if REPLAY is not None:
+        if not args.recursive:
+            roots = REPLAY.keys("kaspa")
+        print(f"♻️ Replaying {len(REPLAY.entries)} archived page(s) from {args.replay}")
+    PREFETCH_PAGES = args.prefetch
+    in_flight = args.max_in_flight or max(1, args.workers) * max(1, args.shards)
+    CLIENT = HttpClient(rps=args.start_rps, max_rps=args.rps, max_per_host=in_flight, pool_size=max(16, in_flight), log=print)
+    dedup = TxDedupStore(args.dedup_store) if args.dedup_store else None
+    edges = FlowEdges(args.edges, daily=args.edges_daily or None) if args.edges else None
+    qstore = QueryStore(args.query_store) if args.query_store else None
+    crawl_opts = dict(shards=args.shards, shard_addresses=args.shard_address, storage=args.storage, dedup=dedup,
+                      incremental=args.incremental, resume=args.resume, since=args.since, until=args.until, edges=edges,
+                      qstore=qstore)
+    if args.recursive:
+        denylist = load_address_list(args.denylist) if args.denylist else ()
+        crawl_funding_graph(roots, max_depth=args.max_depth, max_nodes=args.max_nodes, min_kas=args.min_kas,
+                            direction=args.direction, denylist=denylist, workers=args.workers, **crawl_opts)
+        print("✅ Completed recursive funding-graph export.")
+    else:
+        crawl_roots(roots, workers=args.workers, **crawl_opts)
+        print("✅ Completed full non-recursive transaction history export.")
+    if dedup is not None:
+        dedup.close()
+    if edges is not None:
+        print(f"🧩 {len(edges)} (sender, recipient) edges in {args.edges}")
+        edges.close()
+    if qstore is not None:
+        qstore.close()
+    for archive in (ARCHIVE, REPLAY):
+        if archive is not None:
+            archive.close()
+    print(f"🌐 HTTP: {CLIENT.summary()}")
+    incomplete = sorted(glob.glob(os.path.join(DATA_DIR, "*.incomplete.json")))
+    if incomplete:
+        print(f"⚠️ {len(incomplete)} address(es) have incomplete outputs; rerun with --resume:")
+        for path in incomplete:
+            print(f"   {path}")
 
-    print(f"✅ Saved full transaction data to {full_outpath}")
-    print(f"✅ Saved filtered personal transaction data to {filtered_outpath}")
-    
 if __name__ == "__main__":
-    for addr in ROOTS:
-        trace_wallet(addr)
-    print("✅ Completed full non-recursive transaction history export.")
+    main()
@@ -12,12 +12,32 @@ Highlights
 - Two modes:
     1) wallet  — /krc20/oplist?address=...
     2) token   — /krc20/oplist?tick=...
-- Pagination via `next` cursor (Kasplex style), limit=500 by default
-- Robust retries/backoff, proxy bypass (trust_env=False)
+- Pagination via `next` cursor (Kasplex style), limit=500 by default; the next
+  page is prefetched while the current one is processed
+- Shared pooled client (tracer_http): adaptive AIMD pacing, retries on 429/5xx
+  with Retry-After, proxy bypass (trust_env=False)
 - Normalizes fields to a clean schema:
     tx_id (hashRev preferred), timestamp_iso, token (tick), op_type, from, to, amount
-- Writes narrow CSV (clean schema) and optional wide CSV with raw-prefixed keys
+  page-at-a-time (normalize_page): field aliases resolved once per page,
+  columns extracted in bulk, timestamps via int64 epoch ms
+- Writes narrow CSV (clean schema) and optional wide CSV with raw-prefixed keys;
+  --format parquet writes typed Parquet parts instead (nested meta → struct)
+- Streams pages to disk with bounded memory: each batch is normalized, sorted
+  and spilled as a run under <out>.parts/, and the runs are merge-sorted into
+  the output at the end (or when the crawl fails, keeping partial progress)
 - Optional resume: dedupe by tx_id when appending to an existing CSV (token mode)
+- Batch jobs: --addresses-file / --tokens-file run many targets in one process
+  over a bounded worker pool sharing one rate budget, with per-target CSVs,
+  an optional combined CSV partitioned by target and a run summary
+- Incremental sync (--incremental): a SQLite sidecar <out>.idx.sqlite holds the
+  known tx_ids and the `next` cursors of unfinished passes; a refresh reads
+  newest-first until a page has only known ops, then resumes any interrupted
+  backfill from its checkpointed cursor
+- Raw-page archive (--archive): every page is appended as received to a
+  compressed, indexed archive (tracer_archive); --replay rebuilds the CSV or
+  Parquet outputs from it with no network, e.g. after a normalizer change
+- --query-store adds the written ops to the indexed SQLite store of
+  tracer_store.py (exact amounts, opAccept flag), shared with the L1 tracer
 - Timestamp normalization tolerates ms/seconds/ISO
 
 Usage
@@ -27,7 +47,7 @@ python tracekrc20_kasplex_full.py \
   --mode token --token SLOW \
   --base-url https://api.kasplex.org/v1 \
   --out data/slow_token_ops.csv \
-  --limit 500 --sleep 0.25 --verbose --wide --resume
+  --limit 500 --verbose --wide --resume
 
 # Pull KRC-20 ops for a single wallet (optionally filter a token)
 python tracekrc20_kasplex_full.py \
@@ -36,22 +56,44 @@ python tracekrc20_kasplex_full.py \
   --base-url https://api.kasplex.org/v1 \
   --out data/wallet_ops.csv --verbose
 
+# Audit many wallets at once (--out is a directory: one CSV per address,
+# combined.csv with a leading `target` column, run_summary.csv)
+python tracekrc20_kasplex_full.py \
+  --mode wallet --addresses-file minters.txt --token SLOW \
+  --out data/minters --workers 8 --rps 10 --combined
+
 """
 
 import argparse
 import csv
+import heapq
 import json
 import math
 import os
+import shutil
+import sqlite3
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from itertools import chain, repeat
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 
+from tracer_archive import PageArchive
+from tracer_http import HttpClient, iter_prefetched, loads
+from tracer_store import QueryStore
+
+try:  # optional: only needed for --format parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 # -----------------------------
 # Defaults / Config
 # -----------------------------
@@ -64,6 +106,23 @@ HEADERS = {
 VERIFY_SSL = True
 RETRIES = 6
 TIMEOUT = 30
+BATCH_ROWS = 50000   # normalized ops held in memory before a sorted run is spilled
+MERGE_FAN_IN = 64    # runs merged at once (bounds open files)
+CHECKPOINT_PAGES = 20  # incremental sync: pages between index/cursor commits
+TX_ID_KEYS = ["txid","tx_id","hashRev","hash","txHash","transactionHash"]
+FIELD_ALIASES = {
+    "tx_id":     TX_ID_KEYS,
+    "timestamp": ["mtsAdd","timestamp","ts","time","blockTime","block_ts","date"],
+    "token":     ["tick","token","ticker","symbol","krc20","asset","name"],
+    "op_type":   ["op","opType","type","operation"],
+    "from":      ["from","sender","src","seller","maker","owner","from_address"],
+    "to":        ["to","recipient","dst","buyer","taker","to_address"],
+    "amount":    ["amt","amount","qty","quantity","value","delta","amount_token","amountToken","transferAmount"],
+}
+META_AMOUNT_KEYS = ["amount","qty","quantity","value","delta"]
+FAST_MS_LIMIT = 2**33 * 1000  # below this, int64 ms → ISO matches datetime.fromtimestamp() exactly
+NARROW_COLS = ["tx_id","timestamp_raw","timestamp_iso","token","op_type","from","to","amount"]
+SORT_COLS = ["timestamp_iso","tx_id"]
 
 # -----------------------------
 # Utilities
@@ -98,15 +157,15 @@ def first_nonempty(d: Dict, keys: List[str], default="") -> Any:
 
 def normalize_op(op: Dict) -> Dict:
     """Normalize a raw operation dict into the narrow schema + keep raw."""
-    tx_id   = first_nonempty(op, ["txid","tx_id","hashRev","hash","txHash","transactionHash"])
-    ts      = first_nonempty(op, ["mtsAdd","timestamp","ts","time","blockTime","block_ts","date"])
-    token   = first_nonempty(op, ["tick","token","ticker","symbol","krc20","asset","name"])
-    op_type = first_nonempty(op, ["op","opType","type","operation"])
-    sender  = first_nonempty(op, ["from","sender","src","seller","maker","owner","from_address"])
-    recip   = first_nonempty(op, ["to","recipient","dst","buyer","taker","to_address"])
-    amount  = first_nonempty(op, ["amt","amount","qty","quantity","value","delta","amount_token","amountToken","transferAmount"], default="")
+    tx_id   = first_nonempty(op, FIELD_ALIASES["tx_id"])
+    ts      = first_nonempty(op, FIELD_ALIASES["timestamp"])
+    token   = first_nonempty(op, FIELD_ALIASES["token"])
+    op_type = first_nonempty(op, FIELD_ALIASES["op_type"])
+    sender  = first_nonempty(op, FIELD_ALIASES["from"])
+    recip   = first_nonempty(op, FIELD_ALIASES["to"])
+    amount  = first_nonempty(op, FIELD_ALIASES["amount"], default="")
     if amount == "" and isinstance(op.get("meta"), dict):
-        amount = first_nonempty(op["meta"], ["amount","qty","quantity","value","delta"], default="")
+        amount = first_nonempty(op["meta"], META_AMOUNT_KEYS, default="")
     try:
         amount_num = float(amount)
     except Exception:
@@ -123,166 +182,763 @@ def normalize_op(op: Dict) -> Dict:
         "_raw": op,
     }
 
+_EMPTY = (None, "", 0)
+_is_empty = _EMPTY.__contains__
+
+def _pick(rows: List[Dict], keys: List[str], default: Any = "") -> List[Any]:
+    """Column-wise first_nonempty(): later aliases are only consulted for the rows still empty."""
+    if not keys:
+        return [default] * len(rows)
+    col = list(map(dict.get, rows, repeat(keys[0])))
+    for k in keys[1:]:
+        holes = [i for i, e in enumerate(map(_is_empty, col)) if e]
+        if not holes:
+            break
+        for i in holes:
+            col[i] = rows[i].get(k)
+    if any(map(_is_empty, col)):
+        col = [default if _is_empty(v) else v for v in col]
+    return col
+
+def _floats(values: List[Any]) -> Any:
+    """float() of each value (None where it fails), in one numpy call when possible."""
+    try:
+        arr = np.array([None if v == "" else v for v in values], dtype=float)
+        if arr.shape == (len(values),):
+            return arr
+    except Exception:
+        pass
+    out = []
+    for v in values:
+        try:
+            out.append(float(v))
+        except Exception:
+            out.append(None)
+    return out
+
+def epoch_ms(raw: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized numeric half of to_iso(): timestamps given as plain digits
+    (ms, or seconds below 1e12) → int64 epoch ms. Returns (ms, ok); rows with
+    ok=False (ISO strings, signs, decimals, far-future values) need to_iso().
+    """
+    try:
+        b = np.array(raw, dtype="S")  # raises on non-ASCII
+        ok = np.char.isdigit(b) & (np.char.str_len(b) <= 16)
+    except UnicodeEncodeError:
+        b = None
+        ok = np.fromiter((t.isascii() and t.isdigit() and len(t) <= 16 for t in raw), dtype=bool, count=len(raw))
+    ms = np.zeros(len(raw), dtype=np.int64)
+    idx = np.flatnonzero(ok)
+    if len(idx):
+        v = (b[idx] if b is not None else np.array([raw[i] for i in idx], dtype="S")).astype(np.int64)
+        v = np.where(v >= 10**12, v, v * 1000)
+        ms[idx] = v
+        ok[idx[v >= FAST_MS_LIMIT]] = False
+    return ms, ok
+
+def iso_from_ms(ms: np.ndarray) -> np.ndarray:
+    """Epoch ms → ISO-8601 UTC strings formatted like datetime.isoformat() (µs only when non-zero)."""
+    dt = ms.astype("datetime64[ms]")
+    out = np.where(ms % 1000 != 0, np.datetime_as_string(dt, unit="us"), np.datetime_as_string(dt, unit="s"))
+    return out.astype(object) + "+00:00"
+
+def normalize_page(rows: List[Dict], wide: bool = False) -> pd.DataFrame:
+    """
+    normalize_op() for a whole page, returned as the narrow (or wide) frame
+    with identical values. The alias lists are narrowed once to the keys that
+    occur in the page, each field is extracted as a column, amounts are
+    converted in one call and timestamps go through int64 epoch ms with the
+    ISO strings formatted from them vectorized; only timestamps that are not
+    plain digits take the per-row to_iso() path.
+    """
+    if not rows:
+        return pd.DataFrame(columns=NARROW_COLS)
+    if not all(isinstance(r, dict) for r in rows):
+        norm = [normalize_op(r) for r in rows]
+        df = pd.DataFrame([_wide_row(r) for r in norm] if wide else norm)
+        return df if wide else df[NARROW_COLS]
+
+    present = set().union(*map(dict.keys, rows))
+    def pick(field: str) -> List[Any]:
+        return _pick(rows, [k for k in FIELD_ALIASES[field] if k in present])
+
+    ts = pick("timestamp")
+    ts_raw = list(map(str, ts))
+    ms, fast = epoch_ms(ts_raw)
+    iso = iso_from_ms(ms)
+    for i in np.flatnonzero(~fast):
+        iso[i] = to_iso(ts[i])
+
+    amount = pick("amount")
+    if "meta" in present:
+        for i, v in enumerate(amount):
+            if v == "" and isinstance(rows[i].get("meta"), dict):
+                amount[i] = first_nonempty(rows[i]["meta"], META_AMOUNT_KEYS, default="")
+
+    df = pd.DataFrame({
+        "tx_id": pick("tx_id"),
+        "timestamp_raw": ts_raw,
+        "timestamp_iso": iso,
+        "token": pick("token"),
+        "op_type": pick("op_type"),
+        "from": pick("from"),
+        "to": pick("to"),
+        "amount": _floats(amount),
+    })
+    if wide:
+        df = pd.concat([df, pd.DataFrame(_raw_columns(rows, df.columns), index=df.index)], axis=1)
+    return df
+
 # -----------------------------
 # Networking / Fetchers
 # -----------------------------
 
-def _session() -> requests.Session:
-    s = requests.Session()
-    s.trust_env = False  # ignore system proxies
-    s.proxies = {"http": None, "https": None}
-    return s
+def _client(sleep_s: float = 0.0, rps: float = 4.0, max_rps: Optional[float] = None, verbose: bool = False) -> HttpClient:
+    """Pooled client with adaptive pacing; `sleep_s` is a floor on the gap between requests."""
+    return HttpClient(
+        rps=rps, max_rps=max_rps, min_interval=sleep_s, retries=RETRIES, timeout=TIMEOUT,
+        headers=HEADERS, verify=VERIFY_SSL, log=print if verbose else None,
+    )
 
-def _get_json(session: requests.Session, url: str, params: Dict[str, Any], verbose: bool, save_raw_dir: Optional[Path], page: int) -> Dict:
+def oplist_key(params: Dict[str, Any]) -> str:
+    """Archive key of an oplist query: its filters (address/tick), without paging params."""
+    return "&".join(f"{k}={params[k]}" for k in sorted(params) if k not in ("limit", "next"))
+
+def _get_json(client: HttpClient, url: str, params: Dict[str, Any], verbose: bool, save_raw_dir: Optional[Path], page: int,
+              archive: Optional[PageArchive] = None) -> Dict:
+    # 429/5xx and connection errors are retried inside the client; here we
+    # only retry bodies that are not usable JSON.
     last_exc = None
     for attempt in range(1, RETRIES + 1):
+        r = client.get(url, params=params, allow_redirects=True)
+        if r.status_code >= 400:
+            if save_raw_dir:
+                save_raw_dir.mkdir(parents=True, exist_ok=True)
+                (save_raw_dir / f"error_{r.status_code}_page{page:05d}.raw").write_bytes(r.content)
+            r.raise_for_status()
+        ctype = (r.headers.get("Content-Type") or "").lower()
         try:
-            r = session.get(url, params=params, headers=HEADERS, timeout=TIMEOUT, verify=VERIFY_SSL, allow_redirects=True)
-            if r.status_code >= 400:
-                if save_raw_dir:
-                    save_raw_dir.mkdir(parents=True, exist_ok=True)
-                    (save_raw_dir / f"error_{r.status_code}_page{page:05d}.raw").write_bytes(r.content)
-                if r.status_code in (429, 500, 502, 503, 504):
-                    sleep_for = min((2 ** attempt) * 0.25, 15.0)
-                    if verbose:
-                        print(f"[retry {attempt}/{RETRIES}] {r.status_code}, sleeping {sleep_for:.2f}s")
-                    time.sleep(sleep_for)
-                    continue
-                r.raise_for_status()
-            ctype = (r.headers.get("Content-Type") or "").lower()
             if "application/json" not in ctype:
                 if save_raw_dir:
+                    save_raw_dir.mkdir(parents=True, exist_ok=True)
                     (save_raw_dir / f"nonjson_page{page:05d}.raw").write_bytes(r.content)
                 raise RuntimeError(f"Non-JSON response (Content-Type={ctype}) from {r.url}")
             try:
-                data = r.json()
+                data = loads(r.content)
             except Exception as e:
                 if save_raw_dir:
+                    save_raw_dir.mkdir(parents=True, exist_ok=True)
                     (save_raw_dir / f"badjson_page{page:05d}.raw").write_bytes(r.content)
                 raise RuntimeError(f"JSON parse failed at {r.url}: {e}") from e
-            if save_raw_dir:
-                (save_raw_dir / f"okjson_page{page:05d}.json").write_bytes(r.content)
-            return data
-        except Exception as e:
+        except RuntimeError as e:
             last_exc = e
-            sleep_for = min((2 ** attempt) * 0.25, 15.0)
+            client.backoff(url)
             if verbose:
-                print(f"[retry {attempt}/{RETRIES}] Exception: {e}  sleeping {sleep_for:.2f}s")
-            time.sleep(sleep_for)
+                print(f"[retry {attempt}/{RETRIES}] {e}")
             continue
+        if save_raw_dir:
+            save_raw_dir.mkdir(parents=True, exist_ok=True)
+            (save_raw_dir / f"okjson_page{page:05d}.json").write_bytes(r.content)
+        if archive is not None:
+            archive.append("kasplex", oplist_key(params), params.get("next", ""), r.content)
+        return data
     if last_exc:
         raise last_exc
     return {}
 
-def fetch_oplist_by_address(address: str, base_url: str, token: Optional[str], limit: int, sleep_s: float, verbose: bool, save_raw_dir: Optional[Path]) -> List[Dict]:
-    session = _session()
-    out: List[Dict] = []
-    cursor: Optional[str] = None
-    page = 0
-    url = f"{base_url.rstrip('/')}/krc20/oplist"
-    while True:
-        params = {"address": address, "limit": max(1, min(limit, 1000))}
-        if token and token.upper() != "ALL":
-            params["tick"] = token
+def _iter_oplist(url: str, params: Dict[str, Any], client: HttpClient, verbose: bool,
+                 save_raw_dir: Optional[Path], prefetch: int, start: str = "",
+                 cursor: Optional[Dict[str, Any]] = None,
+                 archive: Optional[PageArchive] = None) -> Iterator[Tuple[int, List[Dict]]]:
+    """
+    Follow the `next` cursor of /krc20/oplist from `start` ("" = newest page),
+    yielding (page_no, rows). The next page is requested as soon as the
+    current one is decoded, with up to `prefetch` pages queued while the
+    caller works on earlier ones. If `cursor` is given, cursor["next"] holds
+    the cursor of the page after the one last yielded (None at the end).
+    Pages are appended to `archive` when one is given.
+    """
+    def fetch(cursor: Any, page: int) -> Dict:
+        p = dict(params)
         if cursor:
-            params["next"] = cursor
-        data = _get_json(session, url, params, verbose, save_raw_dir, page)
+            p["next"] = cursor
+        return _get_json(client, url, p, verbose, save_raw_dir, page, archive)
+
+    def next_cursor(data: Dict) -> Optional[str]:
         rows = data.get("result") or []
-        cursor = data.get("next")
         if not isinstance(rows, list) or not rows:
+            return None
+        return data.get("next") or None
+
+    total = 0
+    page = 0
+    # "" is the (falsy) cursor of the first page; None ends the pagination.
+    pages = iter_prefetched(fetch, start or "", next_cursor, depth=prefetch)
+    with closing(pages):
+        for page, (_, data) in enumerate(pages):
+            rows = data.get("result") or []
+            nxt = data.get("next")
+            if not isinstance(rows, list) or not rows:
+                if cursor is not None:
+                    cursor["next"] = None
+                if verbose:
+                    print(f"[done] total_pages={page} total_rows={total}")
+                return
+            total += len(rows)
             if verbose:
-                print(f"[done] total_pages={page} total_rows={len(out)}")
-            break
+                print(f"[page {page}] fetched={len(rows)} cursor={nxt!r}")
+            if cursor is not None:
+                cursor["next"] = nxt or None
+            yield page, rows
+            if not nxt:
+                if verbose: print("[done] cursor empty; end")
+                return
+
+def iter_oplist_by_address(address: str, base_url: str, token: Optional[str], limit: int, sleep_s: float, verbose: bool,
+                           save_raw_dir: Optional[Path], client: Optional[HttpClient] = None, prefetch: int = 2,
+                           start: str = "", cursor: Optional[Dict[str, Any]] = None,
+                           archive: Optional[PageArchive] = None) -> Iterator[List[Dict]]:
+    """Yield the raw ops of each /krc20/oplist?address=... page as it arrives."""
+    client = client or _client(sleep_s, verbose=verbose)
+    url = f"{base_url.rstrip('/')}/krc20/oplist"
+    params = {"address": address, "limit": max(1, min(limit, 1000))}
+    if token and token.upper() != "ALL":
+        params["tick"] = token
+    for _, rows in _iter_oplist(url, params, client, verbose, save_raw_dir, prefetch, start, cursor, archive):
+        yield rows
+
+def iter_oplist_by_tick(tick: str, base_url: str, limit: int, sleep_s: float, verbose: bool,
+                        save_raw_dir: Optional[Path], client: Optional[HttpClient] = None, prefetch: int = 2,
+                        start: str = "", cursor: Optional[Dict[str, Any]] = None,
+                        archive: Optional[PageArchive] = None) -> Iterator[List[Dict]]:
+    """Yield the raw ops of each /krc20/oplist?tick=... page as it arrives."""
+    client = client or _client(sleep_s, verbose=verbose)
+    url = f"{base_url.rstrip('/')}/krc20/oplist"
+    params = {"tick": tick, "limit": max(1, min(limit, 1000))}
+    for _, rows in _iter_oplist(url, params, client, verbose, save_raw_dir, prefetch, start, cursor, archive):
+        yield rows
+
+def fetch_oplist_by_address(address: str, base_url: str, token: Optional[str], limit: int, sleep_s: float, verbose: bool,
+                            save_raw_dir: Optional[Path], client: Optional[HttpClient] = None, prefetch: int = 2) -> List[Dict]:
+    out: List[Dict] = []
+    for rows in iter_oplist_by_address(address, base_url, token, limit, sleep_s, verbose, save_raw_dir, client, prefetch):
         out.extend(rows)
-        if verbose:
-            print(f"[page {page}] fetched={len(rows)} cursor={cursor!r}")
-        page += 1
-        if not cursor:
-            if verbose: print("[done] cursor empty; end")
-            break
-        time.sleep(sleep_s)
     return out
 
-def fetch_oplist_by_tick(tick: str, base_url: str, limit: int, sleep_s: float, verbose: bool, save_raw_dir: Optional[Path]) -> List[Dict]:
-    session = _session()
+def fetch_oplist_by_tick(tick: str, base_url: str, limit: int, sleep_s: float, verbose: bool,
+                         save_raw_dir: Optional[Path], client: Optional[HttpClient] = None, prefetch: int = 2) -> List[Dict]:
     out: List[Dict] = []
-    cursor: Optional[str] = None
-    page = 0
-    url = f"{base_url.rstrip('/')}/krc20/oplist"
-    while True:
-        params = {"tick": tick, "limit": max(1, min(limit, 1000))}
-        if cursor:
-            params["next"] = cursor
-        data = _get_json(session, url, params, verbose, save_raw_dir, page)
-        rows = data.get("result") or []
-        cursor = data.get("next")
-        if not isinstance(rows, list) or not rows:
-            if verbose:
-                print(f"[done] total_pages={page} total_rows={len(out)}")
-            break
+    for rows in iter_oplist_by_tick(tick, base_url, limit, sleep_s, verbose, save_raw_dir, client, prefetch):
         out.extend(rows)
-        if verbose:
-            print(f"[page {page}] fetched={len(rows)} cursor={cursor!r}")
-        page += 1
-        if not cursor:
-            if verbose: print("[done] cursor empty; end")
-            break
-        time.sleep(sleep_s)
     return out
 
+def iter_archived_oplist(archive: PageArchive, params: Dict[str, Any], verbose: bool = False) -> Iterator[List[Dict]]:
+    """
+    Replay: yield the ops of every archived page of the query in `params`, in
+    archive order, each tx_id once (pages re-fetched by later runs overlap).
+    """
+    key = oplist_key(params)
+    seen: Set[str] = set()
+    pages = 0
+    for rec in archive.iter_records("kasplex", key):
+        body = rec.get("body")
+        rows = body.get("result") if isinstance(body, dict) else None
+        if not isinstance(rows, list) or not rows:
+            continue
+        fresh = []
+        for op in rows:
+            t = op_tx_id(op) if isinstance(op, dict) else ""
+            if t and t in seen:
+                continue
+            if t:
+                seen.add(t)
+            fresh.append(op)
+        pages += 1
+        if fresh:
+            yield fresh
+    if verbose:
+        print(f"[replay] {key}: pages={pages} ops={len(seen)}")
+
 # -----------------------------
-# CSV Writers / Dedupe
+# Writers (CSV / Parquet) / Dedupe
 # -----------------------------
 
+def _wide_row(r: Dict) -> Dict:
+    w = {k: v for k, v in r.items() if k != "_raw"}
+    raw = r.get("_raw", {})
+    if isinstance(raw, dict):
+        for k, v in raw.items():
+            if k not in w:
+                w[f"raw_{k}"] = v
+    return w
+
+def _raw_columns(rows: List[Any], taken: Iterable[str]) -> Dict[str, List[Any]]:
+    """
+    raw_<key> columns built straight from the raw ops (None where an op lacks
+    the key), keys in first-appearance order, skipping keys that already are
+    normalized columns.
+    """
+    rows = [r if isinstance(r, dict) else {} for r in rows]
+    taken = set(taken)
+    keys = dict.fromkeys(chain.from_iterable(rows))
+    return {f"raw_{k}": list(map(dict.get, rows, repeat(k))) for k in keys if k not in taken}
+
+def read_tx_ids(out: Path) -> Iterator[str]:
+    """tx_ids already in an output (CSV file or Parquet part directory), read column-only."""
+    out = Path(out)
+    if out.is_dir():
+        if pq is None:
+            raise SystemExit("Parquet outputs need pyarrow (pip install pyarrow)")
+        for part in sorted(out.glob("part-*.parquet")):
+            for t in pq.read_table(part, columns=["tx_id"]).column("tx_id").to_pylist():
+                if t is not None:
+                    yield t
+    elif out.exists():
+        for chunk in pd.read_csv(out, usecols=["tx_id"], dtype=str, chunksize=100000):
+            yield from chunk["tx_id"].dropna()
+
+class OpSink:
+    """
+    Common part of the op writers: buffers raw ops up to `batch_rows`,
+    normalizes each batch with normalize_page, drops tx_ids already in the
+    output (resume) and hands the batch, sorted by (timestamp_iso, tx_id) and
+    with its raw ops in the same order, to _spill(). With a tracer_store
+    QueryStore in `store`, every spilled batch is also added to it.
+    """
+
+    def __init__(self, out: Path, wide: bool = False, verbose: bool = False, batch_rows: int = BATCH_ROWS,
+                 store: Any = None):
+        self.out = Path(out)
+        self.wide = wide
+        self.verbose = verbose
+        self.store = store
+        self.batch_rows = max(1, batch_rows)
+        self.written = 0
+        self.skipped = 0
+        self.prev_ids: Optional[Set[str]] = None
+        self._buf: List[Dict] = []
+
+    def _load_prev_ids(self, resume: bool) -> None:
+        # optional resume dedupe by tx_id (token-wide often uses hashRev)
+        if resume and self.out.exists():
+            try:
+                self.prev_ids = set(read_tx_ids(self.out))
+                if self.verbose:
+                    print(f"[resume] {len(self.prev_ids)} existing tx_ids will be skipped")
+            except Exception as e:
+                if self.verbose:
+                    print(f"[resume] couldn’t read prior output ({e}); continuing without resume")
+
+    def __enter__(self) -> "OpSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None and self.verbose:
+            print(f"[write] crawl stopped ({exc_type.__name__}); keeping the pages fetched so far")
+        self.close()
+        return False
+
+    def add(self, rows: List[Dict]) -> None:
+        """Queue one page (or any batch) of raw ops; they are normalized per spilled batch."""
+        self._buf.extend(rows)
+        if len(self._buf) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Normalize, dedupe and sort the buffered ops and write them out."""
+        if not self._buf:
+            return
+        raw, self._buf = self._buf, []
+        df = normalize_page(raw)
+        if self.prev_ids is not None:
+            keep = ~df["tx_id"].astype(str).isin(self.prev_ids)
+            self.skipped += int((~keep).sum())
+            if not keep.all():
+                raw = [r for r, k in zip(raw, keep) if k]
+                df = df[keep].reset_index(drop=True)
+        if df.empty:
+            return
+        order = df.sort_values(SORT_COLS).index
+        df, raw = df.loc[order].reset_index(drop=True), [raw[i] for i in order]
+        if self.store is not None:
+            self.store.add_krc20(df, raw)
+        self._spill(df, raw)
+
+    def _spill(self, df: pd.DataFrame, raw: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> int:
+        self.flush()
+        if self.prev_ids is not None and self.verbose:
+            print(f"[resume] skipped {self.skipped} existing rows")
+        return self.written
+
+def _read_run(path: Path, columns: List[str]) -> Iterator[List[str]]:
+    """Rows of a run file re-ordered to `columns` (missing columns → "")."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        pos = {c: i for i, c in enumerate(header)}
+        idx = [pos.get(c) for c in columns]
+        for row in reader:
+            yield [row[i] if i is not None else "" for i in idx]
+
+def _merge_runs(runs: List[Path], columns: List[str], out, header: bool) -> int:
+    """k-way merge of sorted run files into the open text file `out`; returns rows written."""
+    keys = [columns.index(c) for c in SORT_COLS]
+    w = csv.writer(out, lineterminator="\n")
+    if header:
+        w.writerow(columns)
+    n = 0
+    merged = heapq.merge(*(_read_run(p, columns) for p in runs), key=lambda row: [row[i] for i in keys])
+    for row in merged:
+        w.writerow(row)
+        n += 1
+    return n
+
+class OpCsvSink(OpSink):
+    """
+    Writes normalized ops to `out_csv` page by page with bounded memory.
+    Each batch is spilled as a sorted run file under <out>.parts/; close()
+    merge-sorts the runs into out_csv, appending after existing rows. In wide
+    mode the union of raw_* columns is tracked as batches arrive; appending
+    rows with columns the existing header lacks first rewrites the file under
+    the widened header, and rows are always written in the file's column
+    order. A failure mid-crawl still merges what was spilled, and runs left
+    behind by a killed process are merged in when the next sink opens the
+    same output.
+    """
+
+    def __init__(self, out_csv: Path, wide: bool = False, resume: bool = False, verbose: bool = False,
+                 batch_rows: int = BATCH_ROWS, store: Any = None):
+        super().__init__(out_csv, wide=wide, verbose=verbose, batch_rows=batch_rows, store=store)
+        self.out_csv = self.out
+        self.parts_dir = Path(str(self.out_csv) + ".parts")
+        self.columns: List[str] = list(NARROW_COLS)
+        self.runs: List[Path] = []
+        os.makedirs(self.out_csv.parent, exist_ok=True)
+
+        leftover = sorted(self.parts_dir.glob("run-*.csv")) if self.parts_dir.exists() else []
+        if leftover:
+            self.runs = leftover
+            for run in leftover:
+                with open(run, newline="", encoding="utf-8") as f:
+                    self._add_columns(next(csv.reader(f), []))
+            n = self._merge()
+            if verbose:
+                print(f"[recover] merged {n} rows from {len(leftover)} leftover runs in {self.parts_dir}")
+        self._load_prev_ids(resume)
+
+    def _add_columns(self, cols) -> None:
+        seen = set(self.columns)
+        for c in cols:
+            if c not in seen:
+                self.columns.append(c)
+                seen.add(c)
+
+    def _spill(self, df: pd.DataFrame, raw: List[Dict]) -> None:
+        if self.wide:
+            df = pd.concat([df, pd.DataFrame(_raw_columns(raw, df.columns), index=df.index)], axis=1)
+        self._add_columns(df.columns)
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        run = self.parts_dir / f"run-{len(self.runs):05d}.csv"
+        df.to_csv(run, index=False)
+        self.runs.append(run)
+        if self.verbose:
+            print(f"[spill] {run.name} rows={len(df)}")
+
+    def _widen(self, header: List[str], columns: List[str]) -> None:
+        """Rewrite out_csv under a header with extra columns (existing rows get "" there)."""
+        tmp = Path(str(self.out_csv) + ".widen.tmp")
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, lineterminator="\n")
+            w.writerow(columns)
+            w.writerows(_read_run(self.out_csv, columns))
+        os.replace(tmp, self.out_csv)
+        if self.verbose:
+            print(f"[schema] {self.out_csv}: added columns {columns[len(header):]}")
+
+    def _merge(self) -> int:
+        runs = self.runs
+        # Multi-pass when there are more runs than files we want open at once.
+        step = 0
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MERGE_FAN_IN):
+                path = self.parts_dir / f"merge{step}-{i // MERGE_FAN_IN:05d}.csv"
+                with open(path, "w", newline="", encoding="utf-8") as f:
+                    _merge_runs(runs[i:i + MERGE_FAN_IN], self.columns, f, header=True)
+                merged.append(path)
+            for p in runs:
+                p.unlink()
+            runs, step = merged, step + 1
+        append = self.out_csv.exists() and self.out_csv.stat().st_size > 0
+        columns = self.columns
+        if append:
+            with open(self.out_csv, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), [])
+            columns = header + [c for c in self.columns if c not in header]
+            if len(columns) > len(header):
+                self._widen(header, columns)
+        with open(self.out_csv, "a" if append else "w", newline="", encoding="utf-8") as f:
+            n = _merge_runs(runs, columns, f, header=not append)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        self.runs = []
+        return n
+
+    def close(self) -> int:
+        """Spill the remaining rows and merge all runs into out_csv; returns rows written."""
+        super().close()
+        if self.runs:
+            self.written += self._merge()
+        elif not self.out_csv.exists():
+            # nothing fetched: still leave a header-only file
+            pd.DataFrame(columns=self.columns).to_csv(self.out_csv, index=False)
+        return self.written
+
+def _as_text(v: Any) -> Optional[str]:
+    if v is None or isinstance(v, str):
+        return v
+    return json.dumps(v)
+
+class OpParquetSink(OpSink):
+    """
+    Typed columnar output: <out>/part-NNNNN.parquet, one part per batch,
+    each sorted by (timestamp_iso, tx_id); a part is only visible once fully
+    written, so every finished batch survives a crash. Narrow columns are
+    strings with a float64 amount. In wide mode every raw key becomes a
+    raw_<key> column typed by pyarrow inference, so nested objects such as
+    `meta` are stored as structs; a column whose values cannot share one type
+    in a batch is stored as JSON text. The union schema of the existing parts
+    is tracked and new batches are cast to the established column types where
+    they fit; appending adds parts, and read_op_store() unifies the parts'
+    schemas when reading.
+    """
+
+    def __init__(self, out_dir: Path, wide: bool = False, resume: bool = False, verbose: bool = False,
+                 batch_rows: int = BATCH_ROWS, store: Any = None):
+        if pa is None:
+            raise SystemExit("--format parquet needs pyarrow (pip install pyarrow)")
+        super().__init__(out_dir, wide=wide, verbose=verbose, batch_rows=batch_rows, store=store)
+        self.out.mkdir(parents=True, exist_ok=True)
+        self.schema: Dict[str, Any] = {}
+        parts = sorted(self.out.glob("part-*.parquet"))
+        for part in parts:
+            for field in pq.read_schema(part):
+                if pa.types.is_null(self.schema.get(field.name, pa.null())):
+                    self.schema[field.name] = field.type
+        self._part = int(parts[-1].name[5:10]) + 1 if parts else 0
+        self._load_prev_ids(resume)
+
+    def _column(self, name: str, values: List[Any]) -> Any:
+        try:
+            arr = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError):
+            arr = pa.array([_as_text(v) for v in values], pa.string())
+        known = self.schema.get(name)
+        if known is not None and arr.type != known and not pa.types.is_null(known):
+            try:
+                arr = arr.cast(known)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                if self.verbose:
+                    print(f"[schema] {name}: {arr.type} does not fit earlier {known}; readers will unify")
+        if known is None or pa.types.is_null(known):
+            self.schema[name] = arr.type
+        return arr
+
+    def _spill(self, df: pd.DataFrame, raw: List[Dict]) -> None:
+        cols = {c: pa.array([v if isinstance(v, str) else str(v) for v in df[c]], pa.string())
+                for c in NARROW_COLS if c != "amount"}
+        cols["amount"] = pa.array(df["amount"].astype(float), pa.float64(), from_pandas=True)
+        cols = {c: cols[c] for c in NARROW_COLS}
+        if self.wide:
+            for name, values in _raw_columns(raw, NARROW_COLS).items():
+                cols[name] = self._column(name, values)
+        part = self.out / f"part-{self._part:05d}.parquet"
+        tmp = part.with_suffix(".tmp")
+        pq.write_table(pa.table(cols), tmp)
+        os.replace(tmp, part)
+        self._part += 1
+        self.written += len(df)
+        if self.verbose:
+            print(f"[spill] {part.name} rows={len(df)} columns={len(cols)}")
+
+def _unify_parts(tables: List[Any]) -> Any:
+    """Concatenate part tables, promoting types; columns whose parts still disagree become JSON text."""
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    types: Dict[str, set] = {}
+    for t in tables:
+        for f in t.schema:
+            if not pa.types.is_null(f.type):
+                types.setdefault(f.name, set()).add(f.type)
+    conflicted = {name for name, ts in types.items() if len(ts) > 1}
+    fixed = []
+    for t in tables:
+        for name in conflicted & set(t.column_names):
+            i = t.schema.get_field_index(name)
+            t = t.set_column(i, name, pa.array([_as_text(v) for v in t.column(name).to_pylist()], pa.string()))
+        fixed.append(t)
+    return pa.concat_tables(fixed, promote_options="permissive")
+
+def read_op_store(out_dir: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load a Parquet op output (all parts, unified schema) sorted by (timestamp_iso, tx_id)."""
+    if pa is None:
+        raise SystemExit("Parquet outputs need pyarrow (pip install pyarrow)")
+    parts = sorted(Path(out_dir).glob("part-*.parquet"))
+    if not parts:
+        return pd.DataFrame(columns=columns or NARROW_COLS)
+    tables = [pq.read_table(p, columns=columns) for p in parts]
+    df = _unify_parts(tables).to_pandas()
+    df.sort_values(SORT_COLS, inplace=True, kind="stable")
+    return df.reset_index(drop=True)
+
+def open_sink(out: Path, fmt: str = "csv", **kwargs: Any) -> OpSink:
+    """OpCsvSink for fmt="csv", OpParquetSink (out is a directory) for fmt="parquet"."""
+    if fmt == "parquet":
+        return OpParquetSink(out, **kwargs)
+    return OpCsvSink(out, **kwargs)
+
 def write_csv(rows: List[Dict], out_csv: Path, wide: bool, resume: bool, verbose: bool) -> int:
-    os.makedirs(out_csv.parent, exist_ok=True)
-    # normalize first to derive columns
-    norm = [normalize_op(r) for r in rows]
-    df = pd.DataFrame(norm)
-    # optional resume dedupe by tx_id (token-wide often uses hashRev)
-    if resume and out_csv.exists():
+    with OpCsvSink(out_csv, wide=wide, resume=resume, verbose=verbose) as sink:
+        sink.add(rows)
+    return sink.written
+
+# -----------------------------
+# Incremental sync
+# -----------------------------
+
+def op_tx_id(op: Dict) -> str:
+    return str(first_nonempty(op, TX_ID_KEYS))
+
+class OpIndex:
+    """
+    SQLite sidecar (<out>.idx.sqlite) for --incremental: the tx_ids already
+    written to the output, the query it belongs to, and the `next` cursors of
+    passes that were interrupted ("gaps"). commit() stores new ids and the
+    gaps in one transaction.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ops (tx_id TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM ops").fetchone()[0]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set(self, key: str, value: Any) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def check_query(self, query: Dict[str, Any]) -> None:
+        """Bind the index to one oplist query; refuse to mix another into it."""
+        known = self.get("query")
+        if known is None:
+            self._set("query", query)
+            self.conn.commit()
+        elif known != query:
+            raise SystemExit(f"{self.path} indexes {known}, not {query}; use another --out or delete the index")
+
+    def known(self, tx_ids: Iterable[str]) -> Set[str]:
+        ids = list(set(tx_ids))
+        found: Set[str] = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            q = f"SELECT tx_id FROM ops WHERE tx_id IN ({','.join('?' * len(chunk))})"
+            found.update(r[0] for r in self.conn.execute(q, chunk))
+        return found
+
+    def gaps(self) -> List[str]:
+        return list(self.get("gaps", []))
+
+    def commit(self, tx_ids: Iterable[str], gaps: List[Optional[str]]) -> None:
+        self.conn.executemany("INSERT OR IGNORE INTO ops (tx_id) VALUES (?)", ((t,) for t in tx_ids))
+        self._set("gaps", [g for g in gaps if g])
+        self.conn.commit()
+
+    def seed(self, out: Path) -> int:
+        """Index the tx_ids of an output (CSV or Parquet) written before --incremental was used."""
+        n = 0
+        cur = self.conn.cursor()
+        for t in read_tx_ids(out):
+            cur.execute("INSERT OR IGNORE INTO ops (tx_id) VALUES (?)", (t,))
+            n += 1
+        self.conn.commit()
+        return n
+
+    def close(self) -> None:
+        self.conn.close()
+
+def sync_oplist(iter_pages: Callable[[str, Dict[str, Any]], Iterator[List[Dict]]], index: OpIndex, sink: OpSink,
+                verbose: bool = False, checkpoint_pages: int = CHECKPOINT_PAGES) -> Dict[str, int]:
+    """
+    Incremental oplist sync. iter_pages(start, cursor) yields raw op pages
+    newest-first from cursor `start` and keeps cursor["next"] current.
+
+    First a head pass reads from the newest page until a page contains only
+    known ops (on an empty index that is the full backfill); then every gap
+    left by an interrupted earlier pass is continued from its cursor the same
+    way. Every `checkpoint_pages` pages, and when a pass stops for any reason,
+    the sink is flushed and the new tx_ids plus the running pass's cursor are
+    committed to the index.
+    """
+    gaps: List[Optional[str]] = [""] + index.gaps()
+    stats = {"pages": 0, "new": 0, "passes": 0}
+
+    def run(slot: int) -> None:
+        cursor: Dict[str, Any] = {"next": gaps[slot]}
+        pending: Set[str] = set()
+        pages = 0
+        done = False
+
+        def checkpoint() -> None:
+            sink.flush()
+            gaps[slot] = None if done else cursor["next"]
+            index.commit(pending, gaps)
+            pending.clear()
+
         try:
-            prev = pd.read_csv(out_csv)
-            if "tx_id" in prev.columns:
-                prev_ids = set(prev["tx_id"].dropna().astype(str))
-                df = df[~df["tx_id"].astype(str).isin(prev_ids)]
-                if verbose:
-                    print(f"[resume] skipped {len(prev_ids)} existing tx_ids; new rows={len(df)}")
-        except Exception as e:
-            if verbose:
-                print(f"[resume] couldn’t read prior CSV ({e}); continuing without resume")
-    # stable narrow columns
-    narrow_cols = ["tx_id","timestamp_raw","timestamp_iso","token","op_type","from","to","amount"]
-    df_narrow = df[narrow_cols].copy()
-    df_narrow.sort_values(["timestamp_iso","tx_id"], inplace=True)
-
-    if not wide:
-        wrote = _append_or_write(df_narrow, out_csv)
-        return wrote
-
-    # build wide with raw_* extras
-    wide_rows = []
-    for r in norm:
-        w = {k: v for k, v in r.items() if k != "_raw"}
-        raw = r.get("_raw", {})
-        if isinstance(raw, dict):
-            for k, v in raw.items():
-                if k not in w:
-                    w[f"raw_{k}"] = v
-        wide_rows.append(w)
-    df_wide = pd.DataFrame(wide_rows)
-    df_wide.sort_values(["timestamp_iso","tx_id"], inplace=True)
-    wrote = _append_or_write(df_wide, out_csv)
-    return wrote
-
-def _append_or_write(df: pd.DataFrame, out_csv: Path) -> int:
-    if out_csv.exists() and out_csv.stat().st_size > 0:
-        # append
-        df.to_csv(out_csv, mode="a", header=False, index=False)
-        return len(df)
-    else:
-        df.to_csv(out_csv, index=False)
-        return len(df)
+            with closing(iter_pages(gaps[slot] or "", cursor)) as it:
+                for rows in it:
+                    pages += 1
+                    stats["pages"] += 1
+                    ids = [op_tx_id(r) for r in rows]
+                    known = index.known(ids) | pending
+                    fresh = []
+                    for r, t in zip(rows, ids):
+                        if t not in known:
+                            known.add(t)
+                            pending.add(t)
+                            fresh.append(r)
+                    if not fresh:
+                        if verbose:
+                            print(f"[sync] page with only known ops after {pages} pages; pass complete")
+                        break
+                    sink.add(fresh)
+                    stats["new"] += len(fresh)
+                    if pages % checkpoint_pages == 0:
+                        checkpoint()
+            done = True
+        finally:
+            checkpoint()
+
+    for slot in range(len(gaps)):
+        if slot and verbose:
+            print(f"[sync] resuming interrupted pass at next={gaps[slot]!r}")
+        stats["passes"] += 1
+        run(slot)
+    return stats
 
 # -----------------------------
 # CLI
@@ -294,61 +950,262 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     p.add_argument("--address", help="Kaspa address (required if --mode wallet)")
     p.add_argument("--token", help="Ticker (tick) to filter or fetch (required in token mode; optional in wallet mode)")
     p.add_argument("--base-url", default=KASPLEX_API_DEFAULT, help="Kasplex API base (default: %(default)s)")
-    p.add_argument("--out", required=True, type=Path, help="Output CSV path")
+    p.add_argument("--addresses-file", type=Path, help="Wallet mode batch: file with one address per line (# comments allowed)")
+    p.add_argument("--tokens-file", type=Path, help="Token mode batch: file with one ticker per line (# comments allowed)")
+    p.add_argument("--out", required=True, type=Path, help="Output CSV path (a directory in batch mode)")
     p.add_argument("--limit", type=int, default=500, help="Page size (1..1000)")
-    p.add_argument("--sleep", type=float, default=0.25, help="Delay between pages (seconds)")
+    p.add_argument("--sleep", type=float, default=0.0, help="Minimum delay between requests (seconds); pacing is otherwise adaptive")
+    p.add_argument("--rps", type=float, default=4.0, help="Initial requests/second; grows while responses are healthy, backs off on 429/5xx")
+    p.add_argument("--max-rps", type=float, default=None, help="Requests/second ceiling (default: none)")
+    p.add_argument("--prefetch", type=int, default=2, help="Pages requested ahead of the one being processed (0 = strictly serial)")
+    p.add_argument("--workers", type=int, default=4, help="Batch mode: targets fetched concurrently (default: %(default)s)")
+    p.add_argument("--combined", action="store_true", help="Batch mode: also write <out>/combined.csv, partitioned by a leading `target` column")
     p.add_argument("--verbose", action="store_true", help="Verbose logs")
-    p.add_argument("--wide", action="store_true", help="Write wide CSV with raw_* extras")
+    p.add_argument("--wide", action="store_true", help="Write wide output with raw_* extras")
+    p.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                   help="csv = one CSV file; parquet = typed Parquet parts in the --out directory (needs pyarrow; wide keeps nested meta as a struct)")
     p.add_argument("--resume", action="store_true", help="Append mode: skip rows whose tx_id already exists in out CSV")
+    p.add_argument("--incremental", action="store_true", help="Only fetch ops newer than the last run (and finish interrupted backfills), using the <out>.idx.sqlite sidecar")
+    p.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="Ops held in memory before a sorted run is spilled to <out>.parts/ (default: %(default)s)")
     p.add_argument("--save-raw", action="store_true", help="Save raw JSON pages (okjson/nonjson/badjson/error_*) next to output file")
+    p.add_argument("--archive", nargs="?", const="", default=None, type=str,
+                   help="Append every page to a compressed archive (default: <out>.pages.jsonl.gz, <out>/pages.jsonl.gz in batch mode; *.zst = zstd)")
+    p.add_argument("--query-store", type=Path, default=None,
+                   help="Also add the written ops to this tracer_store SQLite query store (shared with the L1 tracer)")
+    p.add_argument("--replay", nargs="?", const="", default=None, type=str,
+                   help="Rebuild the outputs from an archive (same default path as --archive) instead of the API")
     return p.parse_args(argv)
 
 # -----------------------------
-# Main
+# Jobs
 # -----------------------------
 
-def main(argv: Optional[List[str]] = None) -> None:
-    args = parse_args(argv)
+def load_targets(path: Path) -> List[str]:
+    """One address or ticker per line; blank lines and # comments skipped, duplicates dropped."""
+    out: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            t = line.split("#", 1)[0].strip()
+            if t and t not in out:
+                out.append(t)
+    return out
+
+def run_target(args: argparse.Namespace, client: HttpClient, target: str, out_csv: Path,
+               stats: Optional[Dict[str, Any]] = None, archive: Optional[PageArchive] = None,
+               replay: Optional[PageArchive] = None, store: Optional[QueryStore] = None) -> Dict[str, Any]:
+    """
+    Fetch one wallet (--mode wallet) or ticker (--mode token) into out_csv,
+    honouring --wide/--resume/--incremental. Pages are appended to `archive`,
+    or read from `replay` instead of the API; written ops also go to `store`. Returns (and fills `stats` as it
+    goes, so a failed target still reports its progress) rows, pages, seconds.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(target=target, rows=0, pages=0, seconds=0.0)
     base_url = args.base_url.rstrip("/")
+    t0 = time.time()
 
     # Determine raw dir
     raw_dir = None
     if args.save_raw:
-        stem = args.out if isinstance(args.out, Path) else Path(args.out)
-        raw_dir = stem.with_suffix("")
-        raw_dir = Path(str(raw_dir) + "_rawpages")
+        raw_dir = Path(str(out_csv.with_suffix("")) + "_rawpages")
 
     if args.mode == "token":
-        if not args.token:
-            raise SystemExit("--token is required in --mode token")
         if args.verbose:
-            print(f"[+] Fetching token-wide ops for tick={args.token}")
-        rows = fetch_oplist_by_tick(
-            tick=args.token,
-            base_url=base_url,
-            limit=args.limit,
-            sleep_s=args.sleep,
-            verbose=args.verbose,
-            save_raw_dir=raw_dir,
-        )
+            print(f"[+] Fetching token-wide ops for tick={target}")
+        query = {"tick": target}
+        def pages(start: str = "", cursor: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict]]:
+            if replay is not None:
+                return iter_archived_oplist(replay, query, args.verbose)
+            return iter_oplist_by_tick(
+                tick=target,
+                base_url=base_url,
+                limit=args.limit,
+                sleep_s=args.sleep,
+                verbose=args.verbose,
+                save_raw_dir=raw_dir,
+                client=client,
+                prefetch=args.prefetch,
+                start=start,
+                cursor=cursor,
+                archive=archive,
+            )
     else:  # wallet
-        if not args.address:
-            raise SystemExit("--address is required in --mode wallet")
         if args.verbose:
-            print(f"[+] Fetching wallet ops for address={args.address} token={args.token or 'ALL'}")
-        rows = fetch_oplist_by_address(
-            address=args.address.strip(),
-            base_url=base_url,
-            token=args.token,
-            limit=args.limit,
-            sleep_s=args.sleep,
-            verbose=args.verbose,
-            save_raw_dir=raw_dir,
-        )
-
-    wrote = write_csv(rows, args.out, wide=args.wide, resume=args.resume, verbose=args.verbose)
+            print(f"[+] Fetching wallet ops for address={target} token={args.token or 'ALL'}")
+        query = {"address": target, "tick": args.token}
+        def pages(start: str = "", cursor: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict]]:
+            if replay is not None:
+                params = {"address": target}
+                if args.token and args.token.upper() != "ALL":
+                    params["tick"] = args.token
+                return iter_archived_oplist(replay, params, args.verbose)
+            return iter_oplist_by_address(
+                address=target,
+                base_url=base_url,
+                token=args.token,
+                limit=args.limit,
+                sleep_s=args.sleep,
+                verbose=args.verbose,
+                save_raw_dir=raw_dir,
+                client=client,
+                prefetch=args.prefetch,
+                start=start,
+                cursor=cursor,
+                archive=archive,
+            )
+
+    if args.incremental:
+        idx_path = Path(str(out_csv) + ".idx.sqlite")
+        seed = not idx_path.exists() and out_csv.exists()
+        index = OpIndex(idx_path)
+        try:
+            index.check_query(query)
+            sink = open_sink(out_csv, args.format, wide=args.wide, verbose=args.verbose, batch_rows=args.batch_rows,
+                             store=store)
+            try:
+                with sink:
+                    if seed:
+                        n = index.seed(out_csv)
+                        if args.verbose:
+                            print(f"[sync] indexed {n} tx_ids from existing {out_csv}")
+                    sync = sync_oplist(pages, index, sink, verbose=args.verbose)
+                    stats["pages"] = sync["pages"]
+            finally:
+                stats["rows"] = sink.written
+            if args.verbose:
+                print(f"[sync] pages={sync['pages']} new_ops={sync['new']} passes={sync['passes']} "
+                      f"known={len(index)} open_gaps={len(index.gaps())}")
+        finally:
+            index.close()
+    else:
+        sink = open_sink(out_csv, args.format, wide=args.wide, resume=args.resume, verbose=args.verbose,
+                         batch_rows=args.batch_rows, store=store)
+        try:
+            with sink:
+                for rows in pages():
+                    sink.add(rows)
+                    stats["pages"] += 1
+        finally:
+            stats["rows"] = sink.written
+    stats["seconds"] = round(time.time() - t0, 2)
     if args.verbose:
-        print(f"[write] {args.out} rows_written={wrote}")
+        print(f"[write] {out_csv} rows_written={sink.written}")
+    return stats
+
+def combine_outputs(parts: List[Tuple[str, Path]], out_csv: Path) -> int:
+    """
+    Concatenate per-target CSVs into one file with a leading `target` column,
+    one contiguous partition per target in the given order. Columns are the
+    union of the part headers (wide parts may differ). Returns rows written.
+    """
+    columns: List[str] = []
+    for _, path in parts:
+        with open(path, newline="", encoding="utf-8") as f:
+            for c in next(csv.reader(f), []):
+                if c not in columns:
+                    columns.append(c)
+    n = 0
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["target"] + columns)
+        for target, path in parts:
+            for row in _read_run(path, columns):
+                w.writerow([target] + row)
+                n += 1
+    return n
+
+def run_batch(args: argparse.Namespace, client: HttpClient, targets: List[str],
+              archive: Optional[PageArchive] = None, replay: Optional[PageArchive] = None,
+              store: Optional[QueryStore] = None) -> List[Dict[str, Any]]:
+    """
+    Run every target through run_target on a pool of --workers threads. All
+    workers share `client`, so the per-host rate budget and connection cap
+    hold for the whole batch. A failing target is reported, not fatal.
+    Writes <out>/<target>.csv, <out>/run_summary.csv and, with --combined,
+    <out>/combined.csv.
+    """
+    out_dir = args.out
+    out_dir.mkdir(parents=True, exist_ok=True)
+    suffix = ".csv" if args.format == "csv" else ""
+    paths = {t: out_dir / f"{sanitize_for_fname(t)}{suffix}" for t in targets}
+
+    def job(target: str) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        t0 = time.time()
+        try:
+            run_target(args, client, target, paths[target], stats, archive, replay, store)
+            stats["status"] = "ok"
+        except Exception as e:
+            stats["seconds"] = round(time.time() - t0, 2)
+            stats["status"] = f"error: {type(e).__name__}"
+            print(f"[batch] {target}: {e}", file=sys.stderr)
+        return stats
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        results = list(ex.map(job, targets))
+
+    summary = pd.DataFrame(results, columns=["target", "rows", "pages", "seconds", "status"])
+    summary.to_csv(out_dir / "run_summary.csv", index=False)
+    print(summary.to_string(index=False))
+    ok = summary["status"].eq("ok")
+    print(f"[batch] targets={len(summary)} ok={int(ok.sum())} failed={int((~ok).sum())} "
+          f"rows={int(summary['rows'].sum())} pages={int(summary['pages'].sum())}")
+
+    if args.combined:
+        parts = [(t, paths[t]) for t in targets if paths[t].exists()]
+        n = combine_outputs(parts, out_dir / "combined.csv")
+        print(f"[batch] {out_dir / 'combined.csv'} rows={n}")
+    return results
+
+# -----------------------------
+# Main
+# -----------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    client = _client(args.sleep, rps=args.rps, max_rps=args.max_rps, verbose=args.verbose)
+
+    if args.mode == "token":
+        if args.tokens_file:
+            targets = load_targets(args.tokens_file)
+        elif args.token:
+            targets = None
+        else:
+            raise SystemExit("--token or --tokens-file is required in --mode token")
+    else:  # wallet
+        if args.addresses_file:
+            targets = load_targets(args.addresses_file)
+        elif args.address:
+            targets = None
+        else:
+            raise SystemExit("--address or --addresses-file is required in --mode wallet")
+
+    failed = 0
+    if args.combined and args.format != "csv":
+        raise SystemExit("--combined is CSV-only; read Parquet targets with read_op_store()")
+    if args.archive is not None and args.replay is not None:
+        raise SystemExit("--archive and --replay are mutually exclusive")
+    if args.replay is not None and args.incremental:
+        raise SystemExit("--replay rebuilds outputs from scratch; drop --incremental")
+    default_archive = args.out / "pages.jsonl.gz" if targets is not None else Path(str(args.out) + ".pages.jsonl.gz")
+    archive = PageArchive(args.archive or default_archive) if args.archive is not None else None
+    replay = PageArchive(args.replay or default_archive, mode="r") if args.replay is not None else None
+    store = QueryStore(args.query_store) if args.query_store else None
+    try:
+        if targets is not None:
+            results = run_batch(args, client, targets, archive, replay, store)
+            failed = sum(r["status"] != "ok" for r in results)
+        else:
+            target = args.token if args.mode == "token" else args.address.strip()
+            run_target(args, client, target, args.out, archive=archive, replay=replay, store=store)
+    finally:
+        for a in (archive, replay, store):
+            if a is not None:
+                a.close()
+    if args.verbose or targets is not None:
+        print(f"[http] {client.summary()}")
+    if failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     try:
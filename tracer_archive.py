@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tracer_archive.py — append-only compressed archive of raw API pages for the
+Kaspa L1 and Kasplex KRC-20 tracers
+
+Highlights
+- One archive file made of independently compressed frames (gzip members;
+  zstd frames for *.zst paths, with the optional `zstandard` package). Each
+  frame holds one JSONL record, so `zcat pages.jsonl.gz` (or `zstdcat`) reads
+  the archive as plain JSONL
+- Record: {"src", "key", "cursor", "fetched_at", "body"}, with the response
+  body spliced in as received (re-encoded compactly only if it has newlines)
+- Offset index sidecar <archive>.idx (JSONL: offset, length, src, key,
+  cursor per frame), so one query's pages are read without decompressing the
+  rest; a missing or stale index is rebuilt by scanning the frames, and a
+  frame cut short by a crash is dropped before appending again
+- Thread-safe appends; a frame is indexed only once fully written
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tracer_http import loads
+
+try:  # optional: only needed for *.zst archives
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+SCAN_CHUNK = 1 << 20
+
+# -----------------------------
+# Archive
+# -----------------------------
+
+class PageArchive:
+    """
+    mode="a" opens (or creates) the archive for appending, mode="r" for
+    reading only. Entries of the offset index are kept in `entries` in
+    archive order.
+    """
+
+    def __init__(self, path, mode: str = "a"):
+        self.path = Path(path)
+        self.mode = mode
+        self.codec = "zstd" if self.path.suffix == ".zst" else "gzip"
+        if self.codec == "zstd" and zstandard is None:
+            raise SystemExit(f"{self.path}: zstd archives need the zstandard package (pip install zstandard)")
+        if mode == "r" and not self.path.exists():
+            raise SystemExit(f"{self.path}: no such archive")
+        self.index_path = Path(str(self.path) + ".idx")
+        self._lock = threading.Lock()
+        if mode == "a":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+        self.entries: List[Dict[str, Any]] = self._load_index()
+        self._f = open(self.path, "ab") if mode == "a" else None
+        self._idx = open(self.index_path, "a", encoding="utf-8") if mode == "a" else None
+        self._size = self.path.stat().st_size
+
+    def __enter__(self) -> "PageArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def _decompressor(self) -> Any:
+        if self.codec == "zstd":
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(wbits=31)
+
+    def _decompress(self, frame: bytes) -> bytes:
+        d = self._decompressor()
+        return d.decompress(frame)
+
+    @staticmethod
+    def _entry(offset: int, length: int, record: bytes) -> Dict[str, Any]:
+        rec = loads(record)
+        return {"offset": offset, "length": length, "src": rec.get("src"), "key": rec.get("key"),
+                "cursor": rec.get("cursor"), "fetched_at": rec.get("fetched_at")}
+
+    def _scan(self, start: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Index the complete frames from byte `start`; returns (entries, end of the last complete frame)."""
+        entries: List[Dict[str, Any]] = []
+        pos = frame_start = start
+        d, out = self._decompressor(), []
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            while True:
+                chunk = f.read(SCAN_CHUNK)
+                if not chunk:
+                    break
+                while chunk:
+                    try:
+                        out.append(d.decompress(chunk))
+                    except (zlib.error, EOFError, ValueError, getattr(zstandard, "ZstdError", ValueError)):
+                        return entries, frame_start  # corrupt tail
+                    if not d.eof:
+                        pos += len(chunk)
+                        break
+                    rest = d.unused_data
+                    pos += len(chunk) - len(rest)
+                    try:
+                        entries.append(self._entry(frame_start, pos - frame_start, b"".join(out)))
+                    except ValueError:
+                        return entries, frame_start
+                    frame_start, chunk = pos, rest
+                    d, out = self._decompressor(), []
+        return entries, frame_start
+
+    def _load_index(self) -> List[Dict[str, Any]]:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        entries: List[Dict[str, Any]] = []
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break  # torn last line
+        end = entries[-1]["offset"] + entries[-1]["length"] if entries else 0
+        if end > size:  # archive replaced or truncated: start over
+            entries, end = [], 0
+        if end == size and self.index_path.exists():
+            return entries
+        more, good = self._scan(end)
+        entries.extend(more)
+        if self.mode == "a":
+            if good < size:
+                with open(self.path, "r+b") as f:
+                    f.truncate(good)
+            tmp = Path(str(self.index_path) + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for e in entries:
+                    f.write(json.dumps(e) + "\n")
+            os.replace(tmp, self.index_path)
+        return entries
+
+    def append(self, src: str, key: str, cursor: Any, body: bytes) -> None:
+        """Archive one response body (already known to be valid JSON)."""
+        if self._f is None:
+            raise ValueError(f"{self.path} is open read-only")
+        if b"\n" in body:
+            body = json.dumps(json.loads(body), separators=(",", ":")).encode()
+        meta = {"src": src, "key": key, "cursor": cursor, "fetched_at": int(time.time() * 1000)}
+        frame = self._compress(json.dumps(meta)[:-1].encode() + b', "body": ' + body + b"}\n")
+        with self._lock:
+            entry = {"offset": self._size, "length": len(frame), **meta}
+            self._f.write(frame)
+            self._f.flush()
+            self._size += len(frame)
+            self._idx.write(json.dumps(entry) + "\n")
+            self._idx.flush()
+            self.entries.append(entry)
+
+    def keys(self, src: Optional[str] = None) -> List[str]:
+        """Distinct keys (addresses / queries) in first-archived order."""
+        return list(dict.fromkeys(e["key"] for e in self.entries if src is None or e["src"] == src))
+
+    def iter_records(self, src: Optional[str] = None, key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Decoded records (body included) in archive order, optionally for one src/key."""
+        with self._lock:
+            entries = [e for e in self.entries
+                       if (src is None or e["src"] == src) and (key is None or e["key"] == key)]
+        with open(self.path, "rb") as f:
+            for e in entries:
+                f.seek(e["offset"])
+                yield loads(self._decompress(f.read(e["length"])))
+
+    def close(self) -> None:
+        for f in (self._f, self._idx):
+            if f is not None:
+                f.close()
+        self._f = self._idx = None
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tracer_http.py — shared HTTP client for the Kaspa L1 and Kasplex KRC-20 tracers
+
+Highlights
+- One pooled requests.Session (keep-alive), proxy bypass (trust_env=False)
+- Per-host AIMD rate limiter: additive increase while responses are healthy,
+  multiplicative decrease on 429/5xx/connection errors, honours Retry-After
+- Per-host concurrency cap shared by every worker thread
+- Retries with the limiter providing the backoff (no fixed sleeps)
+- Counters: requests, retries, errors, bytes (per host and total)
+- loads(): JSON decode straight from response bytes via orjson when installed,
+  stdlib json otherwise; slim_kaspa_page() keeps only the fields the L1
+  tracer uses
+- iter_prefetched: cursor pagination that keeps the next request in flight
+  while the caller processes the current page
+"""
+
+import json
+import queue
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:  # optional fast JSON backend
+    import orjson
+except ImportError:
+    orjson = None
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRIES = 6
+TIMEOUT = 30
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# -----------------------------
+# Decoding
+# -----------------------------
+
+def loads(body: bytes) -> Any:
+    """Decode a JSON response body (bytes) with the fastest available backend."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+_KASPA_INPUT_FIELDS = ("previous_outpoint_address", "previous_outpoint_amount")
+_KASPA_OUTPUT_FIELDS = ("script_public_key_address", "amount")
+
+def slim_kaspa_page(data: Any) -> Any:
+    """
+    Reduce a decoded full-transactions-page to the fields the L1 tracer reads
+    (tx id, block_time, input addresses/amounts, output addresses/amounts).
+    Scripts, signatures and outpoint hashes are dropped right after decoding,
+    so queued pages, shard spills and caches stay small.
+    """
+    if not isinstance(data, list):
+        return data
+    out = []
+    for tx in data:
+        if not isinstance(tx, dict):
+            out.append(tx)
+            continue
+        slim = {k: tx[k] for k in ("transaction_id", "txId", "block_time") if k in tx}
+        slim["inputs"] = [
+            {k: inp.get(k) for k in _KASPA_INPUT_FIELDS if k in inp}
+            for inp in (tx.get("inputs") or []) if isinstance(inp, dict)
+        ]
+        slim["outputs"] = [
+            {k: o.get(k) for k in _KASPA_OUTPUT_FIELDS if k in o}
+            for o in (tx.get("outputs") or []) if isinstance(o, dict)
+        ]
+        out.append(slim)
+    return out
+
+# -----------------------------
+# Rate limiting
+# -----------------------------
+
+class AIMDRateLimiter:
+    """
+    Paces requests to `rate` per second. Every healthy response adds
+    `increase / rate` (≈ +`increase` req/s per second of traffic) up to
+    `max_rate`; a throttle signal multiplies the rate by `decrease` (down to
+    `min_rate`) and, with Retry-After, holds all requests until it expires.
+    """
+
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.2, max_rate: Optional[float] = None,
+                 increase: float = 0.5, decrease: float = 0.5, min_interval: float = 0.0):
+        self.rate = rate if max_rate is None else min(rate, max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.min_interval = min_interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until the next request slot."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + max(1.0 / self.rate, self.min_interval)
+        if slot > now:
+            time.sleep(slot - now)
+
+    def on_success(self) -> None:
+        with self._lock:
+            rate = self.rate + self.increase / self.rate
+            self.rate = rate if self.max_rate is None else min(rate, self.max_rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            now = time.monotonic()
+            hold = retry_after if retry_after is not None else 1.0 / self.rate
+            self._next = max(self._next, now + hold)
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+# -----------------------------
+# Client
+# -----------------------------
+
+class HttpClient:
+    """
+    Thread-safe pooled client shared by every fetcher in a run. Each host gets
+    its own AIMDRateLimiter and a semaphore capping in-flight requests.
+    Responses with status in RETRY_STATUSES and connection errors are retried
+    up to `retries` times; the last response (or exception) is returned (or
+    raised) to the caller.
+    """
+
+    def __init__(self, rps: float = 5.0, max_rps: Optional[float] = None, min_interval: float = 0.0,
+                 max_per_host: int = 4, pool_size: int = 16, retries: int = RETRIES, timeout: float = TIMEOUT,
+                 headers: Optional[Dict[str, str]] = None, verify: bool = True,
+                 log: Optional[Callable[[str], None]] = None):
+        self.rps = rps
+        self.max_rps = max_rps
+        self.min_interval = min_interval
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.verify = verify
+        self.log = log
+
+        s = requests.Session()
+        s.trust_env = False  # ignore system proxies
+        s.proxies = {"http": None, "https": None}
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        self.session = s
+
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+
+    def _host(self, url: str) -> Dict[str, Any]:
+        host = urlsplit(url).netloc
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None:
+                h = self._hosts[host] = {
+                    "limiter": AIMDRateLimiter(self.rps, max_rate=self.max_rps, min_interval=self.min_interval),
+                    "slots": threading.BoundedSemaphore(self.max_per_host),
+                    "requests": 0, "retries": 0, "errors": 0, "bytes": 0,
+                }
+            return h
+
+    def _count(self, h: Dict[str, Any], **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                h[k] += v
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        h = self._host(url)
+        limiter = h["limiter"]
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("verify", self.verify)
+        kwargs["headers"] = {**self.headers, **(kwargs.get("headers") or {})}
+        for attempt in range(1, self.retries + 1):
+            limiter.acquire()
+            try:
+                with h["slots"]:
+                    r = self.session.request(method, url, **kwargs)
+                    body = r.content  # read the body while holding the slot
+            except requests.RequestException as e:
+                self._count(h, requests=1, errors=1)
+                if attempt == self.retries:
+                    raise
+                self._count(h, retries=1)
+                limiter.on_throttle()
+                if self.log:
+                    self.log(f"[retry {attempt}/{self.retries}] {type(e).__name__}: {e}")
+                continue
+            self._count(h, requests=1, bytes=len(body))
+            if r.status_code in RETRY_STATUSES and attempt < self.retries:
+                self._count(h, retries=1)
+                limiter.on_throttle(_retry_after(r))
+                if self.log:
+                    self.log(f"[retry {attempt}/{self.retries}] HTTP {r.status_code}, rate now {limiter.rate:.2f}/s")
+                continue
+            if r.status_code in RETRY_STATUSES:
+                limiter.on_throttle(_retry_after(r))
+            else:
+                limiter.on_success()
+            return r
+        raise RuntimeError("unreachable")
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def backoff(self, url: str) -> None:
+        """Treat the last response from url's host as a throttle signal (e.g. a garbled body)."""
+        self._host(url)["limiter"].on_throttle()
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals plus per-host counters and current adaptive rate."""
+        with self._lock:
+            hosts = {
+                host: {k: h[k] for k in ("requests", "retries", "errors", "bytes")} | {"rate": round(h["limiter"].rate, 2)}
+                for host, h in self._hosts.items()
+            }
+        totals = {k: sum(h[k] for h in hosts.values()) for k in ("requests", "retries", "errors", "bytes")}
+        return {**totals, "hosts": hosts}
+
+    def summary(self) -> str:
+        st = self.stats()
+        return f"requests={st['requests']} retries={st['retries']} errors={st['errors']} bytes={st['bytes']:,}"
+
+# -----------------------------
+# Pipelined pagination
+# -----------------------------
+
+_DONE = object()
+
+def iter_prefetched(fetch: Callable[[Any, int], Any], cursor: Any, next_cursor: Callable[[Any], Any],
+                    depth: int = 2, max_pages: Optional[int] = None) -> Iterator[Tuple[Any, Any]]:
+    """
+    Cursor pagination with the network overlapped against the caller's work.
+
+    A producer thread calls fetch(cursor, page_index), derives the following
+    cursor with next_cursor(page) as soon as the page is decoded (None ends
+    the run) and immediately issues the next request, keeping at most `depth`
+    decoded pages queued ahead of the consumer. Yields (cursor, page) in order;
+    a fetch error is re-raised in the consumer after the pages before it.
+    depth=0 fetches synchronously in the caller's thread.
+    """
+    if depth <= 0:
+        index = 0
+        while cursor is not None and (max_pages is None or index < max_pages):
+            page = fetch(cursor, index)
+            yield cursor, page
+            cursor = next_cursor(page)
+            index += 1
+        return
+
+    q: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        c, index = cursor, 0
+        try:
+            while c is not None and (max_pages is None or index < max_pages):
+                page = fetch(c, index)
+                if not put((c, page)):
+                    return
+                c = next_cursor(page)
+                index += 1
+        except BaseException as e:
+            put(e)
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tracer_store.py — local indexed query store for the Kaspa L1 and Kasplex
+KRC-20 tracers
+
+Highlights
+- One SQLite file holding the L1 sender→recipient records (l1_flows, one
+  row per attributed edge, as in *_all_participants.csv) and the normalized
+  KRC-20 ops (krc20_ops, exact integer amounts and the opAccept flag)
+- Indexed on address (sender/recipient, from/to, each with time), tx_id and
+  timestamp (epoch ms), so timelines, tx lookups and time-range scans read
+  only the matching rows
+- Fed live by both tracers (--query-store) or from their existing outputs
+  (`ingest`); transactions and ops already stored are skipped
+- Query API (QueryStore.timeline / lookup / scan / sql) and a small CLI
+
+Usage
+------
+python tracer_store.py ingest --db data/tracer.sqlite --krc20 data/slow_token_ops.csv --flows flow_data_fullhistory
+python tracer_store.py timeline --db data/tracer.sqlite --address kaspa:qq5x... --since 2024-05-01
+python tracer_store.py tx --db data/tracer.sqlite --tx-id 5f0c...
+python tracer_store.py scan --db data/tracer.sqlite --kind krc20 --since 2024-06-01 --until 2024-06-02
+python tracer_store.py sql --db data/tracer.sqlite "SELECT op_type, COUNT(*) FROM krc20_ops GROUP BY op_type"
+
+"""
+
+import argparse
+import sqlite3
+import sys
+import threading
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+# -----------------------------
+# Defaults / Config
+# -----------------------------
+
+READ_CHUNK = 200000   # CSV rows read per chunk
+EPOCH = pd.Timestamp(0, tz="UTC")
+KINDS = ("l1", "krc20")
+TIMELINE_COLUMNS = ["kind", "tx_id", "timestamp", "op_type", "token", "sender", "recipient", "amount"]
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS l1_txs (tx_id TEXT PRIMARY KEY) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS l1_flows (
+        tx_id TEXT NOT NULL, ts_ms INTEGER, sender TEXT NOT NULL, recipient TEXT NOT NULL,
+        amount_sompi INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS l1_flows_tx ON l1_flows (tx_id);
+    CREATE INDEX IF NOT EXISTS l1_flows_sender ON l1_flows (sender, ts_ms);
+    CREATE INDEX IF NOT EXISTS l1_flows_recipient ON l1_flows (recipient, ts_ms);
+    CREATE INDEX IF NOT EXISTS l1_flows_ts ON l1_flows (ts_ms);
+    CREATE TABLE IF NOT EXISTS krc20_ops (
+        tx_id TEXT PRIMARY KEY, ts_ms INTEGER, token TEXT, op_type TEXT, from_addr TEXT, to_addr TEXT,
+        amount TEXT, accepted INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS krc20_ops_from ON krc20_ops (from_addr, ts_ms);
+    CREATE INDEX IF NOT EXISTS krc20_ops_to ON krc20_ops (to_addr, ts_ms);
+    CREATE INDEX IF NOT EXISTS krc20_ops_ts ON krc20_ops (ts_ms);
+    CREATE INDEX IF NOT EXISTS krc20_ops_token ON krc20_ops (token, op_type, ts_ms);
+"""
+
+# -----------------------------
+# Conversions
+# -----------------------------
+
+def iso_to_ms(values: pd.Series) -> List[Optional[int]]:
+    """ISO-8601 timestamps → epoch ms (None where unparseable)."""
+    ts = pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+    ms = (ts - EPOCH) // pd.Timedelta(1, "ms")
+    return [None if pd.isna(v) else int(v) for v in ms]
+
+def ms_to_iso(values: Iterable[Optional[int]]) -> List[str]:
+    return ["" if v is None or pd.isna(v) else pd.Timestamp(int(v), unit="ms", tz="UTC").isoformat() for v in values]
+
+def parse_time(value: Any) -> int:
+    """CLI time → epoch ms: epoch ms, epoch seconds or an ISO date/datetime (naive = UTC)."""
+    value = str(value).strip()
+    if value.isdigit():
+        v = int(value)
+        return v if v >= 10 ** 11 else v * 1000
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return (ts - EPOCH) // pd.Timedelta(1, "ms")
+
+def _units(value: Any) -> Optional[str]:
+    """Exact integer amount as text ("548735987703" from "548735987703" or 548735987703.0)."""
+    if value is None or (isinstance(value, float) and value != value) or value == "":
+        return None
+    try:
+        d = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    return str(int(d)) if d.is_finite() else None
+
+def _flag(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+# -----------------------------
+# Store
+# -----------------------------
+
+class QueryStore:
+    """
+    SQLite query store shared by a tracer's worker threads. add_l1() takes
+    attribution records (all rows of each transaction at once), add_krc20()
+    normalized ops; both skip what is already stored.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self) -> "QueryStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_l1(self, records: pd.DataFrame) -> int:
+        """Store the sender→recipient records of transactions not stored yet; returns new transactions."""
+        if not len(records):
+            return 0
+        with self._lock, self._db:
+            new = set()
+            for tx_id in records["tx_id"].unique():
+                if self._db.execute("INSERT OR IGNORE INTO l1_txs VALUES (?)", (tx_id,)).rowcount:
+                    new.add(tx_id)
+            if not new:
+                return 0
+            rows = records[records["tx_id"].isin(new)]
+            self._db.executemany(
+                "INSERT INTO l1_flows VALUES (?, ?, ?, ?, ?)",
+                zip(rows["tx_id"], iso_to_ms(rows["timestamp"]), rows["sender"], rows["recipient"],
+                    (int(v) for v in rows["amount_sompi"])),
+            )
+            return len(new)
+
+    def add_krc20(self, df: pd.DataFrame, raw: Optional[Sequence[Dict]] = None) -> int:
+        """
+        Store normalized ops (narrow columns). Exact amounts and opAccept come
+        from the raw ops in `raw` (same order) or the raw_amt/raw_opAccept
+        columns of a wide output; otherwise from `amount`, acceptance unknown.
+        Returns new ops.
+        """
+        if not len(df):
+            return 0
+        if raw is not None:
+            amounts = [r.get("amt") if isinstance(r, dict) and r.get("amt") not in (None, "") else a
+                       for r, a in zip(raw, df["amount"])]
+            accepted = [r.get("opAccept") if isinstance(r, dict) else None for r in raw]
+        else:
+            amounts = df["amount"]
+            if "raw_amt" in df.columns:
+                amounts = df["raw_amt"].where(df["raw_amt"].notna() & (df["raw_amt"] != ""), amounts)
+            accepted = df["raw_opAccept"] if "raw_opAccept" in df.columns else [None] * len(df)
+        rows = zip(df["tx_id"].astype(str), iso_to_ms(df["timestamp_iso"]), df["token"], df["op_type"],
+                   df["from"], df["to"], map(_units, amounts), map(_flag, accepted))
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO krc20_ops VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._db.total_changes - before
+
+    def sql(self, query: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(query, self._db, params=list(params))
+
+    def _window(self, col: str, since: Optional[int], until: Optional[int]) -> tuple:
+        where, params = [], []
+        if since is not None:
+            where.append(f"{col} >= ?")
+            params.append(since)
+        if until is not None:
+            where.append(f"{col} < ?")
+            params.append(until)
+        return where, params
+
+    def _l1(self, where: List[str], params: List[Any], limit: Optional[int]) -> pd.DataFrame:
+        q = ("SELECT 'l1' AS kind, tx_id, ts_ms, '' AS op_type, 'KAS' AS token, sender, recipient, "
+             "CAST(amount_sompi AS TEXT) AS amount FROM l1_flows")
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        q += " ORDER BY ts_ms, tx_id"
+        if limit:
+            q += f" LIMIT {int(limit)}"
+        return self.sql(q, params)
+
+    def _krc20(self, where: List[str], params: List[Any], limit: Optional[int], accepted_only: bool) -> pd.DataFrame:
+        q = ("SELECT 'krc20' AS kind, tx_id, ts_ms, op_type, token, from_addr AS sender, to_addr AS recipient, "
+             "amount FROM krc20_ops")
+        if accepted_only:
+            where = where + ["(accepted IS NULL OR accepted = 1)"]
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        q += " ORDER BY ts_ms, tx_id"
+        if limit:
+            q += f" LIMIT {int(limit)}"
+        return self.sql(q, params)
+
+    @staticmethod
+    def _frame(parts: List[pd.DataFrame], limit: Optional[int]) -> pd.DataFrame:
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return pd.DataFrame(columns=TIMELINE_COLUMNS)
+        df = pd.concat(parts, ignore_index=True).sort_values(["ts_ms", "kind", "tx_id"], kind="stable", ignore_index=True)
+        if limit:
+            df = df.head(limit)
+        df["timestamp"] = ms_to_iso(df["ts_ms"])
+        return df[TIMELINE_COLUMNS]
+
+    def timeline(self, address: str, since: Optional[int] = None, until: Optional[int] = None,
+                 kinds: Iterable[str] = KINDS, limit: Optional[int] = None, accepted_only: bool = True) -> pd.DataFrame:
+        """Every L1 record and KRC-20 op sending from or to `address` in [since, until), oldest first."""
+        kinds = set(kinds)
+        where, params = self._window("ts_ms", since, until)
+        parts = []
+        if "l1" in kinds:
+            for side in ("sender", "recipient"):
+                parts.append(self._l1(where + [f"{side} = ?"], params + [address], limit))
+        if "krc20" in kinds:
+            for side in ("from_addr", "to_addr"):
+                parts.append(self._krc20(where + [f"{side} = ?"], params + [address], limit, accepted_only))
+        df = self._frame(parts, None)
+        df = df.drop_duplicates(ignore_index=True)  # self-transfers match both sides
+        return df.head(limit) if limit else df
+
+    def lookup(self, tx_id: str) -> pd.DataFrame:
+        """All stored rows of one transaction (L1 records and/or the KRC-20 op with that hashRev)."""
+        return self._frame([self._l1(["tx_id = ?"], [tx_id], None),
+                            self._krc20(["tx_id = ?"], [tx_id], None, accepted_only=False)], None)
+
+    def scan(self, since: Optional[int] = None, until: Optional[int] = None, kinds: Iterable[str] = KINDS,
+             token: Optional[str] = None, op_type: Optional[str] = None, limit: Optional[int] = None,
+             accepted_only: bool = True) -> pd.DataFrame:
+        """Rows in [since, until) by time, optionally only KRC-20 ops of one token / op type."""
+        kinds = set(kinds)
+        where, params = self._window("ts_ms", since, until)
+        parts = []
+        if "l1" in kinds and token is None and op_type is None:
+            parts.append(self._l1(where, params, limit))
+        if "krc20" in kinds:
+            w, p = list(where), list(params)
+            if token is not None:
+                w.append("token = ?")
+                p.append(token)
+            if op_type is not None:
+                w.append("op_type = ?")
+                p.append(op_type)
+            parts.append(self._krc20(w, p, limit, accepted_only))
+        return self._frame(parts, limit)
+
+    def close(self) -> None:
+        self._db.close()
+
+# -----------------------------
+# Ingest from existing outputs
+# -----------------------------
+
+def ingest_krc20(store: QueryStore, path: Path, chunk_rows: int = READ_CHUNK) -> int:
+    """Store the ops of a KRC-20 tracer output (CSV file or Parquet part directory)."""
+    path = Path(path)
+    if path.is_dir():
+        from tracekrc20_kasplex_full import read_op_store
+        df = read_op_store(path)
+        return sum(store.add_krc20(df.iloc[i:i + chunk_rows]) for i in range(0, len(df), chunk_rows))
+    n = 0
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        n += store.add_krc20(chunk)
+    return n
+
+def ingest_flows(store: QueryStore, path: Path) -> int:
+    """Store the records of *_all_participants.csv outputs (a file or a directory of them; amount_kas-only files too)."""
+    from kaspa_edges import iter_record_chunks
+    return sum(store.add_l1(chunk) for chunk in iter_record_chunks(path))
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Indexed local store of L1 records and KRC-20 ops")
+    p.add_argument("command", choices=["ingest", "timeline", "tx", "scan", "sql"])
+    p.add_argument("query", nargs="?", help="sql: the SELECT statement to run")
+    p.add_argument("--db", required=True, type=Path, help="SQLite store (created by the first ingest or tracer run)")
+    p.add_argument("--krc20", action="append", type=Path, default=[], help="ingest: KRC-20 tracer output (CSV or Parquet directory; repeatable)")
+    p.add_argument("--flows", action="append", type=Path, default=[], help="ingest: *_all_participants.csv file or directory (repeatable)")
+    p.add_argument("--address", help="timeline: the address")
+    p.add_argument("--tx-id", help="tx: transaction id (L1 tx_id or KRC-20 hashRev)")
+    p.add_argument("--kind", choices=KINDS, action="append", default=None, help="timeline/scan: only this data set (repeatable)")
+    p.add_argument("--token", help="scan: only KRC-20 ops of this tick")
+    p.add_argument("--op-type", help="scan: only KRC-20 ops of this type (mint, transfer, ...)")
+    p.add_argument("--since", type=parse_time, default=None, help="timeline/scan: from this time (epoch ms/s or ISO date, UTC)")
+    p.add_argument("--until", type=parse_time, default=None, help="timeline/scan: before this time")
+    p.add_argument("--limit", type=int, default=None, help="timeline/scan: at most this many rows")
+    p.add_argument("--all-ops", action="store_true", help="Include KRC-20 ops that were not accepted (opAccept != 1)")
+    p.add_argument("--out", type=Path, help="Write the result as CSV instead of printing it")
+    return p.parse_intermixed_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command != "ingest" and not args.db.exists():
+        raise SystemExit(f"{args.db}: no such store")
+    kinds = args.kind or KINDS
+    with QueryStore(args.db) as store:
+        if args.command == "ingest":
+            if not (args.krc20 or args.flows):
+                raise SystemExit("ingest needs --krc20 and/or --flows")
+            for path in args.krc20:
+                print(f"[store] {path}: new_ops={ingest_krc20(store, path)}")
+            for path in args.flows:
+                print(f"[store] {path}: new_txs={ingest_flows(store, path)}")
+            return
+        if args.command == "timeline":
+            if not args.address:
+                raise SystemExit("timeline needs --address")
+            df = store.timeline(args.address, args.since, args.until, kinds, args.limit, not args.all_ops)
+        elif args.command == "tx":
+            if not args.tx_id:
+                raise SystemExit("tx needs --tx-id")
+            df = store.lookup(args.tx_id)
+        elif args.command == "scan":
+            df = store.scan(args.since, args.until, kinds, args.token, args.op_type, args.limit, not args.all_ops)
+        else:
+            if not args.query:
+                raise SystemExit("sql needs a query")
+            df = store.sql(args.query)
+    if args.out:
+        df.to_csv(args.out, index=False, lineterminator="\n")
+        print(f"[write] {args.out} rows={len(df)}")
+    else:
+        print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nInterrupted.", file=sys.stderr)
+        sys.exit(130)